@@ -2,62 +2,179 @@
 # -*- coding: utf-8 -*-
 """
 複数のスクリーンショットからフォーム形状を統計分析
+
+ディレクトリ・globパターン・ファイルを指定すると、画像をプロセスプールで並列に解析し、
+フォームごとのレコードをCSV/JSONLに逐次書き出します。面積・アスペクト比・サイズ・HSVの
+統計は1件ずつ更新するため（平均と標準偏差はWelford法、中央値はヒストグラムから推定）、
+数万枚のアーカイブでもレコードをメモリに溜め込みません。最後に推奨設定を表示します。
+
+使い方:
+    python analyze_multiple_screenshots.py C:/Users/imao3/Downloads/screenshot
+    python analyze_multiple_screenshots.py "archive/**/*.png" --jsonl forms.jsonl --csv forms.csv
+    python analyze_multiple_screenshots.py screenshots/ --workers 8 --details
 """
 
+import sys
+import io
+# Windows環境での文字化け対策
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+import argparse
+import csv
+import json
+import math
+import os
+import time
+from multiprocessing import Pool
+
 import cv2
 import numpy as np
-import sys
 
-# 最新の複数のスクリーンショットを分析
-files = [
-    'C:/Users/imao3/Downloads/screenshot/screenshot_0001_20251205_002905.png',
-    'C:/Users/imao3/Downloads/screenshot/screenshot_0002_20251205_003151.png',
-    'C:/Users/imao3/Downloads/screenshot/screenshot_0003_20251205_003216.png',
-    'C:/Users/imao3/Downloads/screenshot/screenshot_0004_20251205_003232.png',
-    'C:/Users/imao3/Downloads/screenshot/screenshot_0005_20251205_003250.png',
-    'C:/Users/imao3/Downloads/screenshot/screenshot_0006_20251205_003315.png'
-]
+from frame_source import load_image
+from labeled_images import collect_files
+
+
+RECORD_FIELDS = ['file', 'area', 'width', 'height', 'aspect_ratio', 'x', 'y', 'mean_h', 'mean_s', 'mean_v']
+
+
+class RunningStats:
+    """1件ずつ値を追加して最小・最大・平均・標準偏差・中央値を求める"""
+
+    def __init__(self, bin_edges):
+        """
+        Args:
+            bin_edges: 中央値の推定に使うヒストグラムのビン境界（昇順）。範囲外の値は両端のビンに入る
+        """
+        self.bin_edges = np.asarray(bin_edges, dtype=np.float64)
+        self.counts = np.zeros(len(self.bin_edges) - 1, dtype=np.int64)
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @classmethod
+    def log_bins(cls, low, high, bins=20000):
+        """対数間隔のビン（面積・アスペクト比など桁の広い値用、既定では中央値の相対誤差は約0.1%以下）"""
+        return cls(np.geomspace(low, high, bins + 1))
+
+    @classmethod
+    def linear_bins(cls, low, high, bins):
+        """等間隔のビン（HSVや画素数など範囲の決まった値用）"""
+        return cls(np.linspace(low, high, bins + 1))
+
+    def add(self, value):
+        """値を追加（Welford法で平均と分散を更新）"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        index = np.searchsorted(self.bin_edges, value, side='right') - 1
+        self.counts[min(max(index, 0), len(self.counts) - 1)] += 1
+
+    @property
+    def std(self):
+        """標準偏差（母標準偏差、np.std と同じ）"""
+        return math.sqrt(self._m2 / self.count) if self.count else 0.0
+
+    @property
+    def median(self):
+        """ヒストグラムから推定した中央値（ビン内は線形補間、最小・最大の範囲に収める）"""
+        if self.count == 0:
+            return 0.0
+        half = self.count / 2
+        cumulative = np.cumsum(self.counts)
+        index = int(np.searchsorted(cumulative, half))
+        before = cumulative[index - 1] if index > 0 else 0
+        low, high = self.bin_edges[index], self.bin_edges[index + 1]
+        value = low + (high - low) * (half - before) / self.counts[index]
+        return min(max(value, self.min), self.max)
+
+
+class FormStatistics:
+    """フォームのレコードから統計サマリーを逐次計算"""
+
+    def __init__(self):
+        self.area = RunningStats.log_bins(1, 1e9)
+        self.aspect_ratio = RunningStats.log_bins(1e-3, 1e3)
+        self.width = RunningStats.linear_bins(0, 16384, 16384)
+        self.height = RunningStats.linear_bins(0, 16384, 16384)
+        self.mean_h = RunningStats.linear_bins(0, 180, 1800)
+        self.mean_s = RunningStats.linear_bins(0, 256, 2560)
+        self.mean_v = RunningStats.linear_bins(0, 256, 2560)
+
+    @property
+    def count(self):
+        return self.area.count
+
+    def add(self, form):
+        for name in ('area', 'aspect_ratio', 'width', 'height', 'mean_h', 'mean_s', 'mean_v'):
+            getattr(self, name).add(form[name])
+
+
+_settings = {}
+
+
+def common_directory(files):
+    """
+    レコードのファイル名の基準にする、全画像に共通のディレクトリ
 
-print('=' * 80)
-print('複数のスクリーンショットからフォーム形状を分析')
-print('=' * 80)
+    --recursive で別のサブフォルダに同じ名前の画像があっても区別できるように、
+    ファイル名はこのディレクトリからの相対パスで記録します。
+
+    Returns:
+        str: 共通のディレクトリ。共通部分がない場合（Windowsで別ドライブなど）は None
+    """
+    try:
+        return os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in files])
+    except ValueError:
+        return None
+
+
+def _init_worker(settings):
+    """ワーカープロセスの初期化（設定を受け取り、OpenCVのスレッドは1つにする）"""
+    cv2.setNumThreads(1)
+    _settings.update(settings)
 
-all_forms = []
 
-for img_path in files:
+def analyze_file(img_path):
+    """
+    1枚の画像からフォームを検出してレコードを作成（ワーカープロセスで実行）
+
+    Returns:
+        tuple: (画像パス, フォームのレコードのリスト, エラーメッセージまたは None)
+    """
     try:
-        img = cv2.imread(img_path)
+        img = load_image(img_path)
         if img is None:
-            print(f"読み込めませんでした: {img_path}")
-            continue
+            return img_path, [], "読み込めませんでした"
 
         hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-
-        # 青緑系の色範囲で検出
-        hsv_lower = np.array([100, 30, 180])
-        hsv_upper = np.array([130, 70, 255])
-        mask = cv2.inRange(hsv, hsv_lower, hsv_upper)
+        mask = cv2.inRange(hsv, _settings['hsv_lower'], _settings['hsv_upper'])
 
         # 輪郭を検出
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-        # 面積でフィルタリング
+        forms = []
         for contour in contours:
             area = cv2.contourArea(contour)
-            if area < 10000:  # 小さい輪郭は無視
+            if area < _settings['min_area']:  # 小さい輪郭は無視
                 continue
 
             x, y, w, h = cv2.boundingRect(contour)
             aspect_ratio = w / h if h > 0 else 0
 
-            # HSV平均値も取得
-            mask_single = np.zeros(img.shape[:2], dtype=np.uint8)
-            cv2.drawContours(mask_single, [contour], 0, 255, -1)
-            mean_hsv = cv2.mean(hsv, mask=mask_single)[:3]
+            # HSV平均値（輪郭の内側。全画面ではなく外接矩形の範囲だけでマスクを作る）
+            mask_single = np.zeros((h, w), dtype=np.uint8)
+            cv2.drawContours(mask_single, [contour], 0, 255, -1, offset=(-x, -y))
+            mean_hsv = cv2.mean(hsv[y:y+h, x:x+w], mask=mask_single)[:3]
 
-            # フォーム情報を記録
-            all_forms.append({
-                'file': img_path.split('/')[-1],
+            forms.append({
+                'file': os.path.relpath(img_path, _settings['base_dir']) if _settings['base_dir'] else img_path,
                 'area': area,
                 'width': w,
                 'height': h,
@@ -68,82 +185,74 @@ for img_path in files:
                 'mean_s': mean_hsv[1],
                 'mean_v': mean_hsv[2]
             })
-
+        return img_path, forms, None
     except Exception as e:
-        print(f'エラー ({img_path}): {e}')
-        continue
+        return img_path, [], str(e)
 
-# 統計情報を計算
-if all_forms:
-    print(f'\n検出されたフォーム数: {len(all_forms)}')
-    print('\n' + '=' * 80)
-    print('個別フォーム詳細:')
-    print('=' * 80)
 
-    for i, form in enumerate(all_forms, 1):
-        print(f"\n[{i}] {form['file']}")
-        print(f"  位置: ({form['x']}, {form['y']})")
-        print(f"  サイズ: {form['width']} x {form['height']} px")
-        print(f"  面積: {form['area']:,.0f} px")
-        print(f"  アスペクト比: {form['aspect_ratio']:.2f}")
-        print(f"  平均HSV: H={form['mean_h']:.1f}, S={form['mean_s']:.1f}, V={form['mean_v']:.1f}")
-
-    # 統計サマリー
-    areas = [f['area'] for f in all_forms]
-    widths = [f['width'] for f in all_forms]
-    heights = [f['height'] for f in all_forms]
-    ratios = [f['aspect_ratio'] for f in all_forms]
-    h_values = [f['mean_h'] for f in all_forms]
-    s_values = [f['mean_s'] for f in all_forms]
-    v_values = [f['mean_v'] for f in all_forms]
+def print_form_details(index, form):
+    """フォーム1件の詳細を表示"""
+    print(f"\n[{index}] {form['file']}")
+    print(f"  位置: ({form['x']}, {form['y']})")
+    print(f"  サイズ: {form['width']} x {form['height']} px")
+    print(f"  面積: {form['area']:,.0f} px")
+    print(f"  アスペクト比: {form['aspect_ratio']:.2f}")
+    print(f"  平均HSV: H={form['mean_h']:.1f}, S={form['mean_s']:.1f}, V={form['mean_v']:.1f}")
+
+
+def print_summary(stats):
+    """統計サマリーと推奨設定を表示"""
+    area, ratio = stats.area, stats.aspect_ratio
+    width, height = stats.width, stats.height
+    h_values, s_values, v_values = stats.mean_h, stats.mean_s, stats.mean_v
 
     print('\n' + '=' * 80)
     print('統計サマリー:')
     print('=' * 80)
     print(f"\n面積:")
-    print(f"  最小: {min(areas):,.0f} px")
-    print(f"  最大: {max(areas):,.0f} px")
-    print(f"  平均: {np.mean(areas):,.0f} px")
-    print(f"  中央値: {np.median(areas):,.0f} px")
-    print(f"  標準偏差: {np.std(areas):,.0f} px")
+    print(f"  最小: {area.min:,.0f} px")
+    print(f"  最大: {area.max:,.0f} px")
+    print(f"  平均: {area.mean:,.0f} px")
+    print(f"  中央値: {area.median:,.0f} px")
+    print(f"  標準偏差: {area.std:,.0f} px")
 
     print(f"\nアスペクト比 (幅/高さ):")
-    print(f"  最小: {min(ratios):.2f}")
-    print(f"  最大: {max(ratios):.2f}")
-    print(f"  平均: {np.mean(ratios):.2f}")
-    print(f"  中央値: {np.median(ratios):.2f}")
-    print(f"  標準偏差: {np.std(ratios):.2f}")
+    print(f"  最小: {ratio.min:.2f}")
+    print(f"  最大: {ratio.max:.2f}")
+    print(f"  平均: {ratio.mean:.2f}")
+    print(f"  中央値: {ratio.median:.2f}")
+    print(f"  標準偏差: {ratio.std:.2f}")
 
     print(f"\n幅:")
-    print(f"  最小: {min(widths)} px")
-    print(f"  最大: {max(widths)} px")
-    print(f"  平均: {np.mean(widths):.0f} px")
+    print(f"  最小: {width.min} px")
+    print(f"  最大: {width.max} px")
+    print(f"  平均: {width.mean:.0f} px")
 
     print(f"\n高さ:")
-    print(f"  最小: {min(heights)} px")
-    print(f"  最大: {max(heights)} px")
-    print(f"  平均: {np.mean(heights):.0f} px")
+    print(f"  最小: {height.min} px")
+    print(f"  最大: {height.max} px")
+    print(f"  平均: {height.mean:.0f} px")
 
     print(f"\nHSV色範囲:")
-    print(f"  H: {min(h_values):.1f} 〜 {max(h_values):.1f} (平均: {np.mean(h_values):.1f})")
-    print(f"  S: {min(s_values):.1f} 〜 {max(s_values):.1f} (平均: {np.mean(s_values):.1f})")
-    print(f"  V: {min(v_values):.1f} 〜 {max(v_values):.1f} (平均: {np.mean(v_values):.1f})")
+    print(f"  H: {h_values.min:.1f} 〜 {h_values.max:.1f} (平均: {h_values.mean:.1f})")
+    print(f"  S: {s_values.min:.1f} 〜 {s_values.max:.1f} (平均: {s_values.mean:.1f})")
+    print(f"  V: {v_values.min:.1f} 〜 {v_values.max:.1f} (平均: {v_values.mean:.1f})")
 
     # 推奨設定を提案
     print('\n' + '=' * 80)
     print('推奨設定:')
     print('=' * 80)
 
-    recommended_min_area = int(min(areas) * 0.9)  # 最小値の90%
-    recommended_max_ratio = max(ratios) * 1.15  # 最大値の115%
-    recommended_min_ratio = min(ratios) * 0.85  # 最小値の85%
+    recommended_min_area = int(area.min * 0.9)  # 最小値の90%
+    recommended_max_ratio = ratio.max * 1.15  # 最大値の115%
+    recommended_min_ratio = ratio.min * 0.85  # 最小値の85%
 
-    # HSV範囲の推奨値（平均±標準偏差の1.5倍）
-    h_min = max(0, int(min(h_values) - 5))
-    h_max = min(180, int(max(h_values) + 5))
-    s_min = max(0, int(min(s_values) - 10))
-    s_max = min(255, int(max(s_values) + 10))
-    v_min = max(0, int(min(v_values) - 20))
+    # HSV範囲の推奨値（実測の最小・最大に余裕を持たせる）
+    h_min = max(0, int(h_values.min - 5))
+    h_max = min(180, int(h_values.max + 5))
+    s_min = max(0, int(s_values.min - 10))
+    s_max = min(255, int(s_values.max + 10))
+    v_min = max(0, int(v_values.min - 20))
     v_max = 255
 
     print(f"\n# 推奨パラメータ（実測値ベース）")
@@ -152,11 +261,90 @@ if all_forms:
     print(f"aspect_ratio_range=({recommended_min_ratio:.2f}, {recommended_max_ratio:.2f})")
 
     print(f"\n# より厳格な設定（誤検出を最小化）")
-    strict_min_area = int(np.median(areas) * 0.8)
-    strict_min_ratio = np.median(ratios) * 0.9
-    strict_max_ratio = np.median(ratios) * 1.1
+    strict_min_area = int(area.median * 0.8)
+    strict_min_ratio = ratio.median * 0.9
+    strict_max_ratio = ratio.median * 1.1
     print(f"min_area={strict_min_area:,}")
     print(f"aspect_ratio_range=({strict_min_ratio:.2f}, {strict_max_ratio:.2f})")
 
-else:
-    print('フォームが検出されませんでした')
+
+def main():
+    parser = argparse.ArgumentParser(description="複数のスクリーンショットからフォーム形状を統計分析")
+    parser.add_argument('inputs', nargs='+', help="画像ファイル・ディレクトリ・globパターン")
+    parser.add_argument('--recursive', action='store_true', help="ディレクトリをサブフォルダまで探す")
+    parser.add_argument('--hsv-lower', type=int, nargs=3, default=(100, 30, 180))
+    parser.add_argument('--hsv-upper', type=int, nargs=3, default=(130, 70, 255))
+    parser.add_argument('--min-area', type=float, default=10000, help="これより小さい輪郭は無視")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="ワーカープロセス数")
+    parser.add_argument('--chunksize', type=int, default=8, help="ワーカーに一度に渡す画像数")
+    parser.add_argument('--csv', help="フォームごとのレコードを書き出すCSVファイル")
+    parser.add_argument('--jsonl', help="フォームごとのレコードを書き出すJSONLファイル")
+    parser.add_argument('--details', action='store_true', help="フォームごとの詳細を表示")
+    args = parser.parse_args()
+
+    files = collect_files(args.inputs, args.recursive)
+
+    print('=' * 80)
+    print('複数のスクリーンショットからフォーム形状を分析')
+    print('=' * 80)
+    print(f"画像: {len(files):,}枚 | ワーカー: {args.workers}")
+    if not files:
+        print('画像が見つかりませんでした')
+        return
+
+    settings = {
+        'base_dir': common_directory(files),
+        'hsv_lower': np.array(args.hsv_lower),
+        'hsv_upper': np.array(args.hsv_upper),
+        'min_area': args.min_area,
+    }
+
+    csv_file = open(args.csv, 'w', newline='', encoding='utf-8') if args.csv else None
+    jsonl_file = open(args.jsonl, 'w', encoding='utf-8') if args.jsonl else None
+    csv_writer = csv.DictWriter(csv_file, fieldnames=RECORD_FIELDS) if csv_file else None
+    if csv_writer:
+        csv_writer.writeheader()
+
+    stats = FormStatistics()
+    processed = errors = 0
+    started = time.perf_counter()
+    try:
+        with Pool(args.workers, initializer=_init_worker, initargs=(settings,)) as pool:
+            # 終わった画像から順に受け取り、レコードはその場で書き出して統計に加える
+            for img_path, forms, error in pool.imap_unordered(analyze_file, files, chunksize=args.chunksize):
+                processed += 1
+                if error:
+                    errors += 1
+                    print(f"\nエラー ({img_path}): {error}")
+                for form in forms:
+                    stats.add(form)
+                    if csv_writer:
+                        csv_writer.writerow(form)
+                    if jsonl_file:
+                        jsonl_file.write(json.dumps(form, ensure_ascii=False) + "\n")
+                    if args.details:
+                        print_form_details(stats.count, form)
+
+                if not args.details and (processed % 100 == 0 or processed == len(files)):
+                    elapsed = time.perf_counter() - started
+                    print(f"処理済み: {processed:,}/{len(files):,}枚 | フォーム: {stats.count:,} | "
+                          f"{processed / elapsed:.0f}枚/秒", end='\r')
+    finally:
+        if csv_file:
+            csv_file.close()
+        if jsonl_file:
+            jsonl_file.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"\n\n解析時間: {elapsed:.1f}秒 | 読み込みエラー: {errors:,}枚")
+
+    # 統計情報を計算
+    if stats.count:
+        print(f'\n検出されたフォーム数: {stats.count:,}')
+        print_summary(stats)
+    else:
+        print('フォームが検出されませんでした')
+
+
+if __name__ == "__main__":
+    main()
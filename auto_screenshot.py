@@ -14,12 +14,25 @@ if sys.platform == 'win32':
 
 import cv2
 import numpy as np
-from mss import mss
-from PIL import Image
 import time
 import os
+from contextlib import nullcontext
 from datetime import datetime
 
+from bar_detection import check_form_bars
+from color_lut import ColorLut
+from detection_profile import DetectionProfile
+from event_log import ConsoleStatus
+from frame_change import FrameChangeDetector
+from frame_pipeline import FramePipeline
+from frame_source import Frame, MssFrameSource
+from loop_profiler import LoopProfiler
+from polling_scheduler import PollingScheduler
+
+# metrics が指定されていないときの何もしないコンテキストマネージャ
+_NO_TIMER = nullcontext()
+
+
 class AutoScreenshot:
     # 状態定義
     STATE_WAITING = "waiting"              # フォーム表示を待機中
@@ -37,7 +50,33 @@ class AutoScreenshot:
                  cooldown_time=3.0,            # クールダウン時間（秒）
                  save_dir="screenshots",
                  capture_region=None,
-                 check_interval=0.5):
+                 check_interval=0.5,
+                 frame_source=None,
+                 monitor_index=1,
+                 filename_prefix="screenshot",
+                 name="",
+                 tracking=False,
+                 tracking_padding=64,
+                 tracking_full_frame_interval=10,
+                 detection_scale=1.0,
+                 reference_height=None,
+                 min_bar_thickness=10,
+                 min_bar_distance=50,
+                 bar_width_ratio=0.7,
+                 candidate_engine='contours',
+                 color_matcher='hsv',
+                 skip_unchanged_frames=False,
+                 change_sample_step=4,
+                 state_intervals=None,
+                 pipelined=False,
+                 image_writer=None,
+                 deduplicator=None,
+                 metrics=None,
+                 event_log=None,
+                 status_refresh_rate=2.0,
+                 overlay=None,
+                 clock=time.monotonic,
+                 sleep=time.sleep):
         """
         Args:
             target_color_hsv_range: 検出する色範囲 [(H_min, S_min, V_min), (H_max, S_max, V_max)]
@@ -50,7 +89,47 @@ class AutoScreenshot:
             save_dir: 保存先ディレクトリ
             capture_region: キャプチャする領域 {"top": y, "left": x, "width": w, "height": h}
             check_interval: チェック間隔（秒）
+            frame_source: フレームソース（frame_source.FrameSource）。None=mssで画面キャプチャ
+            monitor_index: キャプチャするモニター番号（mssの番号、1=メインモニター）
+            filename_prefix: 保存ファイル名の接頭辞
+            name: ログに表示する識別名（複数モニター監視時など）
+            tracking: 検出中・撮影完了状態では前回のフォーム周辺だけをキャプチャして解析する
+            tracking_padding: 追跡ウィンドウの余白（ピクセル）
+            tracking_full_frame_interval: 追跡中も何フレームごとに全画面で再取得するか
+            detection_scale: 候補探索に使う縮小率（1.0=等倍のみ、0.5や0.25で粗密2段階検出）
+            reference_height: 面積・バー閾値を指定した基準画面の高さ（例: 1080）。
+                              指定すると実際の画面の高さに合わせて閾値を換算する。None=換算しない
+            min_bar_thickness: 上下バーとみなす最小の太さ（ピクセル）
+            min_bar_distance: 上下バー間の最小距離（ピクセル）
+            bar_width_ratio: 横バーとみなす行の青紫ピクセルの割合（幅に対する比率）
+            candidate_engine: 候補の抽出方法
+                              'contours'=findContours で輪郭ごとに面積・矩形を計算
+                              'components'=connectedComponentsWithStats の統計で一括して絞り込み、
+                              残った候補だけ輪郭を作る（同系色のUI部品が多い画面で高速）。
+                              他の領域の穴の中にある領域も候補になる点だけ 'contours' と異なる
+            color_matcher: 色マスクの作り方
+                           'hsv'=HSVに変換して inRange
+                           'lut'=BGRの全色に対する判定表（color_lut.ColorLut）を引く。結果は 'hsv' と同じ
+            skip_unchanged_frames: 画面が前フレームから変化していなければ検出を省略して前回の結果を使う
+            change_sample_step: 変化判定で比較する画素の間隔
+            state_intervals: 状態ごとのチェック間隔（秒）の辞書。指定の無い状態は check_interval
+                             例: {"waiting": 1.0, "detecting": 0.1, "cooldown": 2.0}
+            pipelined: キャプチャ・検出・状態遷移・保存を別々のワーカースレッドで実行する
+            image_writer: 画像書き込みプール（image_writer.ImageWriterPool）。None=PILで同期保存
+            deduplicator: 知覚ハッシュによる重複排除（capture_dedup.CaptureDeduplicator）。None=常に保存
+            metrics: 処理段階ごとの所要時間と件数の記録（metrics.DetectionMetrics）。None=記録しない
+            event_log: 状態遷移・撮影・キャンセル・定期集計のJSONLログ（event_log.EventLog）。None=記録しない
+            status_refresh_rate: コンソールの状態表示行を1秒あたり何回まで更新するか（0=表示しない）
+            overlay: 検出枠の画面表示（detection_overlay.DetectionOverlay）。検出結果を渡すだけで
+                     オーバーレイ側では画面をキャプチャしない。None=表示しない
+            clock: 状態遷移のタイマーに使う単調増加クロック（リプレイでは仮想クロック）
+            sleep: ポーリングの待機に使う関数（リプレイでは仮想クロックの sleep）
         """
+        if candidate_engine not in ('contours', 'components'):
+            raise ValueError(f"未対応のcandidate_engine: {candidate_engine}（'contours' または 'components'）")
+        if color_matcher not in ('hsv', 'lut'):
+            raise ValueError(f"未対応のcolor_matcher: {color_matcher}（'hsv' または 'lut'）")
+
         # デフォルトの色範囲（青緑系）
         if target_color_hsv_range is None:
             self.hsv_lower = np.array([100, 30, 180])  # 青緑の下限
@@ -68,10 +147,54 @@ class AutoScreenshot:
         self.save_dir = save_dir
         self.capture_region = capture_region
         self.check_interval = check_interval
+        self.state_intervals = dict(state_intervals or {})
+        self.clock = clock  # 状態遷移のタイマーに使う単調増加クロック
+        self.sleep = sleep  # ポーリングの待機に使う関数
+        self.scheduler = None
+        self.pipelined = pipelined
+        self.image_writer = image_writer
+        self.deduplicator = deduplicator
+        self.metrics = metrics
+        self.event_log = event_log
+        self.console = ConsoleStatus(status_refresh_rate)
+        self.overlay = overlay
+        self.detection_scale = detection_scale
+        self.reference_height = reference_height
+        self.min_bar_thickness = min_bar_thickness
+        self.min_bar_distance = min_bar_distance
+        self.bar_width_ratio = bar_width_ratio
+        self.candidate_engine = candidate_engine
+        self.color_matcher = color_matcher
+        self.color_lut = ColorLut(self.hsv_lower, self.hsv_upper) if color_matcher == 'lut' else None
+        self._coarse_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        self.frame_source = frame_source
+        self.monitor_index = monitor_index
+        self.filename_prefix = filename_prefix
+        self.name = name
+        self._active_source = None  # run() 中に開いているフレームソース
+        self._bgr_buffers = {}      # BGRA→BGR変換用の作業バッファ（サイズごと）
+
+        # 追跡ウィンドウ（ROIキャプチャ）
+        self.tracking = tracking
+        self.tracking_padding = tracking_padding
+        self.tracking_full_frame_interval = tracking_full_frame_interval
+        self._track_bbox = None          # 前回検出したフォームを囲む矩形 (x, y, w, h)
+        self._full_frame_size = None     # 全画面のサイズ (幅, 高さ)
+        self._frames_since_full = 0
+
+        # 画面変化ゲート（変化のないフレームは検出を省略）
+        self.change_detector = FrameChangeDetector(change_sample_step) if skip_unchanged_frames else None
+        self._last_detection = None
+        self.detection_stats = {'executed': 0, 'skipped': 0, 'detect_seconds': 0.0}
+
+        # イベントログの定期集計（前回の集計からの件数）
+        self._summary_start = None
+        self._summary_states = {}
+        self._summary_base = None
 
         # 状態管理
         self.state = self.STATE_WAITING
-        self.state_start_time = time.time()
+        self.state_start_time = self.clock()
         self.screenshot_count = 0
         self.detection_start_time = None
         self.disappear_start_time = None
@@ -88,142 +211,577 @@ class AutoScreenshot:
         if not os.path.exists(save_dir):
             os.makedirs(save_dir)
 
-    def detect_target_form(self, image):
+    @classmethod
+    def from_profile(cls, profile, name=None, **settings):
+        """
+        検出プロファイル（calibrate_profile.py などで作成）から作成
+
+        Args:
+            profile: DetectionProfile、またはプロファイルファイルのパス
+            name: ファイルに複数のプロファイルがある場合に使うプロファイル名。None=先頭
+            **settings: その他の AutoScreenshot の設定（プロファイルの値より優先）
+
+        Returns:
+            AutoScreenshot: プロファイルの設定で作成したインスタンス
+        """
+        if not isinstance(profile, DetectionProfile):
+            profiles = DetectionProfile.load(profile)
+            if name is not None:
+                matches = [p for p in profiles if p.name == name]
+                if not matches:
+                    raise ValueError(f"プロファイル '{name}' が見つかりません: {profile}")
+                profiles = matches
+            if not profiles:
+                raise ValueError(f"プロファイルがありません: {profile}")
+            profile = profiles[0]
+        options = dict(profile.to_settings(), name=profile.name)
+        options.update(settings)
+        return cls(**options)
+
+    def detect_target_form(self, image, screen_height=None):
         """
         画像内に指定の色と形状のフォームがあるかを検出
         横バー検出方式：フォーム上下の固定バーのみを検出し、中のテキストボックスの影響を受けない
 
         Args:
-            image: numpy配列の画像データ (BGR)
+            image: numpy配列の画像データ (BGR または mssのBGRA)
+            screen_height: 全画面の高さ（部分キャプチャ時の閾値換算用）。None=画像の高さ
 
         Returns:
             tuple: (検出されたか, 検出された輪郭情報のリスト, デバッグ情報)
         """
-        # HSV色空間に変換
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        thresholds = self.scaled_thresholds(screen_height or image.shape[0])
+
+        # 縮小画像で候補を探し、候補領域だけを等倍で検証
+        if self.detection_scale < 1.0:
+            return self._detect_coarse_to_fine(image, thresholds)
 
         # 色範囲でマスク作成
-        mask = cv2.inRange(hsv, self.hsv_lower, self.hsv_upper)
+        mask = self.color_mask(image)
 
         # モルフォロジー処理で細い線を除去（オプション）
         # kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
         # mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
 
-        # 輪郭を検出
-        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        # 候補を抽出し、条件に合うフォームを検索
+        detected_forms, candidate_count = self._find_forms(mask, thresholds)
+
+        # デバッグ情報
+        debug_info = {
+            'total_contours': candidate_count,
+            'matched_forms': len(detected_forms),
+            'color_pixels': cv2.countNonZero(mask)
+        }
+
+        is_detected = len(detected_forms) > 0
+
+        return is_detected, detected_forms, debug_info
+
+    def scaled_thresholds(self, screen_height):
+        """
+        基準解像度で指定した閾値を実際の画面の高さに合わせて換算
+
+        Args:
+            screen_height: 全画面の高さ（ピクセル）
+
+        Returns:
+            dict: min_area, max_area, bar_thickness, bar_distance（いずれも実ピクセル）
+        """
+        factor = screen_height / self.reference_height if self.reference_height else 1.0
+        return {
+            'min_area': self.min_area * factor * factor,
+            'max_area': self.max_area * factor * factor if self.max_area is not None else None,
+            'bar_thickness': max(1, int(round(self.min_bar_thickness * factor))),
+            'bar_distance': self.min_bar_distance * factor,
+        }
+
+    def _find_forms(self, mask, thresholds, offset=(0, 0)):
+        """
+        candidate_engine の方法で候補を抽出し、条件を満たすフォームを返す
+
+        Returns:
+            tuple: (検出されたフォーム情報のリスト, 候補（輪郭・連結成分）の数)
+        """
+        return self.forms_from_candidates(mask, self.find_candidates(mask), thresholds, offset)
+
+    def find_candidates(self, mask):
+        """
+        色マスクから候補を抽出（形状の条件は適用しない）
+
+        同じ色マスクと candidate_engine を使う複数の検出器で結果を共有できます。
+
+        Returns:
+            'contours' の場合は輪郭のリスト。'components' の場合は
+            (連結成分の数, ラベル画像, 統計, ラベル付けした範囲の左上座標) または None（色なし）
+        """
+        with self.time_stage('contours'):
+            if self.candidate_engine == 'components':
+                # ラベル画像の作成は画素数に比例するため、色のある範囲だけをラベル付けする
+                left, top, width, height = cv2.boundingRect(mask)
+                if width == 0:
+                    return None
+                count, labels, stats, _ = cv2.connectedComponentsWithStats(
+                    mask[top:top+height, left:left+width], connectivity=8)
+                return count, labels, stats, (left, top)
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            return contours
+
+    def forms_from_candidates(self, mask, candidates, thresholds, offset=(0, 0)):
+        """
+        find_candidates() の結果に面積・アスペクト比・横バーの条件を適用
 
-        # 条件に合う輪郭を検索
+        Returns:
+            tuple: (検出されたフォーム情報のリスト, 候補（輪郭・連結成分）の数)
+        """
+        if self.candidate_engine == 'components':
+            return self._filter_components(mask, candidates, thresholds, offset)
+        return self._filter_contours(mask, candidates, thresholds, offset), len(candidates)
+
+    def _filter_contours(self, mask, contours, thresholds, offset=(0, 0)):
+        """
+        面積・アスペクト比・横バーの条件を満たす輪郭を抽出
+
+        Args:
+            mask: 色マスク
+            contours: mask から検出した輪郭
+            thresholds: scaled_thresholds() の戻り値
+            offset: mask が部分領域の場合、その左上座標 (x, y)
+
+        Returns:
+            list: 検出されたフォーム情報のリスト
+        """
         detected_forms = []
         for contour in contours:
             area = cv2.contourArea(contour)
+            form = self._verify_candidate(mask, contour, area, cv2.boundingRect(contour), thresholds, offset)
+            if form is not None:
+                detected_forms.append(form)
+        return detected_forms
 
-            # 面積チェック（最小）
-            if area < self.min_area:
-                continue
+    def _filter_components(self, mask, components, thresholds, offset=(0, 0)):
+        """
+        連結成分の統計で候補を一括して絞り込み、残った候補だけ輪郭を作って検証
 
-            # 面積チェック（最大）
-            if self.max_area is not None and area > self.max_area:
-                continue
+        輪郭の面積は外接矩形の面積以下なので、矩形の面積が min_area 未満の成分と
+        アスペクト比が範囲外の成分は輪郭を作らずに除外できます。
 
-            # バウンディングボックスを取得
-            x, y, w, h = cv2.boundingRect(contour)
+        Returns:
+            tuple: (検出されたフォーム情報のリスト, 連結成分の数)
+        """
+        if components is None:
+            return [], 0
+        count, labels, stats, (left, top) = components
+        xs = stats[1:, cv2.CC_STAT_LEFT]
+        ys = stats[1:, cv2.CC_STAT_TOP]
+        ws = stats[1:, cv2.CC_STAT_WIDTH]
+        hs = stats[1:, cv2.CC_STAT_HEIGHT]
+
+        aspect = ws / hs
+        keep = ((ws * hs >= thresholds['min_area'])
+                & (aspect >= self.aspect_ratio_range[0])
+                & (aspect <= self.aspect_ratio_range[1]))
 
-            # アスペクト比チェック
-            aspect_ratio = w / h if h > 0 else 0
-            if not (self.aspect_ratio_range[0] <= aspect_ratio <= self.aspect_ratio_range[1]):
-                continue
+        detected_forms = []
+        for index in np.flatnonzero(keep):
+            x, y, w, h = int(xs[index]), int(ys[index]), int(ws[index]), int(hs[index])
+            component = (labels[y:y+h, x:x+w] == index + 1).view(np.uint8)
+            x, y = x + left, y + top
+            contours, _ = cv2.findContours(component, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE,
+                                           offset=(x, y))
+            contour = max(contours, key=len)
+            area = cv2.contourArea(contour)
+            form = self._verify_candidate(mask, contour, area, (x, y, w, h), thresholds, offset)
+            if form is not None:
+                detected_forms.append(form)
+        return detected_forms, count - 1
 
-            # 横バー検出による追加検証
-            # ROI内で横方向に広がる青紫バーの存在を確認
-            roi_mask = mask[y:y+h, x:x+w]
-            y_counts = np.sum(roi_mask > 0, axis=1)
-            threshold_width = w * 0.7  # 幅の70%以上が青紫
+    def _verify_candidate(self, mask, contour, area, bbox, thresholds, offset=(0, 0)):
+        """
+        1つの候補に面積・アスペクト比・横バーの条件を適用
 
-            # 横バーの検出（連続する行をグループ化）
-            horizontal_bars = []
-            for row_idx in range(len(y_counts)):
-                if y_counts[row_idx] >= threshold_width:
-                    horizontal_bars.append(row_idx)
+        Returns:
+            dict: 条件を満たすフォーム情報。満たさない場合は None
+        """
+        # 面積チェック（最小）
+        if area < thresholds['min_area']:
+            return None
+
+        # 面積チェック（最大）
+        if thresholds['max_area'] is not None and area > thresholds['max_area']:
+            return None
+
+        # アスペクト比チェック
+        x, y, w, h = bbox
+        aspect_ratio = w / h if h > 0 else 0
+        if not (self.aspect_ratio_range[0] <= aspect_ratio <= self.aspect_ratio_range[1]):
+            return None
+
+        # 横バー検出による追加検証
+        bars = self._check_horizontal_bars(mask[y:y+h, x:x+w], w, thresholds)
+        if bars is None:
+            return None
+        bar_count, bar_distance = bars
+
+        ox, oy = offset
+        if ox or oy:
+            contour = contour + np.array([ox, oy], dtype=contour.dtype)
+
+        # 条件を満たすフォームを記録
+        return {
+            'contour': contour,
+            'area': area,
+            'bbox': (x + ox, y + oy, w, h),
+            'aspect_ratio': aspect_ratio,
+            'bar_count': bar_count,
+            'bar_distance': bar_distance
+        }
 
-            if not horizontal_bars:
-                continue  # 横バーがない場合はスキップ
+    def _check_horizontal_bars(self, roi_mask, w, thresholds):
+        """
+        ROI内で横方向に広がる青紫バー（フォーム上下の固定バー）を確認
 
-            # 連続する行をグループ化
-            bar_groups = []
-            current_group = [horizontal_bars[0]]
+        Returns:
+            tuple: (太いバーの数, 上下バー間の距離)。条件を満たさない場合は None
+        """
+        # 上下に2つ以上の太いバーがあり、その間隔がフォームの高さとして妥当か
+        with self.time_stage('bars'):
+            return check_form_bars(roi_mask, self.bar_width_ratio,
+                                   min_thickness=thresholds['bar_thickness'],
+                                   min_distance=thresholds['bar_distance'],
+                                   width=w)
+
+    def _detect_coarse_to_fine(self, image, thresholds):
+        """
+        縮小画像で候補領域を探し、候補の周辺だけを等倍で検証する
 
-            for row_idx in horizontal_bars[1:]:
-                if row_idx == current_group[-1] + 1:
-                    current_group.append(row_idx)
-                else:
-                    bar_groups.append(current_group)
-                    current_group = [row_idx]
-            bar_groups.append(current_group)
+        色マスクは等倍で作り、面積平均で縮小して1画素でも範囲内の色を含むブロックを
+        残します（画像を先に縮小すると1〜2ピクセルの細い枠が間引かれて消え、
+        上下のバーが別々の領域になってアスペクト比で落ちるため）。
+        さらに膨張処理でつなげたうえで緩い条件（面積・アスペクト比）で候補を拾い、
+        最終判定は等倍のマスクの候補領域で通常と同じ条件を適用します。
+        """
+        scale = self.detection_scale
+        full_mask = self.color_mask(image)
+        with self.time_stage('mask'):
+            small_mask = cv2.resize(full_mask, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            small_mask = cv2.threshold(small_mask, 0, 255, cv2.THRESH_BINARY)[1]
+            small_mask = cv2.dilate(small_mask, self._coarse_kernel)
+        with self.time_stage('contours'):
+            if self.candidate_engine == 'components':
+                boxes = cv2.connectedComponentsWithStats(small_mask, connectivity=8)[2][1:, :4].tolist()
+            else:
+                contours, _ = cv2.findContours(small_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+                boxes = [cv2.boundingRect(contour) for contour in contours]
 
-            # 高さ10px以上の太いバーのみを抽出
-            thick_bars = [group for group in bar_groups if len(group) >= 10]
+        full_h, full_w = image.shape[:2]
+        inv = 1.0 / scale
+        pad = int(np.ceil(2 * inv)) + 4
+        min_bbox_area = thresholds['min_area'] * 0.5 * scale * scale
+        aspect_lo = self.aspect_ratio_range[0] * 0.75
+        aspect_hi = self.aspect_ratio_range[1] * 1.25
 
-            # 上下に2つ以上の太いバーがあることを確認（フォームの上下バー）
-            if len(thick_bars) < 2:
+        detected_forms = []
+        seen_bboxes = set()
+        for x, y, w, h in boxes:
+            if w * h < min_bbox_area or h == 0:
                 continue
-
-            # 上端と下端のバーの位置を確認
-            top_bar = thick_bars[0]
-            bottom_bar = thick_bars[-1]
-            bar_distance = bottom_bar[0] - top_bar[-1]
-
-            # 上下バー間の距離が妥当か（50px以上、フォームの高さとして妥当）
-            if bar_distance < 50:
+            if not (aspect_lo <= w / h <= aspect_hi):
                 continue
 
-            # 条件を満たすフォームを記録
-            detected_forms.append({
-                'contour': contour,
-                'area': area,
-                'bbox': (x, y, w, h),
-                'aspect_ratio': aspect_ratio,
-                'bar_count': len(thick_bars),
-                'bar_distance': bar_distance
-            })
+            # 等倍座標の候補領域（余白付き）
+            left = max(0, int(x * inv) - pad)
+            top = max(0, int(y * inv) - pad)
+            right = min(full_w, int((x + w) * inv) + pad)
+            bottom = min(full_h, int((y + h) * inv) + pad)
+
+            roi_mask = full_mask[top:bottom, left:right]
+            for form in self._find_forms(roi_mask, thresholds, offset=(left, top))[0]:
+                if form['bbox'] in seen_bboxes:
+                    continue
+                seen_bboxes.add(form['bbox'])
+                detected_forms.append(form)
 
-        # デバッグ情報
         debug_info = {
-            'total_contours': len(contours),
+            'total_contours': len(boxes),
             'matched_forms': len(detected_forms),
-            'color_pixels': cv2.countNonZero(mask)
+            'color_pixels': cv2.countNonZero(full_mask),
+            'scale': scale
         }
 
-        is_detected = len(detected_forms) > 0
+        return len(detected_forms) > 0, detected_forms, debug_info
+
+    def color_mask(self, image):
+        """
+        検出色範囲の色マスクを作成（color_matcher の方法で）
+
+        Args:
+            image: numpy配列の画像データ (BGR または mssのBGRA)
 
+        Returns:
+            numpy配列: 色マスク（255=範囲内）
+        """
+        if self.color_lut is not None:
+            with self.time_stage('mask'):
+                return self.color_lut.mask(image)
+        with self.time_stage('convert'):
+            hsv = self._to_hsv(image)
+        with self.time_stage('mask'):
+            return cv2.inRange(hsv, self.hsv_lower, self.hsv_upper)
+
+    def time_stage(self, stage):
+        """
+        処理段階の所要時間を metrics に記録するコンテキストマネージャ（metrics がなければ何もしない）
+
+        Args:
+            stage: 処理段階の名前（metrics.STAGES のいずれか）
+        """
+        return self.metrics.stage(stage) if self.metrics else _NO_TIMER
+
+    def _to_hsv(self, image):
+        """BGR/BGRA画像をHSVに変換（BGRAの中間BGRバッファは使い回す）"""
+        if image.ndim == 3 and image.shape[2] == 4:
+            buffer = self._bgr_buffers.get(image.shape[:2])
+            if buffer is None:
+                if len(self._bgr_buffers) >= 8:
+                    # 追跡ウィンドウのサイズは毎回変わるので溜め込まない
+                    self._bgr_buffers.clear()
+                buffer = self._bgr_buffers[image.shape[:2]] = np.empty(image.shape[:2] + (3,), dtype=np.uint8)
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR, dst=buffer)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+
+    def next_capture_region(self):
+        """次にキャプチャする領域を返す（追跡ウィンドウ。全画面で取得すべき場合は None）"""
+        # パイプライン実行では状態遷移スレッドが書き換えるので、一度だけ読んでから使う
+        track_bbox = self._track_bbox
+        full_size = self._full_frame_size
+        state = self.state
+        if not self.tracking or track_bbox is None or full_size is None:
+            return None
+        if state not in (self.STATE_DETECTING, self.STATE_CAPTURED):
+            return None
+        if self._frames_since_full >= self.tracking_full_frame_interval:
+            return None
+
+        x, y, w, h = track_bbox
+        pad = self.tracking_padding
+        full_w, full_h = full_size
+        left = max(0, x - pad)
+        top = max(0, y - pad)
+        right = min(full_w, x + w + pad)
+        bottom = min(full_h, y + h + pad)
+        return (left, top, right - left, bottom - top)
+
+    def _detect_frame(self, frame):
+        """フレームを検出し、部分キャプチャの座標を全画面座標に戻す"""
+        if (self.change_detector is not None
+                and not self.change_detector.has_changed(frame.image, key=frame.offset)
+                and self._last_detection is not None):
+            # 前フレームから変化なし → 前回の検出結果を再利用
+            self.detection_stats['skipped'] += 1
+            if self.metrics:
+                self.metrics.increment('skips')
+            is_detected, detected_forms, debug_info = self._last_detection
+            return is_detected, detected_forms, dict(debug_info, skipped=True)
+
+        started = time.perf_counter()
+        is_detected, detected_forms, debug_info = self.detect_target_form(
+            frame.image, screen_height=frame.full_size[1])
+        self.detection_stats['executed'] += 1
+        self.detection_stats['detect_seconds'] += time.perf_counter() - started
+        ox, oy = frame.offset
+        if ox or oy:
+            for form in detected_forms:
+                x, y, w, h = form['bbox']
+                form['bbox'] = (x + ox, y + oy, w, h)
+                form['contour'] = form['contour'] + np.array([ox, oy], dtype=form['contour'].dtype)
+        self._last_detection = (is_detected, detected_forms, debug_info)
         return is_detected, detected_forms, debug_info
 
+    def print_scheduler_stats(self):
+        """デッドライン超過とジッターの統計を表示"""
+        if self.scheduler is None or self.scheduler.ticks == 0:
+            return
+        stats = self.scheduler.stats()
+        print(f"ポーリング: {stats['ticks']:,}回 | デッドライン超過: {stats['missed']:,}回")
+        print(f"ジッター: 平均 {stats['mean_lateness'] * 1000:.1f}ms | "
+              f"p95 {stats['p95_lateness'] * 1000:.1f}ms | 最大 {stats['max_lateness'] * 1000:.1f}ms")
+
+    def print_detection_stats(self, elapsed):
+        """
+        検出の実行回数・省略回数と推定削減時間を表示
+
+        Args:
+            elapsed: 実行時間（秒）
+        """
+        stats = self.detection_stats
+        executed, skipped = stats['executed'], stats['skipped']
+        if executed + skipped == 0:
+            return
+        average = stats['detect_seconds'] / executed if executed else 0.0
+        saved = average * skipped
+        per_hour = saved / elapsed * 3600 if elapsed > 0 else 0.0
+        print(f"検出実行: {executed:,}回 | 省略: {skipped:,}回 ({skipped / (executed + skipped):.0%})")
+        print(f"平均検出時間: {average * 1000:.1f}ms | 推定削減CPU時間: {saved:.1f}秒 (1時間あたり {per_hour:.0f}秒)")
+
+    def grab_and_detect(self, source):
+        """
+        フレームを取得してフォームを検出（追跡モードでは前回位置の周辺だけを解析）
+
+        Returns:
+            tuple: (フレーム, 検出されたか, 検出された輪郭情報のリスト, デバッグ情報)。
+                   ソースが尽きた場合はフレームが None
+        """
+        with self.time_stage('capture'):
+            frame = source.grab(self.next_capture_region())
+        if frame is None:
+            return None, False, [], {}
+        return self.analyze_frame(frame, source)
+
+    def analyze_frame(self, frame, source=None):
+        """
+        取得済みのフレームからフォームを検出し、追跡ウィンドウを更新
+
+        Args:
+            frame: 検出するフレーム
+            source: 追跡ウィンドウで見失ったときに全画面を取得し直すフレームソース。
+                    None の場合はフレームが持つ元画像だけを使う
+
+        Returns:
+            tuple: (フレーム, 検出されたか, 検出された輪郭情報のリスト, デバッグ情報)。
+                   ソースが尽きた場合はフレームが None
+        """
+        if self.metrics:
+            self.metrics.increment('frames')
+        if frame.is_partial:
+            self._frames_since_full += 1
+        else:
+            self._frames_since_full = 0
+            self._full_frame_size = frame.size
+
+        is_detected, detected_forms, debug_info = self._detect_frame(frame)
+
+        if not is_detected and frame.is_partial:
+            # 追跡ウィンドウで見失った → 全画面で再取得
+            full = frame.to_full_frame()
+            if full is None and source is not None:
+                full = source.grab()
+            if full is None and source is not None:
+                return None, False, [], {}
+            if full is not None:
+                frame = full
+                self._frames_since_full = 0
+                self._full_frame_size = frame.size
+                is_detected, detected_forms, debug_info = self._detect_frame(frame)
+
+        if is_detected:
+            xs = [f['bbox'][0] for f in detected_forms]
+            ys = [f['bbox'][1] for f in detected_forms]
+            x2 = [f['bbox'][0] + f['bbox'][2] for f in detected_forms]
+            y2 = [f['bbox'][1] + f['bbox'][3] for f in detected_forms]
+            self._track_bbox = (min(xs), min(ys), max(x2) - min(xs), max(y2) - min(ys))
+        else:
+            self._track_bbox = None
+
+        debug_info['tracking'] = frame.is_partial
+        return frame, is_detected, detected_forms, debug_info
+
+    def full_frame(self, source, frame):
+        """部分キャプチャのフレームに対応する全画面フレームを返す（必要なら取得し直す）"""
+        full = frame.to_full_frame()
+        if full is None:
+            full = source.grab()
+        return full
+
+    def create_frame_source(self):
+        """使用するフレームソースを返す（未指定ならmssで画面キャプチャ）"""
+        if self.frame_source is not None:
+            return self.frame_source
+        return MssFrameSource(region=self.capture_region, monitor_index=self.monitor_index)
+
     def capture_screen(self):
         """画面をキャプチャして返す"""
-        with mss() as sct:
-            if self.capture_region:
-                monitor = self.capture_region
-            else:
-                monitor = sct.monitors[1]  # メインモニター
-
-            screenshot = sct.grab(monitor)
-            # PIL Imageに変換
-            img = Image.frombytes('RGB', screenshot.size, screenshot.rgb)
-            # OpenCV形式(BGR)に変換
-            img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-            return img, img_cv
+        if self._active_source is not None:
+            frame = self._active_source.grab()
+        else:
+            with self.create_frame_source() as source:
+                frame = source.grab()
+        return frame.to_pil(), frame.bgr
 
     def save_screenshot(self, image):
-        """スクリーンショットを保存"""
+        """
+        スクリーンショットを保存
+
+        Args:
+            image: PIL Image または frame_source.Frame（保存時に初めてPIL Imageを作成）
+
+        image_writer が指定されている場合はBGR配列のまま書き込みプールに渡し、
+        エンコードと書き込みはバックグラウンドで行います。
+
+        Returns:
+            str: 保存したファイル名（重複で保存を省略した場合は既存のファイル名）。
+                 書き込みキューが満杯で破棄された場合は None
+        """
+        with self.time_stage('save'):
+            return self._save_screenshot(image)
+
+    def _save_screenshot(self, image):
+        if not isinstance(image, Frame):
+            # PIL Image で渡された場合
+            image = Frame(cv2.cvtColor(np.asarray(image.convert('RGB')), cv2.COLOR_RGB2BGR), self.clock())
+
+        image_hash = None
+        if self.deduplicator:
+            image_hash = self.deduplicator.compute_hash(image.image, image.detected_forms)
+            duplicate = self.deduplicator.find_duplicate(image_hash)
+            if duplicate and self.deduplicator.mode == 'skip':
+                self.deduplicator.count_skipped()
+                print(f"[重複] 既存の撮影とほぼ同じため保存を省略: {duplicate}")
+                self._log_event('duplicate', image.timestamp, file=duplicate)
+                return duplicate
+        else:
+            duplicate = None
+
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.screenshot_count += 1
-        filename = f"{self.save_dir}/screenshot_{self.screenshot_count:04d}_{timestamp}.png"
-        image.save(filename)
-        print(f"[OK] スクリーンショット保存: {filename}")
+        extension = self.image_writer.extension if self.image_writer else ".png"
+        filename = f"{self.save_dir}/{self.filename_prefix}_{self.screenshot_count:04d}_{timestamp}{extension}"
+
+        if duplicate:
+            # 既存ファイルへのハードリンクを作る（リンク元が書き込み待ちならそのファイルだけ待つ）
+            if self.image_writer:
+                self.image_writer.wait_for(duplicate)
+            extension = os.path.splitext(duplicate)[1]
+            filename = os.path.splitext(filename)[0] + extension
+            if self.deduplicator.link(duplicate, filename):
+                print(f"[重複] ハードリンクを作成: {filename} → {duplicate}")
+            else:
+                self.screenshot_count -= 1
+                return duplicate
+        elif self.image_writer:
+            # BGR配列のままバックグラウンドでエンコード・書き込み
+            if not self.image_writer.submit(image.bgr, filename):
+                # 書き込みキューが満杯で破棄された（ファイルは作られない）
+                self.screenshot_count -= 1
+                return None
+            print(f"[OK] スクリーンショット保存（書き込み待ち）: {filename}")
+        else:
+            image.to_pil().save(filename)
+            print(f"[OK] スクリーンショット保存: {filename}")
+
+        # 書き込みが受け付けられたファイルだけを重複判定の対象にする
+        if self.deduplicator and not duplicate:
+            self.deduplicator.add(image_hash, filename)
+
+        if self.metrics:
+            self.metrics.increment('captures')
+        self._log_event('capture', image.timestamp, file=filename, linked_to=duplicate,
+                        forms=[list(form['bbox']) for form in image.detected_forms or []])
 
         # GUIを更新
         if self.gui:
-            self.gui.update_counter(self.screenshot_count)
-            self.gui.flash_capture()
+            with self.time_stage('gui'):
+                self.gui.update_counter(self.screenshot_count)
+                self.gui.flash_capture()
 
         # 音を鳴らす（オプション）
         try:
@@ -234,14 +792,181 @@ class AutoScreenshot:
 
         return filename
 
+    def handle_detection(self, frame, is_detected, detected_forms, debug_info, full_frame=None, save=None):
+        """
+        検出結果を状態遷移に反映（待機中 → 検出中 → 撮影完了 → クールダウン）
+
+        Args:
+            frame: 検出したフレーム（frame.timestamp を現在時刻として扱う）
+            is_detected: フォームが検出されたか
+            detected_forms: 検出されたフォーム情報のリスト
+            debug_info: detect_target_form のデバッグ情報
+            full_frame: 部分キャプチャのフレームを保存するときに全画面フレームを返す関数
+            save: 撮影を実行する関数。None=save_screenshot
+        """
+        current_time = frame.timestamp  # キャプチャ時刻（単調増加クロック）
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        if self.name:
+            timestamp = f"{timestamp}|{self.name}"
+        if self.event_log:
+            self._count_for_summary(current_time)
+
+        # 状態別の処理
+        if self.state == self.STATE_WAITING:
+            # 待機中：フォームの出現を待つ
+            if is_detected:
+                info = f"{self.detection_time}秒間確認します"
+                self.change_state_at(current_time, self.STATE_DETECTING, info)
+                self.detection_start_time = current_time
+                print(f"\n[{timestamp}] フォーム検出！ {info}")
+            else:
+                info = f"色px: {debug_info['color_pixels']:,} | 輪郭: {debug_info['total_contours']}"
+                self._update_gui_state('waiting', info)
+                self.console.update(f"[{timestamp}] [待機中] {info}")
+
+        elif self.state == self.STATE_DETECTING:
+            # 検出中：一定時間フォームが表示され続けることを確認
+            elapsed = current_time - self.detection_start_time
+
+            # キャンセルリクエストをチェック
+            if self.cancel_capture_requested:
+                print(f"\n[{timestamp}] ✕ ユーザーが撮影をキャンセルしました")
+                self.cancel_capture_requested = False
+                self._log_event('cancel', current_time, reason='user', elapsed=round(elapsed, 3))
+                self.change_state_at(current_time, self.STATE_WAITING, "")
+            elif is_detected:
+                remaining = self.detection_time - elapsed
+                if remaining > 0:
+                    forms_info = f"{len(detected_forms)}個" if detected_forms else "0個"
+                    info = f"撮影まであと {remaining:.1f}秒 | フォーム: {forms_info}"
+                    self._update_gui_state('detecting', info)
+                    self.console.update(f"[{timestamp}] [検出中] {info}")
+                else:
+                    # 撮影実行
+                    print(f"\n[{timestamp}] ✓ 撮影実行！")
+                    if frame.is_partial:
+                        # 追跡ウィンドウのフレームなので保存用に全画面を取得
+                        full = full_frame() if full_frame else frame.to_full_frame()
+                        frame = full or frame
+                    frame.detected_forms = detected_forms
+                    (save or self.save_screenshot)(frame)
+                    self.change_state_at(current_time, self.STATE_CAPTURED, "フォームの消失を待機中")
+                    self.disappear_start_time = None
+            else:
+                # 検出が途切れた
+                print(f"\n[{timestamp}] ✗ フォームが消えました（撮影キャンセル）")
+                self._log_event('cancel', current_time, reason='disappeared', elapsed=round(elapsed, 3))
+                self.change_state_at(current_time, self.STATE_WAITING, "")
+
+        elif self.state == self.STATE_CAPTURED:
+            # 撮影完了：フォームが消えるのを待つ
+            if not is_detected:
+                # フォームが消え始めた
+                if self.disappear_start_time is None:
+                    self.disappear_start_time = current_time
+                    print(f"[{timestamp}] フォームが消え始めました。{self.disappear_check_time}秒間確認します...")
+
+                elapsed_disappear = current_time - self.disappear_start_time
+                remaining = self.disappear_check_time - elapsed_disappear
+                if elapsed_disappear >= self.disappear_check_time:
+                    # 完全に消えたことを確認
+                    print(f"[{timestamp}] ✓ フォームの消失を確認。クールダウン開始...")
+                    self.change_state_at(current_time, self.STATE_COOLDOWN, f"{self.cooldown_time}秒")
+                else:
+                    info = f"消失確認中 あと {remaining:.1f}秒"
+                    self._update_gui_state('captured', info)
+                    self.console.update(f"[{timestamp}] [消失確認中] {info}")
+            else:
+                # フォームが再び検出された（消失タイマーをリセット）
+                if self.disappear_start_time is not None:
+                    print(f"\n[{timestamp}] ⚠ フォームが再検出されました（消失タイマーリセット）")
+                self.disappear_start_time = None
+                forms_info = f"{len(detected_forms)}個" if detected_forms else "0個"
+                info = f"フォーム: {forms_info}"
+                self._update_gui_state('captured', info)
+                self.console.update(f"[{timestamp}] [消失待機中] {info}")
+
+        elif self.state == self.STATE_COOLDOWN:
+            # クールダウン：再検出を防ぐための待機期間
+            elapsed_cooldown = current_time - self.state_start_time
+            remaining_cooldown = self.cooldown_time - elapsed_cooldown
+
+            if remaining_cooldown > 0:
+                info = f"あと {remaining_cooldown:.1f}秒"
+                self._update_gui_state('cooldown', info)
+                self.console.update(f"[{timestamp}] [クールダウン] {info}")
+            else:
+                print(f"\n[{timestamp}] クールダウン終了。次の検出待機に戻ります。")
+                self.change_state_at(current_time, self.STATE_WAITING, "")
+
+        if self.overlay:
+            self._update_overlay(frame, detected_forms, current_time)
+
     def change_state(self, new_state, info=""):
         """状態を変更"""
+        self.change_state_at(self.clock(), new_state, info)
+
+    def change_state_at(self, current_time, new_state, info=""):
+        """状態を変更（状態の開始時刻を指定）"""
+        self._log_event('transition', current_time, info=info, elapsed=round(current_time - self.state_start_time, 3),
+                        **{'from': self.state, 'to': new_state})
         self.state = new_state
-        self.state_start_time = time.time()
+        self.state_start_time = current_time
 
         # GUIを更新
+        self._update_gui_state(new_state, info)
+
+    def _log_event(self, event, current_time, **fields):
+        """イベントログに記録（event_log がなければ何もしない）"""
+        if self.event_log:
+            self.event_log.log(event, time=round(current_time, 3), name=self.name, **fields)
+
+    def _count_for_summary(self, current_time):
+        """定期集計のためにフレームを数え、summary_interval ごとに集計を記録（フレームごとに呼ぶ）"""
+        if self._summary_start is None:
+            self._summary_start = current_time
+            self._summary_base = self._summary_totals()
+        self._summary_states[self.state] = self._summary_states.get(self.state, 0) + 1
+        interval = self.event_log.summary_interval
+        if interval and current_time - self._summary_start >= interval:
+            self.log_summary(current_time)
+
+    def _summary_totals(self):
+        stats = self.detection_stats
+        return stats['executed'], stats['skipped'], stats['detect_seconds'], self.screenshot_count
+
+    def log_summary(self, current_time):
+        """前回の集計からのフレーム数・状態ごとのフレーム数・検出時間・撮影数をイベントログに記録"""
+        if not self.event_log or self._summary_start is None:
+            return
+        executed, skipped, detect_seconds, captures = (
+            now - base for now, base in zip(self._summary_totals(), self._summary_base))
+        self._log_event('summary', current_time,
+                        period=round(current_time - self._summary_start, 3),
+                        frames=sum(self._summary_states.values()),
+                        states=dict(self._summary_states),
+                        executed=executed,
+                        skipped=skipped,
+                        detect_ms_mean=round(detect_seconds / executed * 1000, 3) if executed else None,
+                        captures=captures)
+        self._summary_start = current_time
+        self._summary_states = {}
+        self._summary_base = self._summary_totals()
+
+    def _update_overlay(self, frame, detected_forms, current_time):
+        """検出枠オーバーレイに今回の検出結果を渡す（次の判定で撮影する場合は撮影準備完了として表示）"""
+        is_ready = False
+        if self.state == self.STATE_DETECTING:
+            remaining = self.detection_time - (current_time - self.detection_start_time)
+            is_ready = remaining <= self.state_intervals.get(self.state, self.check_interval)
+        with self.time_stage('gui'):
+            self.overlay.update(detected_forms, is_ready_to_capture=is_ready, frame_size=frame.full_size)
+
+    def _update_gui_state(self, state, info=""):
+        """GUIの状態表示を更新（GUIがなければ何もしない）"""
         if self.gui:
-            self.gui.update_state(new_state, info)
+            with self.time_stage('gui'):
+                self.gui.update_state(state, info)
 
     def on_pause_toggle(self, is_paused):
         """一時停止/再開のコールバック"""
@@ -261,30 +986,94 @@ class AutoScreenshot:
         print("\n[✕] 撮影キャンセルリクエストを受信")
         self.cancel_capture_requested = True
 
-    def run(self, duration=None, use_gui=True):
-        """
-        自動スクリーンショット撮影を開始（状態遷移ベース）
-
-        Args:
-            duration: 実行時間（秒）。Noneの場合は無限に実行
-            use_gui: GUIを使用するかどうか
-        """
+    def print_settings(self, use_gui=True):
+        """設定内容を表示"""
         print("=" * 70)
         print("自動スクリーンショット撮影プログラム（状態遷移型）")
         print("=" * 70)
         print(f"検出色範囲 (HSV): {self.hsv_lower} 〜 {self.hsv_upper}")
         print(f"面積範囲: {self.min_area:,} 〜 {self.max_area:,} ピクセル" if self.max_area else f"最小面積: {self.min_area:,} ピクセル")
         print(f"アスペクト比範囲: {self.aspect_ratio_range}")
+        if self.candidate_engine != 'contours':
+            print(f"候補抽出: {self.candidate_engine}")
+        if self.color_matcher != 'hsv':
+            print(f"色判定: {self.color_matcher}")
         print(f"検出確認時間: {self.detection_time}秒")
         print(f"消失確認時間: {self.disappear_check_time}秒")
         print(f"クールダウン時間: {self.cooldown_time}秒")
         print(f"保存先: {self.save_dir}/")
         print(f"チェック間隔: {self.check_interval}秒")
+        if self.state_intervals:
+            print(f"状態別チェック間隔: {self.state_intervals}")
         print("\n状態遷移:")
         print("  待機中 → 検出中 → 撮影完了 → 消失待機 → クールダウン → 待機中")
         print("\nGUIウィンドウで操作可能" if use_gui else "\nCtrl+C で停止")
         print("=" * 70)
 
+    def _run_loop(self, source, duration, start_time, profiler=None):
+        """キャプチャ・検出・状態遷移・保存を1つのループで順に実行"""
+        paused = False
+        while True:
+            # 停止リクエストチェック
+            if self.stop_requested:
+                break
+
+            # 実行時間チェック
+            if duration and (self.clock() - start_time) > duration:
+                break
+
+            # 一時停止中はスキップ
+            if self.is_paused:
+                self.scheduler.idle('paused')
+                paused = True
+                continue
+            if paused:
+                # 一時停止から復帰したら現在時刻から刻み直す
+                self.scheduler.reset()
+                paused = False
+
+            if profiler:
+                profiler.begin_iteration()
+            state = self.state
+
+            # 画面をキャプチャしてフォームを検出（セッションは run() の間使い回す）
+            frame, is_detected, detected_forms, debug_info = self.grab_and_detect(source)
+            if frame is None:
+                print("\nフレームソースの終端に達しました")
+                break
+            self.handle_detection(
+                frame, is_detected, detected_forms, debug_info,
+                full_frame=lambda: self.full_frame(source, frame)
+            )
+
+            if profiler:
+                profiler.end_iteration(state, debug_info.get('total_contours', 0), is_detected)
+
+            # 次のデッドラインまで待機（間隔は状態ごと）
+            self.scheduler.wait(self.state)
+
+    def run(self, duration=None, use_gui=True, show_banner=True, profile=None):
+        """
+        自動スクリーンショット撮影を開始（状態遷移ベース）
+
+        Args:
+            duration: 実行時間（秒）。Noneの場合は無限に実行
+            use_gui: GUIを使用するかどうか
+            show_banner: 開始時に設定内容を表示するかどうか
+            profile: ポーリングループのプロファイル。反復回数、または loop_profiler.LoopProfiler。
+                     None=プロファイルしない（pipelined=True では使えない）
+        """
+        if profile is not None:
+            if self.pipelined:
+                raise ValueError("profile は pipelined=False のときだけ使えます")
+            if not isinstance(profile, LoopProfiler):
+                session = datetime.now().strftime("%Y%m%d_%H%M%S")
+                profile = LoopProfiler(iterations=profile,
+                                       session=f"{self.name}_{session}" if self.name else session)
+
+        if show_banner:
+            self.print_settings(use_gui)
+
         # GUIを起動
         if use_gui:
             try:
@@ -302,119 +1091,27 @@ class AutoScreenshot:
                 print("コンソールモードで続行します")
                 self.gui = None
 
-        start_time = time.time()
+        start_time = self.clock()
+        source = self.create_frame_source()
+        self.scheduler = PollingScheduler(self.check_interval, self.state_intervals,
+                                          clock=self.clock, sleep=self.sleep)
 
         try:
-            while True:
-                # 停止リクエストチェック
-                if self.stop_requested:
-                    break
-
-                # 実行時間チェック
-                if duration and (time.time() - start_time) > duration:
-                    break
-
-                # 一時停止中はスキップ
-                if self.is_paused:
-                    time.sleep(self.check_interval)
-                    continue
-
-                # 画面をキャプチャ
-                img_pil, img_cv = self.capture_screen()
-
-                # フォームを検出
-                is_detected, detected_forms, debug_info = self.detect_target_form(img_cv)
-                current_time = time.time()
-                timestamp = datetime.now().strftime("%H:%M:%S")
-
-                # 状態別の処理
-                if self.state == self.STATE_WAITING:
-                    # 待機中：フォームの出現を待つ
-                    if is_detected:
-                        info = f"{self.detection_time}秒間確認します"
-                        self.change_state(self.STATE_DETECTING, info)
-                        self.detection_start_time = current_time
-                        print(f"\n[{timestamp}] フォーム検出！ {info}")
-                    else:
-                        info = f"色px: {debug_info['color_pixels']:,} | 輪郭: {debug_info['total_contours']}"
-                        if self.gui:
-                            self.gui.update_state('waiting', info)
-                        print(f"[{timestamp}] [待機中] {info}", end='\r')
-
-                elif self.state == self.STATE_DETECTING:
-                    # 検出中：一定時間フォームが表示され続けることを確認
-                    elapsed = current_time - self.detection_start_time
-
-                    # キャンセルリクエストをチェック
-                    if self.cancel_capture_requested:
-                        print(f"\n[{timestamp}] ✕ ユーザーが撮影をキャンセルしました")
-                        self.cancel_capture_requested = False
-                        self.change_state(self.STATE_WAITING, "")
-                    elif is_detected:
-                        remaining = self.detection_time - elapsed
-                        if remaining > 0:
-                            forms_info = f"{len(detected_forms)}個" if detected_forms else "0個"
-                            info = f"撮影まであと {remaining:.1f}秒 | フォーム: {forms_info}"
-                            if self.gui:
-                                self.gui.update_state('detecting', info)
-                            print(f"[{timestamp}] [検出中] {info}", end='\r')
-                        else:
-                            # 撮影実行
-                            print(f"\n[{timestamp}] ✓ 撮影実行！")
-                            self.save_screenshot(img_pil)
-                            self.change_state(self.STATE_CAPTURED, "フォームの消失を待機中")
-                            self.disappear_start_time = None
-                    else:
-                        # 検出が途切れた
-                        print(f"\n[{timestamp}] ✗ フォームが消えました（撮影キャンセル）")
-                        self.change_state(self.STATE_WAITING, "")
-
-                elif self.state == self.STATE_CAPTURED:
-                    # 撮影完了：フォームが消えるのを待つ
-                    if not is_detected:
-                        # フォームが消え始めた
-                        if self.disappear_start_time is None:
-                            self.disappear_start_time = current_time
-                            print(f"[{timestamp}] フォームが消え始めました。{self.disappear_check_time}秒間確認します...")
-
-                        elapsed_disappear = current_time - self.disappear_start_time
-                        remaining = self.disappear_check_time - elapsed_disappear
-                        if elapsed_disappear >= self.disappear_check_time:
-                            # 完全に消えたことを確認
-                            print(f"[{timestamp}] ✓ フォームの消失を確認。クールダウン開始...")
-                            self.change_state(self.STATE_COOLDOWN, f"{self.cooldown_time}秒")
-                        else:
-                            info = f"消失確認中 あと {remaining:.1f}秒"
-                            if self.gui:
-                                self.gui.update_state('captured', info)
-                            print(f"[{timestamp}] [消失確認中] {info}", end='\r')
-                    else:
-                        # フォームが再び検出された（消失タイマーをリセット）
-                        if self.disappear_start_time is not None:
-                            print(f"\n[{timestamp}] ⚠ フォームが再検出されました（消失タイマーリセット）")
-                        self.disappear_start_time = None
-                        forms_info = f"{len(detected_forms)}個" if detected_forms else "0個"
-                        info = f"フォーム: {forms_info}"
-                        if self.gui:
-                            self.gui.update_state('captured', info)
-                        print(f"[{timestamp}] [消失待機中] {info}", end='\r')
-
-                elif self.state == self.STATE_COOLDOWN:
-                    # クールダウン：再検出を防ぐための待機期間
-                    elapsed_cooldown = current_time - self.state_start_time
-                    remaining_cooldown = self.cooldown_time - elapsed_cooldown
-
-                    if remaining_cooldown > 0:
-                        info = f"あと {remaining_cooldown:.1f}秒"
-                        if self.gui:
-                            self.gui.update_state('cooldown', info)
-                        print(f"[{timestamp}] [クールダウン] {info}", end='\r')
-                    else:
-                        print(f"\n[{timestamp}] クールダウン終了。次の検出待機に戻ります。")
-                        self.change_state(self.STATE_WAITING, "")
-
-                # 待機
-                time.sleep(self.check_interval)
+            source.open()
+            self._active_source = source
+            if self.metrics:
+                self.metrics.start()
+            if self.overlay:
+                self.overlay.start()
+            if self.event_log:
+                self.event_log.start()
+                self._log_event('start', self.clock(), save_dir=self.save_dir,
+                                hsv_range=[self.hsv_lower.tolist(), self.hsv_upper.tolist()])
+
+            if self.pipelined:
+                FramePipeline(self).run(source, duration, start_time)
+            else:
+                self._run_loop(source, duration, start_time, profile)
 
         except KeyboardInterrupt:
             print("\n" + "=" * 70)
@@ -422,7 +1119,36 @@ class AutoScreenshot:
             print(f"合計 {self.screenshot_count} 枚のスクリーンショットを保存しました")
             print("=" * 70)
         finally:
+            self._active_source = None
+            source.close()
+            if profile is not None:
+                profile.finish()
+
+            # 書き込み待ちの画像を書き終えてから終了
+            if self.image_writer:
+                self.image_writer.flush()
+                self.image_writer.print_stats()
+            if self.deduplicator:
+                self.deduplicator.print_stats()
+
+            if self.change_detector is not None:
+                self.print_detection_stats(self.clock() - start_time)
+            self.print_scheduler_stats()
+            if self.metrics:
+                try:
+                    self.metrics.stop()
+                except OSError as e:
+                    print(f"⚠ メトリクスの書き出しに失敗: {e}")
+                self.metrics.print_stats()
+            if self.event_log:
+                self.log_summary(self.clock())
+                self._log_event('stop', self.clock(), screenshots=self.screenshot_count)
+                self.event_log.close()
+                self.event_log.print_stats()
+
             # GUIをクリーンアップ
+            if self.overlay:
+                self.overlay.stop()
             if self.gui:
                 self.gui.destroy()
                 print("GUI終了")
@@ -452,6 +1178,21 @@ def get_color_at_cursor():
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="特定の色の枠を検知して自動的にスクリーンショットを保存")
+    parser.add_argument('--detection-profile', metavar='FILE',
+                        help="calibrate_profile.py で作成した検出プロファイルのファイル")
+    parser.add_argument('--detection-profile-name', metavar='NAME',
+                        help="ファイル内の検出プロファイル名（省略時は先頭）")
+    parser.add_argument('--profile', type=int, nargs='?', const=300, metavar='N',
+                        help="ポーリングループのN反復をプロファイル（既定300、profiles/ に保存）")
+    parser.add_argument('--profile-skip', type=int, default=0, help="プロファイル開始までに読み飛ばす反復回数")
+    parser.add_argument('--profile-format', choices=('collapsed', 'pstats'), default='collapsed',
+                        help="collapsed=サンプリング（低負荷）, pstats=cProfile")
+    parser.add_argument('--overlay', action='store_true', help="検出したフォームの枠を画面に表示")
+    args = parser.parse_args()
+
     # 使用例
 
     # オプション1: 分析結果に基づいた設定（青緑系のフォーム検出）
@@ -481,5 +1222,26 @@ if __name__ == "__main__":
     #     check_interval=0.3
     # )
 
+    # オプション3: calibrate_profile.py で作成したプロファイルを読み込む
+    #   python auto_screenshot.py --detection-profile profiles.json [--detection-profile-name quiz]
+    if args.detection_profile:
+        auto_ss = AutoScreenshot.from_profile(
+            args.detection_profile,
+            name=args.detection_profile_name,
+            save_dir="C:/Users/imao3/Downloads/screenshot",
+            check_interval=0.5
+        )
+
+    # プロファイル（--profile N）: 遅い画面での検出の内訳を profiles/ に保存
+    profiler = None
+    if args.profile:
+        profiler = LoopProfiler(iterations=args.profile, skip=args.profile_skip,
+                                output_format=args.profile_format)
+
+    # 検出枠オーバーレイ（--overlay）: 検出ループの結果をそのまま表示
+    if args.overlay:
+        from detection_overlay import DetectionOverlay
+        auto_ss.overlay = DetectionOverlay(monitor_index=auto_ss.monitor_index)
+
     # 実行
-    auto_ss.run()
+    auto_ss.run(profile=profiler)
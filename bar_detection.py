@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+横バー検出 - フォーム上下の青紫バーを行ごとのランレングスで求める
+
+マスクの各行の青紫ピクセル数を数え、幅の一定割合以上の行が連続する区間を
+NumPy でまとめて求めます（行ごとのPythonループを使わない）。
+auto_screenshot.py と分析スクリプトで共通に使います。
+"""
+
+import numpy as np
+
+
+def find_horizontal_bars(roi_mask, width_ratio=0.7, width=None):
+    """
+    横バー（幅の width_ratio 以上が青紫の行が連続する区間）を検出
+
+    Args:
+        roi_mask: 候補領域のマスク（0以外が青紫）
+        width_ratio: 横バーとみなす行の青紫ピクセルの割合（幅に対する比率）
+        width: 割合の基準にする幅（省略時は roi_mask の幅）
+
+    Returns:
+        tuple: (開始行, 終了行（その行を含む）, 太さ) のnumpy配列。上から順
+    """
+    if width is None:
+        width = roi_mask.shape[1]
+    y_counts = np.count_nonzero(roi_mask, axis=1)
+    is_bar = y_counts >= width * width_ratio
+
+    # 前後に False を足して差分を取ると、連続区間の開始と終了の位置が得られる
+    edges = np.diff(np.concatenate(([False], is_bar, [False])).view(np.int8))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+    return starts, ends, ends - starts + 1
+
+
+def check_form_bars(roi_mask, width_ratio=0.7, min_thickness=10, min_distance=50, width=None):
+    """
+    フォームの上下に太い横バーがあるかを確認
+
+    Args:
+        roi_mask: 候補領域のマスク
+        width_ratio: 横バーとみなす行の青紫ピクセルの割合
+        min_thickness: 太いバーとみなす最小の太さ（px）
+        min_distance: 上端のバーの下端から下端のバーの上端までの最小距離（px）
+        width: 割合の基準にする幅（省略時は roi_mask の幅）
+
+    Returns:
+        tuple: (太いバーの数, 上下バー間の距離)。条件を満たさない場合は None
+    """
+    starts, ends, thickness = find_horizontal_bars(roi_mask, width_ratio, width)
+    thick = thickness >= min_thickness
+    if np.count_nonzero(thick) < 2:
+        return None
+
+    thick_starts, thick_ends = starts[thick], ends[thick]
+    bar_distance = int(thick_starts[-1] - thick_ends[0])
+    if bar_distance < min_distance:
+        return None
+    return len(thick_starts), bar_distance
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+検出ベンチマーク - detect_target_form とキャプチャ変換の処理時間を解像度別に計測
+
+合成フレーム（空の画面／同系色の小さな輪郭が多数ある画面／フォームのある画面）と
+記録済みフレームについて、p50/p95のレイテンシと1回あたりのメモリ確保量を計測し、
+p95 が予算（ミリ秒）を超えたら終了コード1で終了します。
+
+使い方:
+    python benchmark_detection.py
+    python benchmark_detection.py --resolutions 1080p 4k --iterations 50 --scale 0.25
+    python benchmark_detection.py --frames recorded_frames/ --budget-file budgets.json
+    python benchmark_detection.py --engines contours components --scenarios busy
+    python benchmark_detection.py --color-matchers hsv lut
+"""
+
+import sys
+import io
+# Windows環境での文字化け対策
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+import argparse
+import glob
+import json
+import os
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from auto_screenshot import AutoScreenshot
+from frame_source import Frame, draw_form, hsv_to_bgr, load_image
+
+
+RESOLUTIONS = {
+    '1080p': (1920, 1080),
+    '1440p': (2560, 1440),
+    '4k': (3840, 2160),
+    '5k': (5120, 2880),
+}
+
+# p95 の予算（ミリ秒）: {計測対象: {解像度: ms}}。記録済みフレームは 'recorded' キー
+DEFAULT_BUDGETS_MS = {
+    'detect': {'1080p': 25, '1440p': 45, '4k': 100, '5k': 180, 'recorded': 100},
+    'convert': {'1080p': 25, '1440p': 45, '4k': 100, '5k': 180, 'recorded': 100},
+}
+
+# 基準解像度（1080p）での検出設定。reference_height で各解像度に換算する
+DETECTOR_SETTINGS = {
+    'target_color_hsv_range': [(110, 40, 180), (125, 255, 255)],
+    'min_area': 30000,
+    'max_area': 200000,
+    'aspect_ratio_range': (1.0, 2.0),
+    'reference_height': 1080,
+}
+
+FORM_COLOR_HSV = (118, 60, 230)
+
+
+def make_frame(width, height, scenario, seed=0):
+    """
+    合成フレームを作成 (mss と同じ BGRA)
+
+    Args:
+        width: 幅
+        height: 高さ
+        scenario: 'empty'=フォームなし, 'busy'=同系色の小さな輪郭が多数, 'form'=有効なフォーム1つ
+        seed: 乱数シード
+    """
+    rng = np.random.default_rng(seed)
+    image = np.full((height, width, 4), 245, dtype=np.uint8)
+    color = hsv_to_bgr(FORM_COLOR_HSV) + (255,)
+    factor = height / 1080
+
+    if scenario in ('busy', 'form'):
+        # 同系色のUI部品（ボタン・アイコン・下線など）を画面全体にばらまく
+        # （大きさは一定、数は画素数に比例させて、解像度によらず密度を揃える）
+        count = int(1500 * factor * factor)
+        xs = rng.integers(0, width - 40, count)
+        ys = rng.integers(0, height - 20, count)
+        ws = rng.integers(2, 43, count)
+        hs = rng.integers(2, 19, count)
+        for x, y, w, h in zip(xs, ys, ws, hs):
+            cv2.rectangle(image, (int(x), int(y)), (int(x + w), int(y + h)), color, -1)
+        # テキスト風の黒い線
+        for y in range(0, height, int(24 * factor) + 1):
+            cv2.line(image, (int(40 * factor), y), (int(width * 0.6), y), (40, 40, 40, 255), 1)
+
+    if scenario == 'form':
+        w, h = int(360 * factor), int(260 * factor)
+        x, y = (width - w) // 2, (height - h) // 3
+        # フォームの周囲は余白（UI部品がフォームとつながらないように）
+        margin = int(16 * factor)
+        image[y - margin:y + h + margin, x - margin:x + w + margin] = 245
+        draw_form(image, (x, y, w, h), color, bar_thickness=int(24 * factor), border=max(2, int(4 * factor)))
+
+    return image
+
+
+def measure(func, iterations, warmup=2):
+    """
+    関数の処理時間（ミリ秒）と1回あたりのメモリ確保のピーク（KB）を計測
+
+    Returns:
+        dict: p50, p95, mean, max（ミリ秒）と peak_kb
+    """
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    # メモリ確保は計測のオーバーヘッドが大きいので別に数回だけ
+    tracemalloc.start()
+    peaks = []
+    for _ in range(min(iterations, 3)):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        func()
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    samples = np.array(samples)
+    return {
+        'p50': float(np.percentile(samples, 50)),
+        'p95': float(np.percentile(samples, 95)),
+        'mean': float(samples.mean()),
+        'max': float(samples.max()),
+        'peak_kb': max(peaks) / 1024,
+    }
+
+
+def convert_like_capture(image_bgra):
+    """capture_screen 相当の変換（BGRAバッファ → 保存用PIL Image と BGR配列）"""
+    frame = Frame(image_bgra, 0.0)
+    return frame.to_pil(), frame.bgr
+
+
+def load_budgets(path):
+    budgets = {target: dict(values) for target, values in DEFAULT_BUDGETS_MS.items()}
+    if path:
+        with open(path, encoding='utf-8') as f:
+            for target, values in json.load(f).items():
+                budgets.setdefault(target, {}).update(values)
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="detect_target_form の解像度別ベンチマーク")
+    parser.add_argument('--resolutions', nargs='+', default=list(RESOLUTIONS), choices=list(RESOLUTIONS))
+    parser.add_argument('--scenarios', nargs='+', default=['empty', 'busy', 'form'],
+                        choices=['empty', 'busy', 'form'])
+    parser.add_argument('--frames', help="記録済みフレームのディレクトリ（*.png）")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--scale', type=float, default=1.0, help="detection_scale（粗密2段階検出の縮小率）")
+    parser.add_argument('--engines', nargs='+', default=['contours'],
+                        choices=['contours', 'components'], help="計測する candidate_engine（複数指定で比較）")
+    parser.add_argument('--color-matchers', nargs='+', default=['hsv'],
+                        choices=['hsv', 'lut'], help="計測する color_matcher（複数指定で比較）")
+    parser.add_argument('--budget-file', help="予算（ミリ秒）を上書きするJSON {\"detect\": {\"4k\": 50}}")
+    parser.add_argument('--no-budget', action='store_true', help="予算超過でも失敗にしない")
+    parser.add_argument('--json', help="結果をJSONで書き出すファイル")
+    args = parser.parse_args()
+
+    budgets = load_budgets(args.budget_file)
+    detectors = {
+        (engine, matcher): AutoScreenshot(save_dir=os.curdir, detection_scale=args.scale,
+                                          candidate_engine=engine, color_matcher=matcher,
+                                          **DETECTOR_SETTINGS)
+        for engine in args.engines
+        for matcher in args.color_matchers
+    }
+    # 色マスクの作成だけを比較する（変換とマスク作成の違いを切り分ける）
+    mask_makers = {matcher: detectors[(args.engines[0], matcher)] for matcher in args.color_matchers}
+
+    cases = []
+    for name in args.resolutions:
+        width, height = RESOLUTIONS[name]
+        for scenario in args.scenarios:
+            cases.append((name, scenario, make_frame(width, height, scenario)))
+    if args.frames:
+        for path in sorted(glob.glob(os.path.join(args.frames, '*.png'))):
+            image = load_image(path)
+            if image is not None:
+                cases.append(('recorded', os.path.basename(path), cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)))
+
+    print('=' * 110)
+    print(f"検出ベンチマーク（detection_scale={args.scale}, {args.iterations}回）")
+    print('=' * 110)
+    print(f"{'解像度':<10}{'シナリオ':<24}{'対象':<31}{'p50(ms)':>9}{'p95(ms)':>9}{'最大(ms)':>10}"
+          f"{'確保(KB)':>11}{'予算(ms)':>10}  判定")
+
+    results = []
+    failures = 0
+    for resolution, scenario, image in cases:
+        # (計測対象, 表示名, 関数, 検出されたか)
+        targets = [
+            ('detect', f"detect[{engine}/{matcher}]", detector.detect_target_form,
+             detector.detect_target_form(image)[0])
+            for (engine, matcher), detector in detectors.items()
+        ]
+        targets += [('mask', f"mask[{matcher}]", detector.color_mask, False)
+                    for matcher, detector in mask_makers.items()]
+        targets.append(('convert', 'convert', convert_like_capture, False))
+
+        for target, label, func, detected in targets:
+            stats = measure(lambda: func(image), args.iterations)
+            budget = budgets.get(target, {}).get(resolution)
+            ok = budget is None or stats['p95'] <= budget
+            if not ok:
+                failures += 1
+            results.append(dict(stats, resolution=resolution, scenario=scenario, target=label,
+                                budget_ms=budget, ok=ok, detected=bool(detected)))
+            scenario_label = f"{scenario}{' (検出)' if detected else ''}"
+            print(f"{resolution:<10}{scenario_label:<24}{label:<31}{stats['p50']:>9.1f}{stats['p95']:>9.1f}"
+                  f"{stats['max']:>10.1f}{stats['peak_kb']:>11,.0f}"
+                  f"{budget if budget is not None else '-':>10}  {'OK' if ok else '✗ 予算超過'}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    print('=' * 110)
+    if failures and not args.no_budget:
+        print(f"✗ {failures} 件が予算を超過しました")
+        sys.exit(1)
+    print("✓ すべて予算内です" if not failures else f"予算超過 {failures} 件（--no-budget のため成功扱い）")
+
+
+if __name__ == "__main__":
+    main()
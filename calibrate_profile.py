@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+検出プロファイルの自動調整 - ラベル付きの正例・負例画像からHSV範囲と形状条件を求める
+
+手順:
+  1. 正例のフォーム位置を決める（ラベルの矩形、なければ広めの初期色範囲で最大のフォーム）
+  2. フォームの色ピクセルのH・S・Vヒストグラムを全正例で集計し、
+     指定の割合（--coverage）を含む最も狭い範囲を求め、各チャンネルに許容幅（--hsv-margin）を足す
+     （狭すぎて正例のフォームが割れる場合は割合を広げて再試行）。
+     色範囲は正例だけから決まり、負例は手順3の形状条件にだけ使います
+  3. その色範囲で検出した正例のフォームの面積・アスペクト比に余裕（--margin）を持たせ、
+     負例で見つかったフォーム状の候補を含まないように境界を詰める
+  4. 結果を検出プロファイル（JSON）として保存（同名のプロファイルがあれば置き換え）
+
+色範囲が狭いほど毎フレームの色マスクのピクセル数と評価する輪郭が減ります。
+
+使い方:
+    python calibrate_profile.py --positives quiz/ --negatives lecture/ --name quiz --output profiles.json
+    python calibrate_profile.py --labels labels.jsonl --reference-height 1080 --output profiles.json
+
+保存したプロファイルの使い方:
+    auto_ss = AutoScreenshot.from_profile("profiles.json", name="quiz", save_dir="screenshots")
+    python auto_screenshot.py --detection-profile profiles.json --detection-profile-name quiz
+"""
+
+import sys
+import io
+# Windows環境での文字化け対策
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+import argparse
+import math
+import os
+
+import cv2
+import numpy as np
+
+from bar_detection import check_form_bars
+from detection_profile import DetectionProfile
+from frame_source import load_image
+from labeled_images import iou, load_labeled_images
+
+
+# フォーム位置を探すための広めの色範囲（青紫系、find_all_targets.py と同じ）
+DEFAULT_SEED_RANGE = [(100, 20, 180), (140, 100, 255)]
+
+# 色範囲の割合を広げて再試行する順番
+COVERAGE_STEPS = (0.99, 0.995, 0.999, 1.0)
+
+
+class CalibrationImage:
+    """読み込み済みのラベル付き画像（HSVに変換済み）"""
+
+    def __init__(self, labeled, hsv):
+        self.path = labeled.path
+        self.positive = labeled.positive
+        self.labeled_bboxes = labeled.bboxes
+        self.hsv = hsv
+        self.form_bboxes = []  # 調整に使うフォームの位置
+
+    @property
+    def height(self):
+        return self.hsv.shape[0]
+
+
+def find_forms(hsv, lower, upper, bar_settings, factor=1.0, min_area=1000):
+    """
+    色範囲に当てはまり上下に横バーがある領域を探す（面積・アスペクト比は絞り込まない）
+
+    Args:
+        hsv: HSV画像
+        lower, upper: 色範囲
+        bar_settings: (bar_width_ratio, min_bar_thickness, min_bar_distance)（基準解像度の値）
+        factor: 基準解像度からの倍率
+        min_area: これより小さい輪郭は無視（実ピクセル）
+
+    Returns:
+        tuple: (フォームのリスト [(面積, (x, y, w, h)), ...], 色マスクのピクセル数, 輪郭の数)
+    """
+    mask = cv2.inRange(hsv, np.array(lower), np.array(upper))
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    width_ratio, min_thickness, min_distance = bar_settings
+    forms = []
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area < min_area:
+            continue
+        x, y, w, h = cv2.boundingRect(contour)
+        if check_form_bars(mask[y:y+h, x:x+w], width_ratio, max(1, int(round(min_thickness * factor))),
+                           min_distance * factor, width=w) is not None:
+            forms.append((area, (x, y, w, h)))
+    return forms, cv2.countNonZero(mask), len(contours)
+
+
+def channel_histograms(pixels):
+    """
+    HSVピクセル (N, 3) のチャンネルごとのヒストグラム
+
+    Returns:
+        list: [Hのヒストグラム(180), Sのヒストグラム(256), Vのヒストグラム(256)]
+    """
+    return [np.bincount(pixels[:, channel], minlength=size)
+            for channel, size in enumerate((180, 256, 256))]
+
+
+def tightest_range(histograms, coverage):
+    """
+    各チャンネルで全ピクセルの coverage の割合を含む最も狭い範囲（両端を同じ割合ずつ除く）
+
+    正例のフォームのピクセルだけから求めます（負例は色範囲に影響しません）。
+    許容幅は含まないので、保存する前に widen_range で広げます。
+
+    Returns:
+        list: [(H_min, S_min, V_min), (H_max, S_max, V_max)]
+    """
+    tail = (1.0 - coverage) / 2
+    lower, upper = [], []
+    for hist in histograms:
+        cumulative = np.cumsum(hist)
+        total = cumulative[-1]
+        lower.append(int(np.searchsorted(cumulative, tail * total, side='right')))
+        upper.append(int(np.searchsorted(cumulative, (1.0 - tail) * total, side='left')))
+    return [tuple(lower), tuple(upper)]
+
+
+def widen_range(hsv_range, margin):
+    """
+    色範囲の各チャンネルを許容幅だけ広げる（HSVの有効範囲に収める）
+
+    一様な色のフォームでは tightest_range の結果が幅0になり、アンチエイリアスや
+    圧縮でわずかに色が変わるだけで検出できなくなるため、許容幅を持たせます。
+
+    Args:
+        hsv_range: [(H_min, S_min, V_min), (H_max, S_max, V_max)]
+        margin: チャンネルごとの許容幅 (H, S, V)
+
+    Returns:
+        list: [(H_min, S_min, V_min), (H_max, S_max, V_max)]
+    """
+    limits = (179, 255, 255)
+    lower = tuple(max(0, value - pad) for value, pad in zip(hsv_range[0], margin))
+    upper = tuple(min(limit, value + pad) for value, pad, limit in zip(hsv_range[1], margin, limits))
+    return [lower, upper]
+
+
+def best_match(forms, bbox, threshold=0.5):
+    """bbox と最もよく重なるフォーム（IoUが threshold 未満なら None）"""
+    scored = [(iou(form_bbox, bbox), area, form_bbox) for area, form_bbox in forms]
+    if not scored:
+        return None
+    score, area, form_bbox = max(scored)
+    return (area, form_bbox) if score >= threshold else None
+
+
+def shape_bounds(areas, aspects, negatives, margin):
+    """
+    正例の面積・アスペクト比に余裕を持たせ、負例の候補を含まないように境界を詰める
+
+    Args:
+        areas, aspects: 正例のフォームの面積（基準解像度）とアスペクト比
+        negatives: 負例の候補 [(面積, アスペクト比), ...]
+        margin: 余裕の割合
+
+    Returns:
+        tuple: (min_area, max_area, (アスペクト比の下限, 上限), 分離できなかった負例の候補数)
+    """
+    area_lo, area_hi = min(areas), max(areas)
+    aspect_lo, aspect_hi = min(aspects), max(aspects)
+    min_area, max_area = area_lo * (1 - margin), area_hi * (1 + margin)
+    min_aspect, max_aspect = aspect_lo * (1 - margin), aspect_hi * (1 + margin)
+
+    inseparable = 0
+    for area, aspect in sorted(negatives):
+        if not (min_area <= area <= max_area and min_aspect <= aspect <= max_aspect):
+            continue
+        # 正例の範囲の外側にある方向で、正例との中間まで境界を詰める
+        if area < area_lo:
+            min_area = (area + area_lo) / 2
+        elif area > area_hi:
+            max_area = (area + area_hi) / 2
+        elif aspect < aspect_lo:
+            min_aspect = (aspect + aspect_lo) / 2
+        elif aspect > aspect_hi:
+            max_aspect = (aspect + aspect_hi) / 2
+        else:
+            inseparable += 1
+
+    return (int(math.floor(min_area)), int(math.ceil(max_area)),
+            (math.floor(min_aspect * 100) / 100, math.ceil(max_aspect * 100) / 100), inseparable)
+
+
+def save_profile(profile, path):
+    """プロファイルをファイルに保存（既存のファイルの同名プロファイルは置き換え）"""
+    profiles = DetectionProfile.load(path) if os.path.exists(path) else []
+    profiles = [p for p in profiles if p.name != profile.name] + [profile]
+    DetectionProfile.save(profiles, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ラベル付き画像から検出プロファイルを自動調整")
+    parser.add_argument('--labels', help="JSONLのラベルファイル（path, positive, bboxes）")
+    parser.add_argument('--positives', nargs='+', default=[], help="正例（フォームあり）の画像・ディレクトリ・glob")
+    parser.add_argument('--negatives', nargs='+', default=[], help="負例（フォームなし）の画像・ディレクトリ・glob")
+    parser.add_argument('--recursive', action='store_true', help="ディレクトリをサブフォルダまで探す")
+    parser.add_argument('--seed-range', type=int, nargs=6,
+                        metavar=('H_MIN', 'S_MIN', 'V_MIN', 'H_MAX', 'S_MAX', 'V_MAX'),
+                        help="矩形のない正例でフォームを探す広めの色範囲（既定: 青紫系）")
+    parser.add_argument('--coverage', type=float, default=COVERAGE_STEPS[0],
+                        help="色範囲に含めるフォームの色ピクセルの割合")
+    parser.add_argument('--hsv-margin', type=int, nargs=3, default=[3, 15, 15], metavar=('H', 'S', 'V'),
+                        help="色範囲の各チャンネルに足す許容幅（既定: 3 15 15）")
+    parser.add_argument('--margin', type=float, default=0.15, help="面積・アスペクト比の余裕の割合")
+    parser.add_argument('--reference-height', type=int, help="面積・バー閾値の基準画面の高さ（例: 1080）")
+    parser.add_argument('--bar-thickness', type=int, default=10, help="上下バーとみなす最小の太さ")
+    parser.add_argument('--bar-distance', type=int, default=50, help="上下バー間の最小距離")
+    parser.add_argument('--bar-width-ratio', type=float, default=0.7, help="横バーとみなす行の色ピクセルの割合")
+    parser.add_argument('--name', default="calibrated", help="プロファイル名")
+    parser.add_argument('--output', default="profiles.json", help="保存先のプロファイルファイル")
+    args = parser.parse_args()
+
+    labeled = load_labeled_images(args.labels, args.positives, args.negatives, args.recursive)
+    seed_range = ([tuple(args.seed_range[:3]), tuple(args.seed_range[3:])] if args.seed_range
+                  else DEFAULT_SEED_RANGE)
+    bar_settings = (args.bar_width_ratio, args.bar_thickness, args.bar_distance)
+
+    def factor_for(image):
+        return image.height / args.reference_height if args.reference_height else 1.0
+
+    images = []
+    for item in labeled:
+        img = load_image(item.path)
+        if img is None:
+            print(f"⚠ 読み込めませんでした: {item.path}")
+            continue
+        images.append(CalibrationImage(item, cv2.cvtColor(img, cv2.COLOR_BGR2HSV)))
+    positives = [image for image in images if image.positive]
+    negatives = [image for image in images if not image.positive]
+    if not positives:
+        parser.error("正例の画像がありません（--labels または --positives で指定してください）")
+
+    print('=' * 70)
+    print(f'検出プロファイルの自動調整: {args.name}')
+    print('=' * 70)
+    print(f"正例: {len(positives)}枚 | 負例: {len(negatives)}枚")
+
+    # 1. 正例のフォーム位置
+    for image in positives:
+        if image.labeled_bboxes:
+            image.form_bboxes = image.labeled_bboxes
+            continue
+        forms, _, _ = find_forms(image.hsv, *seed_range, bar_settings, factor_for(image))
+        if forms:
+            image.form_bboxes = [max(forms)[1]]
+        else:
+            print(f"⚠ 初期色範囲でフォームが見つかりません（--seed-range を確認）: {image.path}")
+    positives = [image for image in positives if image.form_bboxes]
+    if not positives:
+        print("調整に使えるフォームがありません")
+        sys.exit(1)
+
+    # 2. フォームの色ピクセルのヒストグラム（初期色範囲に入るピクセルのみ。白い内側や背景を除く）
+    histograms = [np.zeros(size, dtype=np.int64) for size in (180, 256, 256)]
+    lower, upper = np.array(seed_range[0]), np.array(seed_range[1])
+    for image in positives:
+        for x, y, w, h in image.form_bboxes:
+            roi = image.hsv[y:y+h, x:x+w]
+            pixels = roi[cv2.inRange(roi, lower, upper) > 0]
+            for total, hist in zip(histograms, channel_histograms(pixels)):
+                total += hist
+    if histograms[0].sum() == 0:
+        print("フォーム内に初期色範囲のピクセルがありません（--seed-range を確認）")
+        sys.exit(1)
+    peaks = [int(np.argmax(hist)) for hist in histograms]
+    print(f"フォームの色ピクセル: {int(histograms[0].sum()):,} | 最頻値 H={peaks[0]}, S={peaks[1]}, V={peaks[2]}")
+
+    # 正例のフォームがすべて見つかる最も狭い色範囲を選ぶ
+    coverages = [args.coverage] + [c for c in COVERAGE_STEPS if c > args.coverage]
+    for coverage in coverages:
+        hsv_range = widen_range(tightest_range(histograms, coverage), args.hsv_margin)
+        matched = []
+        for image in positives:
+            forms, _, _ = find_forms(image.hsv, *hsv_range, bar_settings, factor_for(image))
+            for bbox in image.form_bboxes:
+                match = best_match(forms, bbox)
+                if match is not None:
+                    area, (_, _, w, h) = match
+                    matched.append((area / factor_for(image) ** 2, w / h))
+        total_forms = sum(len(image.form_bboxes) for image in positives)
+        print(f"  割合 {coverage:.3f}: HSV {hsv_range[0]}〜{hsv_range[1]} → 正例 {len(matched)}/{total_forms} 検出")
+        if len(matched) == total_forms:
+            break
+    if not matched:
+        print("どの色範囲でも正例のフォームを検出できませんでした")
+        sys.exit(1)
+
+    # 3. 負例のフォーム状の候補を集めて形状の境界を決める
+    negative_candidates = []
+    seed_pixels = calibrated_pixels = 0
+    for image in negatives:
+        factor = factor_for(image)
+        forms, calibrated_count, _ = find_forms(image.hsv, *hsv_range, bar_settings, factor)
+        seed_pixels += cv2.countNonZero(cv2.inRange(image.hsv, lower, upper))
+        calibrated_pixels += calibrated_count
+        negative_candidates += [(area / factor ** 2, w / h) for area, (_, _, w, h) in forms]
+
+    min_area, max_area, aspect_ratio_range, inseparable = shape_bounds(
+        [area for area, _ in matched], [aspect for _, aspect in matched], negative_candidates, args.margin)
+
+    print('\n' + '=' * 70)
+    print('調整結果:')
+    print('=' * 70)
+    print(f"target_color_hsv_range=[{hsv_range[0]}, {hsv_range[1]}]")
+    print(f"min_area={min_area:,}")
+    print(f"max_area={max_area:,}")
+    print(f"aspect_ratio_range={aspect_ratio_range}")
+    if args.reference_height:
+        print(f"reference_height={args.reference_height}")
+    if negatives:
+        reduction = 1 - calibrated_pixels / seed_pixels if seed_pixels else 0.0
+        print(f"\n負例の色マスク: {seed_pixels:,}px（初期色範囲） → {calibrated_pixels:,}px（{reduction:.0%}削減）")
+        print(f"負例のフォーム状の候補: {len(negative_candidates)}個（分離できなかった候補: {inseparable}個）")
+    if inseparable:
+        print("⚠ 色と面積・アスペクト比だけでは正例と区別できない候補があります")
+
+    profile = DetectionProfile(
+        args.name,
+        hsv_range,
+        min_area=min_area,
+        max_area=max_area,
+        aspect_ratio_range=aspect_ratio_range,
+        reference_height=args.reference_height,
+        min_bar_thickness=args.bar_thickness,
+        min_bar_distance=args.bar_distance,
+        bar_width_ratio=args.bar_width_ratio,
+    )
+    save_profile(profile, args.output)
+    print(f"\nプロファイルを保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
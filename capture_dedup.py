@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+撮影の重複排除 - 知覚ハッシュで直前までの撮影とほぼ同じ画像を見つける
+
+クールダウンは時間だけで判定するため、同じクイズの再表示やスライドの戻りで
+ほぼ同一の画像が何枚も保存されます。縮小画像から計算したDCTハッシュを
+直近の撮影と比較し、ハミング距離が閾値以内なら保存を省略（またはハードリンク）します。
+1つのインスタンスを複数モニターの監視スレッドで共有できます（履歴と件数はロックで保護）。
+"""
+
+import os
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+def perceptual_hash(image, hash_size=16):
+    """
+    DCTによる知覚ハッシュ（pHash）を計算
+
+    Args:
+        image: numpy配列の画像データ (BGR / BGRA / グレースケール)
+        hash_size: ハッシュの一辺（hash_size**2 ビット）
+
+    Returns:
+        int: ハッシュ値
+    """
+    # 先に縮小してから色変換する（全画面のグレースケール変換を避ける）
+    size = hash_size * 4
+    small = cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        code = cv2.COLOR_BGRA2GRAY if small.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        small = cv2.cvtColor(small, code)
+
+    dct = cv2.dct(np.float32(small))[:hash_size, :hash_size]
+    # 直流成分を除いた中央値との大小でビットを決める
+    median = np.median(dct.flatten()[1:])
+    bits = (dct > median).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming_distance(hash_a, hash_b):
+    """2つのハッシュのハミング距離"""
+    return bin(hash_a ^ hash_b).count('1')
+
+
+class CaptureDeduplicator:
+    """直近の撮影の知覚ハッシュを保持して重複を判定"""
+
+    def __init__(self, max_distance=8, history_size=256, mode='skip', region='form', hash_size=16):
+        """
+        Args:
+            max_distance: 重複とみなすハミング距離の上限（hash_size**2 ビット中）
+            history_size: 比較対象として保持する直近の撮影数
+            mode: 重複時の動作 ('skip'=保存しない, 'hardlink'=既存ファイルへのハードリンクを作る)
+            region: ハッシュを計算する範囲 ('form'=検出したフォームの範囲, 'frame'=画面全体)。
+                    画面全体の縮小画像ではフォーム内の問題文の違いがほとんど消えるため 'form' を推奨
+            hash_size: ハッシュの一辺（hash_size**2 ビット）
+        """
+        if mode not in ('skip', 'hardlink'):
+            raise ValueError(f"未対応のmode: {mode}（'skip' または 'hardlink'）")
+        if region not in ('frame', 'form'):
+            raise ValueError(f"未対応のregion: {region}（'frame' または 'form'）")
+
+        self.max_distance = max_distance
+        self.mode = mode
+        self.region = region
+        self.hash_size = hash_size
+        self.history = deque(maxlen=history_size)  # (ハッシュ, ファイルパス)
+        self.stats = {'checked': 0, 'skipped': 0, 'linked': 0}
+        self._lock = threading.Lock()  # 複数の監視スレッドで共有する場合の履歴と件数の保護
+
+    def compute_hash(self, image, detected_forms=None):
+        """
+        撮影画像のハッシュを計算
+
+        Args:
+            image: numpy配列の画像データ
+            detected_forms: 検出されたフォーム情報のリスト（region='form' の場合に使用）
+        """
+        if self.region == 'form' and detected_forms:
+            x1 = min(f['bbox'][0] for f in detected_forms)
+            y1 = min(f['bbox'][1] for f in detected_forms)
+            x2 = max(f['bbox'][0] + f['bbox'][2] for f in detected_forms)
+            y2 = max(f['bbox'][1] + f['bbox'][3] for f in detected_forms)
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(image.shape[1], x2), min(image.shape[0], y2)
+            # 範囲が空（幅・高さ0や画面外の枠）の場合は画面全体で計算
+            if x2 > x1 and y2 > y1:
+                image = image[y1:y2, x1:x2]
+        return perceptual_hash(image, self.hash_size)
+
+    def find_duplicate(self, image_hash):
+        """
+        直近の撮影から最も近い重複を探す
+
+        Returns:
+            str: 重複する撮影のファイルパス。無ければ None
+        """
+        with self._lock:
+            self.stats['checked'] += 1
+            history = list(self.history)
+        best_path, best_distance = None, None
+        for known_hash, path in history:
+            distance = hamming_distance(image_hash, known_hash)
+            if distance <= self.max_distance and (best_distance is None or distance < best_distance):
+                best_path, best_distance = path, distance
+        return best_path
+
+    def add(self, image_hash, path):
+        """撮影を比較対象に追加"""
+        with self._lock:
+            self.history.append((image_hash, path))
+
+    def count_skipped(self):
+        """重複のため保存を省略した撮影を数える"""
+        with self._lock:
+            self.stats['skipped'] += 1
+
+    def link(self, existing_path, new_path):
+        """
+        既存ファイルへのハードリンクを作成
+
+        Returns:
+            bool: 作成できたか（ファイルシステムが対応していない場合など False）
+        """
+        try:
+            os.link(existing_path, new_path)
+        except OSError as e:
+            print(f"⚠ ハードリンクを作成できませんでした: {new_path} ({e})")
+            return False
+        with self._lock:
+            self.stats['linked'] += 1
+        return True
+
+    def print_stats(self):
+        """重複判定の結果を表示"""
+        stats = self.stats
+        if stats['checked'] == 0:
+            return
+        print(f"重複判定: {stats['checked']:,}回 | 保存省略 {stats['skipped']:,} | "
+              f"ハードリンク {stats['linked']:,}")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+色判定テーブル - HSVの色範囲をBGRの全色（約1677万色）に対する判定表に変換する
+
+HSV変換と inRange の代わりに、画素のBGR値で表を引いて色マスクを直接作ります。
+表は全色をOpenCVでHSV変換して作るため、結果は cvtColor + inRange と完全に一致します。
+作成した表はビット単位に詰めて（2MB）ディスクにキャッシュし、次回の起動では読み込むだけです。
+"""
+
+import hashlib
+import os
+
+import cv2
+import numpy as np
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lut_cache")
+
+
+def build_table(hsv_lower, hsv_upper):
+    """
+    BGRの全色について色範囲に入るかを計算
+
+    Returns:
+        numpy配列: 長さ 2**24 の uint8 配列（255=範囲内）。添字は B + G*256 + R*65536
+    """
+    colors = np.arange(1 << 24, dtype=np.uint32).view(np.uint8).reshape(4096, 4096, 4)
+    bgr = cv2.cvtColor(colors, cv2.COLOR_BGRA2BGR)
+    hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+    return cv2.inRange(hsv, np.asarray(hsv_lower), np.asarray(hsv_upper)).reshape(-1)
+
+
+class ColorLut:
+    """HSVの色範囲からBGR(A)画像の色マスクを直接作る判定表"""
+
+    def __init__(self, hsv_lower, hsv_upper, cache_dir=DEFAULT_CACHE_DIR):
+        """
+        Args:
+            hsv_lower: HSVの下限 (H, S, V)
+            hsv_upper: HSVの上限 (H, S, V)
+            cache_dir: 判定表のキャッシュ先。None=キャッシュしない
+        """
+        self.hsv_lower = tuple(int(v) for v in hsv_lower)
+        self.hsv_upper = tuple(int(v) for v in hsv_upper)
+        self.cache_dir = cache_dir
+        self.table = self._load_or_build()
+        self._buffers = {}  # 形状ごとの作業バッファ (添字, BGRA)
+
+    def cache_path(self):
+        """色範囲とOpenCVのバージョンをキーにしたキャッシュファイルのパス"""
+        key = f"{self.hsv_lower}-{self.hsv_upper}-{cv2.__version__}"
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+        lower = '_'.join(map(str, self.hsv_lower))
+        upper = '_'.join(map(str, self.hsv_upper))
+        return os.path.join(self.cache_dir, f"color_lut_{lower}-{upper}_{digest}.npy")
+
+    def _load_or_build(self):
+        path = self.cache_path() if self.cache_dir else None
+        if path and os.path.exists(path):
+            try:
+                packed = np.load(path)
+                if packed.shape == ((1 << 24) // 8,):
+                    return np.unpackbits(packed) * np.uint8(255)
+            except (OSError, ValueError) as e:
+                print(f"⚠ 色判定テーブルのキャッシュを読み込めませんでした: {path} ({e})")
+
+        table = build_table(self.hsv_lower, self.hsv_upper)
+        if path:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                np.save(path, np.packbits(table))
+            except OSError as e:
+                print(f"⚠ 色判定テーブルをキャッシュできませんでした: {path} ({e})")
+        return table
+
+    def _buffers_for(self, shape):
+        buffers = self._buffers.get(shape)
+        if buffers is None:
+            if len(self._buffers) >= 8:
+                # 追跡ウィンドウのサイズは毎回変わるので溜め込まない
+                self._buffers.clear()
+            buffers = self._buffers[shape] = (np.empty(shape, dtype=np.intp),
+                                              np.empty(shape + (4,), dtype=np.uint8))
+        return buffers
+
+    def mask(self, image, out=None):
+        """
+        色マスクを作成（cv2.inRange(cv2.cvtColor(image, BGR2HSV), lower, upper) と同じ結果）
+
+        Args:
+            image: numpy配列の画像データ (BGR または mssのBGRA)
+            out: 結果を書き込む uint8 配列（省略時は新しく確保）
+
+        Returns:
+            numpy配列: 色マスク（255=範囲内）
+        """
+        shape = image.shape[:2]
+        index, bgra = self._buffers_for(shape)
+        if image.shape[2] == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA, dst=bgra)
+        elif image.strides[2] != 1:
+            # uint32 として読めるのは1画素の4バイトが連続している場合だけ
+            np.copyto(bgra, image)
+            image = bgra
+
+        # リトルエンディアンの uint32 として読むと B + G*256 + R*65536 + A*2**24
+        # （添字は np.take が変換せずに使える intp のバッファに書き込む）
+        np.bitwise_and(image.view(np.uint32)[..., 0], 0xFFFFFF, out=index)
+        if out is None:
+            out = np.empty(shape, dtype=np.uint8)
+        # 添字は必ず 2**24 未満なので範囲チェック（と出力の一時コピー）を省く
+        return np.take(self.table, index, out=out, mode='clip')
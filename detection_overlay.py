@@ -2,11 +2,19 @@
 # -*- coding: utf-8 -*-
 """
 検出枠オーバーレイ - 検出されたフォームの周りに枠を表示
+
+画面のキャプチャは行いません。AutoScreenshot の検出ループが update() で渡す
+フォームの位置と状態だけを描画します（AutoScreenshot(overlay=DetectionOverlay()) で有効）。
+内容が前回から変わったときだけ描画し直すので、何も検出されていない間は
+ウィンドウのイベント処理以外の負荷はほぼありません。
+
+表示画像は使い回し、前回から変わった枠・表示の領域だけを消して描き直します。
+情報テキストと「READY TO CAPTURE」の表示は文字と色ごとに背景付きの画像としてキャッシュし、
+getTextSize/putText は初めて出てきた文字のときだけ実行します。
 """
 
 import cv2
 import numpy as np
-from mss import mss
 import threading
 import time
 
@@ -14,23 +22,43 @@ import time
 class DetectionOverlay:
     """画面上に検出枠を表示するオーバーレイ"""
 
-    def __init__(self, color_detecting=(0, 255, 0), color_ready=(0, 0, 255), thickness=4):
+    def __init__(self, color_detecting=(0, 255, 0), color_ready=(0, 0, 255), thickness=4, monitor_index=1,
+                 screen_size=None, refresh_ms=50, idle_ms=250, max_sprites=256):
         """
         Args:
             color_detecting: 検出中の枠の色 (BGR) デフォルト: 黄緑
             color_ready: 撮影準備完了の枠の色 (BGR) デフォルト: 赤
             thickness: 枠の太さ
+            monitor_index: 表示するモニター番号（mssの番号、1=メインモニター）
+            screen_size: 描画する画面のサイズ (幅, 高さ)。None=update() で渡されるフレームのサイズ
+            refresh_ms: 枠を表示している間のウィンドウのイベント処理間隔（ミリ秒）
+            idle_ms: 何も表示していない間のイベント処理間隔（ミリ秒）
+            max_sprites: キャッシュする文字画像の上限（超えたら作り直す）
         """
         self.color_detecting = color_detecting
         self.color_ready = color_ready
         self.thickness = thickness
+        self.monitor_index = monitor_index
+        self.refresh_ms = refresh_ms
+        self.idle_ms = idle_ms
 
-        # 表示中の枠情報
-        self.detected_forms = []
+        # 表示する枠情報（検出ループが update() で書き込み、描画スレッドが読む）
+        self._lock = threading.Lock()
+        self.detected_forms = ()
         self.is_ready_to_capture = False
+        self.screen_size = tuple(screen_size) if screen_size else None
+        self._version = 0      # 表示内容が変わるたびに増える
+        self.stats = {'updates': 0, 'renders': 0, 'dirty_pixels': 0}
+
+        # 描画（描画スレッドだけが使う）
+        self.max_sprites = max_sprites
+        self._canvas = None    # 使い回す表示画像
+        self._drawn = {}       # 表示中の項目 → 描画範囲
+        self._sprites = {}     # (文字, 色, ...) → 背景付きの文字の画像
+
         self.is_running = False
         self.overlay_thread = None
-        self.window_name = "Detection Overlay"
+        self.window_name = f"Detection Overlay {monitor_index}"
 
     def start(self):
         """オーバーレイ表示を開始"""
@@ -44,156 +72,184 @@ class DetectionOverlay:
     def stop(self):
         """オーバーレイ表示を停止"""
         self.is_running = False
-        if self.overlay_thread:
+        if self.overlay_thread and self.overlay_thread is not threading.current_thread():
             self.overlay_thread.join(timeout=1)
-        cv2.destroyAllWindows()
+        self.overlay_thread = None
 
-    def update(self, detected_forms, is_ready_to_capture=False):
+    def update(self, detected_forms, is_ready_to_capture=False, frame_size=None):
         """
-        検出情報を更新
+        検出情報を更新（内容が前回と同じなら何もしない）
 
         Args:
-            detected_forms: 検出されたフォーム情報のリスト
+            detected_forms: 検出されたフォーム情報のリスト（'bbox', 'area', 'aspect_ratio'）
             is_ready_to_capture: 撮影準備完了フラグ
+            frame_size: 検出したフレームの全画面サイズ (幅, 高さ)。None=変更しない
+        """
+        forms = tuple((tuple(form['bbox']), form['area'], form['aspect_ratio']) for form in detected_forms)
+        ready = bool(is_ready_to_capture and forms)
+        size = tuple(frame_size) if frame_size else self.screen_size
+        with self._lock:
+            self.stats['updates'] += 1
+            if forms == self.detected_forms and ready == self.is_ready_to_capture and size == self.screen_size:
+                return
+            self.detected_forms = forms
+            self.is_ready_to_capture = ready
+            self.screen_size = size
+            self._version += 1
+
+    def render(self, forms, is_ready, size):
+        """
+        枠・情報テキスト・撮影準備完了の表示を描画した画像を返す
+
+        前回の描画から変わった枠と表示の領域だけを消して描き直します（画像は使い回し）。
+
+        Args:
+            forms: (bbox, 面積, アスペクト比) のタプル
+            is_ready: 撮影準備完了フラグ
+            size: 画面サイズ (幅, 高さ)
+
+        Returns:
+            numpy.ndarray: 黒背景に枠だけを描画したBGR画像（次の render() で書き換わる）
         """
-        self.detected_forms = detected_forms
-        self.is_ready_to_capture = is_ready_to_capture
+        width, height = size
+        if self._canvas is None or self._canvas.shape[:2] != (height, width):
+            self._canvas = np.zeros((height, width, 3), dtype=np.uint8)
+            self._drawn = {}
+
+        # 表示する項目（枠ごと・中央の表示）→ 描画範囲
+        color = self.color_ready if is_ready else self.color_detecting
+        items = {}
+        for bbox, area, aspect_ratio in forms:
+            key = ('form', bbox, f"Area: {area:.0f}px | Ratio: {aspect_ratio:.2f}", color)
+            items[key] = self._form_rect(key)
+        if is_ready:
+            key = ('banner', "READY TO CAPTURE", self.color_ready)
+            items[key] = self._banner_rect(key)
+
+        # 消えた項目の領域を消す
+        dirty = [rect for key, rect in self._drawn.items() if key not in items]
+        for x0, y0, x1, y1 in dirty:
+            self._canvas[y0:y1, x0:x1] = 0
+
+        # 新しい項目と、描き直す領域に重なる項目を描き直す（重なりがなくなるまで広げる）
+        redraw = {key for key in items if key not in self._drawn}
+        dirty += [items[key] for key in redraw]
+        expanded = True
+        while expanded:
+            expanded = False
+            for key, rect in items.items():
+                if key not in redraw and any(_overlaps(rect, other) for other in dirty):
+                    redraw.add(key)
+                    dirty.append(rect)
+                    expanded = True
+        for key in items:
+            if key in redraw:
+                self._draw_item(key)
+
+        self.stats['dirty_pixels'] += sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in dirty)
+        self._drawn = items
+        return self._canvas
+
+    def _sprite(self, text, color, scale, thickness, pad):
+        """背景付きの文字の画像（文字と色ごとにキャッシュ）"""
+        key = (text, color, scale, thickness, pad)
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            (text_width, text_height), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+            sprite = np.empty((text_height + 2 * pad + 1, text_width + 2 * pad + 1, 3), dtype=np.uint8)
+            sprite[:] = color
+            cv2.putText(sprite, text, (pad, text_height + pad), cv2.FONT_HERSHEY_SIMPLEX, scale,
+                        (255, 255, 255), thickness)
+            if len(self._sprites) >= self.max_sprites:
+                self._sprites.clear()
+            self._sprites[key] = sprite
+        return sprite
+
+    def _label_sprite(self, key):
+        _, _, text, color = key
+        return self._sprite(text, color, 0.6, 2, 5)
+
+    def _banner_sprite(self, key):
+        _, text, color = key
+        return self._sprite(text, color, 2, 4, 20)
+
+    def _form_rect(self, key):
+        """枠と情報テキストを合わせた描画範囲 (x0, y0, x1, y1)"""
+        (x, y, w, h) = key[1]
+        label = self._label_sprite(key)
+        t = self.thickness
+        return self._clip(x - t, min(y - t, y - label.shape[0] + 1),
+                          max(x + w + t + 1, x + label.shape[1]), y + h + t + 1)
+
+    def _banner_rect(self, key):
+        sprite = self._banner_sprite(key)
+        left, top = self._banner_origin(sprite)
+        return self._clip(left, top, left + sprite.shape[1], top + sprite.shape[0])
+
+    def _banner_origin(self, sprite, pad=20):
+        """中央の表示の左上（文字を画面の中央に置く）"""
+        height, width = self._canvas.shape[:2]
+        text_height, text_width = sprite.shape[0] - 2 * pad - 1, sprite.shape[1] - 2 * pad - 1
+        return (width - text_width) // 2 - pad, (height + text_height) // 2 - text_height - pad
+
+    def _draw_item(self, key):
+        if key[0] == 'banner':
+            sprite = self._banner_sprite(key)
+            self._blit(sprite, *self._banner_origin(sprite))
+            return
+        _, (x, y, w, h), _, color = key
+        cv2.rectangle(self._canvas, (x, y), (x + w, y + h), color, self.thickness)
+        label = self._label_sprite(key)
+        self._blit(label, x, y - label.shape[0] + 1)
+
+    def _blit(self, sprite, left, top):
+        """画像を画面からはみ出す部分を切り取って貼り付ける"""
+        x0, y0, x1, y1 = self._clip(left, top, left + sprite.shape[1], top + sprite.shape[0])
+        if x0 < x1 and y0 < y1:
+            self._canvas[y0:y1, x0:x1] = sprite[y0 - top:y1 - top, x0 - left:x1 - left]
+
+    def _clip(self, x0, y0, x1, y1):
+        height, width = self._canvas.shape[:2]
+        return max(0, x0), max(0, y0), min(width, max(0, x1)), min(height, max(0, y1))
 
     def _run_overlay(self):
-        """オーバーレイを描画するスレッド"""
+        """オーバーレイを描画するスレッド（内容が変わったときだけ描画し直す）"""
         # ウィンドウを作成
         cv2.namedWindow(self.window_name, cv2.WINDOW_NORMAL)
         cv2.setWindowProperty(self.window_name, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
         cv2.setWindowProperty(self.window_name, cv2.WND_PROP_TOPMOST, 1)
 
-        with mss() as sct:
-            monitor = sct.monitors[1]  # メインモニター
-
+        shown_version = None
+        try:
             while self.is_running:
-                # 画面をキャプチャ
-                screenshot = sct.grab(monitor)
-                img = np.array(screenshot)
-                img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-
-                # 検出された枠を描画
-                if self.detected_forms:
-                    color = self.color_ready if self.is_ready_to_capture else self.color_detecting
-
-                    for form in self.detected_forms:
-                        bbox = form['bbox']
-                        x, y, w, h = bbox
-
-                        # 枠を描画
-                        cv2.rectangle(img, (x, y), (x + w, y + h), color, self.thickness)
-
-                        # 情報テキストを描画
-                        area = form['area']
-                        aspect_ratio = form['aspect_ratio']
-                        text = f"Area: {area:.0f}px | Ratio: {aspect_ratio:.2f}"
-
-                        # テキスト背景
-                        (text_width, text_height), _ = cv2.getTextSize(
-                            text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2
-                        )
-                        cv2.rectangle(
-                            img,
-                            (x, y - text_height - 10),
-                            (x + text_width + 10, y),
-                            color,
-                            -1
-                        )
-
-                        # テキスト
-                        cv2.putText(
-                            img,
-                            text,
-                            (x + 5, y - 5),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            0.6,
-                            (255, 255, 255),
-                            2
-                        )
-
-                        # 撮影準備完了の場合は中央に大きく表示
-                        if self.is_ready_to_capture:
-                            center_text = "READY TO CAPTURE"
-                            (ct_width, ct_height), _ = cv2.getTextSize(
-                                center_text, cv2.FONT_HERSHEY_SIMPLEX, 2, 4
-                            )
-                            center_x = (img.shape[1] - ct_width) // 2
-                            center_y = (img.shape[0] + ct_height) // 2
-
-                            # 背景
-                            cv2.rectangle(
-                                img,
-                                (center_x - 20, center_y - ct_height - 20),
-                                (center_x + ct_width + 20, center_y + 20),
-                                self.color_ready,
-                                -1
-                            )
-
-                            # テキスト
-                            cv2.putText(
-                                img,
-                                center_text,
-                                (center_x, center_y),
-                                cv2.FONT_HERSHEY_SIMPLEX,
-                                2,
-                                (255, 255, 255),
-                                4
-                            )
-
-                # 透明度を調整（元の画面を透けさせる）
-                # 実際には完全に透明にはできないので、枠だけを描画した透明画像を作成
-                overlay = np.zeros_like(img)
-
-                if self.detected_forms:
-                    color = self.color_ready if self.is_ready_to_capture else self.color_detecting
-
-                    for form in self.detected_forms:
-                        bbox = form['bbox']
-                        x, y, w, h = bbox
-                        cv2.rectangle(overlay, (x, y), (x + w, y + h), color, self.thickness)
-
-                        # テキスト情報
-                        area = form['area']
-                        aspect_ratio = form['aspect_ratio']
-                        text = f"Area: {area:.0f}px | Ratio: {aspect_ratio:.2f}"
-
-                        (text_width, text_height), _ = cv2.getTextSize(
-                            text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2
-                        )
-                        cv2.rectangle(
-                            overlay,
-                            (x, y - text_height - 10),
-                            (x + text_width + 10, y),
-                            color,
-                            -1
-                        )
-                        cv2.putText(
-                            overlay,
-                            text,
-                            (x + 5, y - 5),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            0.6,
-                            (255, 255, 255),
-                            2
-                        )
-
-                # 黒背景に枠だけを表示
-                cv2.imshow(self.window_name, overlay)
-
-                # ESCキーで終了
-                if cv2.waitKey(50) & 0xFF == 27:
+                with self._lock:
+                    version = self._version
+                    forms = self.detected_forms
+                    is_ready = self.is_ready_to_capture
+                    size = self.screen_size
+
+                if version != shown_version and size:
+                    # 黒背景に枠だけを表示
+                    cv2.imshow(self.window_name, self.render(forms, is_ready, size))
+                    self.stats['renders'] += 1
+                    shown_version = version
+
+                # ESCキーで終了（何も表示していない間は間隔を空ける）
+                if cv2.waitKey(self.refresh_ms if forms else self.idle_ms) & 0xFF == 27:
                     self.is_running = False
                     break
+        finally:
+            cv2.destroyWindow(self.window_name)
+
 
-        cv2.destroyAllWindows()
+def _overlaps(a, b):
+    """2つの範囲 (x0, y0, x1, y1) が重なるか"""
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
 
 
 # テスト用
 if __name__ == "__main__":
-    overlay = DetectionOverlay()
+    overlay = DetectionOverlay(screen_size=(1920, 1080))
     overlay.start()
 
     # テスト：枠を表示
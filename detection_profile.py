@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+検出プロファイル - 検出対象1種類分の設定（色範囲・形状条件・状態遷移の時間・保存先）
+
+青紫のクイズフォームとオレンジの通知ボックスのように、複数の検出対象を
+JSONファイルにまとめて保存・読み込みできます。
+
+ファイル形式:
+    {"profiles": [{"name": "quiz", "target_color_hsv_range": [[110, 40, 180], [125, 255, 255]], ...}]}
+（プロファイル1つだけの辞書、またはプロファイルのリストでも読み込めます）
+"""
+
+import json
+
+
+class DetectionProfile:
+    """検出対象1種類分の設定"""
+
+    # AutoScreenshot にそのまま渡す設定の名前
+    SETTING_KEYS = (
+        'target_color_hsv_range',
+        'min_area',
+        'max_area',
+        'aspect_ratio_range',
+        'detection_time',
+        'disappear_check_time',
+        'cooldown_time',
+        'reference_height',
+        'min_bar_thickness',
+        'min_bar_distance',
+        'bar_width_ratio',
+        'candidate_engine',
+    )
+
+    def __init__(self,
+                 name,
+                 target_color_hsv_range,
+                 min_area=25000,
+                 max_area=None,
+                 aspect_ratio_range=(0.8, 6.0),
+                 detection_time=2.0,
+                 disappear_check_time=1.0,
+                 cooldown_time=3.0,
+                 reference_height=None,
+                 min_bar_thickness=10,
+                 min_bar_distance=50,
+                 bar_width_ratio=0.7,
+                 candidate_engine='contours',
+                 subfolder=None):
+        """
+        Args:
+            name: プロファイル名（ログと保存ファイル名に使う）
+            target_color_hsv_range: 検出する色範囲 [(H_min, S_min, V_min), (H_max, S_max, V_max)]
+            min_area: 検出する最小面積（ピクセル）
+            max_area: 検出する最大面積（ピクセル）None=無制限
+            aspect_ratio_range: 検出する形状のアスペクト比範囲
+            detection_time: フォームが表示され続ける時間（秒）を確認してから撮影
+            disappear_check_time: フォームが消えたことを確認する時間（秒）
+            cooldown_time: 撮影後の再検出防止期間（秒）
+            reference_height: 面積・バー閾値を指定した基準画面の高さ。None=換算しない
+            min_bar_thickness: 上下バーとみなす最小の太さ（ピクセル）
+            min_bar_distance: 上下バー間の最小距離（ピクセル）
+            bar_width_ratio: 横バーとみなす行の青紫ピクセルの割合（幅に対する比率）
+            candidate_engine: 候補の抽出方法 ('contours' または 'components')
+            subfolder: 保存先のサブフォルダ名。None=プロファイル名
+        """
+        self.name = name
+        self.target_color_hsv_range = [tuple(target_color_hsv_range[0]), tuple(target_color_hsv_range[1])]
+        self.min_area = min_area
+        self.max_area = max_area
+        self.aspect_ratio_range = tuple(aspect_ratio_range)
+        self.detection_time = detection_time
+        self.disappear_check_time = disappear_check_time
+        self.cooldown_time = cooldown_time
+        self.reference_height = reference_height
+        self.min_bar_thickness = min_bar_thickness
+        self.min_bar_distance = min_bar_distance
+        self.bar_width_ratio = bar_width_ratio
+        self.candidate_engine = candidate_engine
+        self.subfolder = subfolder or name
+
+    @property
+    def color_key(self):
+        """色範囲を表すキー（同じ色範囲のプロファイルは色マスクを共有できる）"""
+        return tuple(self.target_color_hsv_range[0]), tuple(self.target_color_hsv_range[1])
+
+    def to_settings(self):
+        """AutoScreenshot に渡す設定の辞書"""
+        return {key: getattr(self, key) for key in self.SETTING_KEYS}
+
+    def to_dict(self):
+        """JSONに保存できる辞書"""
+        data = {'name': self.name}
+        for key in self.SETTING_KEYS:
+            value = getattr(self, key)
+            if key == 'target_color_hsv_range':
+                value = [list(value[0]), list(value[1])]
+            elif isinstance(value, tuple):
+                value = list(value)
+            data[key] = value
+        data['subfolder'] = self.subfolder
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """辞書からプロファイルを作成（未知のキーはエラー）"""
+        known = set(cls.SETTING_KEYS) | {'name', 'subfolder'}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"プロファイルに未知の設定があります: {', '.join(sorted(unknown))}")
+        if 'name' not in data or 'target_color_hsv_range' not in data:
+            raise ValueError("プロファイルには name と target_color_hsv_range が必要です")
+        return cls(**data)
+
+    @classmethod
+    def load(cls, path):
+        """
+        JSONファイルからプロファイルを読み込む
+
+        Returns:
+            list: DetectionProfile のリスト
+        """
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get('profiles', [data])
+        return [cls.from_dict(item) for item in data]
+
+    @staticmethod
+    def save(profiles, path):
+        """プロファイルのリストをJSONファイルに保存"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'profiles': [profile.to_dict() for profile in profiles]}, f,
+                      ensure_ascii=False, indent=2)
+            f.write("\n")
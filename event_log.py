@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+イベントログ - 状態遷移・撮影・キャンセル・定期集計をJSONLで記録する
+
+ポーリングループからはキューに積むだけで、ファイルへの書き込みはバックグラウンドの
+スレッドがまとめて行います（flush_interval ごとにフラッシュ）。
+記録したログは検出タイミングのオフライン分析に使えます。
+
+1行1イベント:
+    {"event": "transition", "wall": "2026-10-17T10:15:02.120", "time": 1234.5, "name": "",
+     "from": "waiting", "to": "detecting", "elapsed": 12.0, "info": "2.0秒間確認します"}
+    {"event": "capture", ..., "file": "screenshots/screenshot_0001_....png", "forms": [[x, y, w, h]]}
+    {"event": "cancel", ..., "reason": "user" | "disappeared", "elapsed": 0.8}
+    {"event": "summary", ..., "frames": 120, "states": {"waiting": 118, ...}, "detect_ms_mean": 8.1, ...}
+
+ConsoleStatus は毎反復の状態表示行（end='\\r'）を指定の頻度に間引いて表示します。
+"""
+
+import json
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+
+class EventLog:
+    """バッファ付きのバックグラウンドJSONL書き込み"""
+
+    def __init__(self, path, flush_interval=1.0, summary_interval=60.0, max_queue=10000):
+        """
+        Args:
+            path: 書き込み先のJSONLファイル（追記）
+            flush_interval: ファイルをフラッシュする間隔（秒）
+            summary_interval: 定期集計（summary イベント）の間隔（秒）。None=記録しない
+            max_queue: 書き込み待ちの上限（超えたイベントは破棄して記録）
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.summary_interval = summary_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stats = {'written': 0, 'dropped': 0}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._users = 0  # start() した実行ループの数（複数モニターで共有する場合）
+
+    def log(self, event, **fields):
+        """
+        イベントを書き込み待ちに追加（待たない。キューが満杯なら破棄）
+
+        Args:
+            event: イベントの種類（'transition', 'capture', 'cancel', 'summary' など）
+            **fields: イベントの内容（JSONに変換できる値）
+        """
+        record = {'event': event, 'wall': datetime.now().isoformat(timespec='milliseconds')}
+        record.update(fields)
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.stats['dropped'] += 1
+
+    def start(self):
+        """書き込みスレッドを起動（AutoScreenshot.run() が呼ぶ）"""
+        with self._lock:
+            self._users += 1
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._worker, name="event-log", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """書き込み待ちのイベントを書き終えて終了（全ての実行ループが close() したとき）"""
+        with self._lock:
+            self._users = max(0, self._users - 1)
+            if self._users > 0 or self._thread is None:
+                return
+            thread, self._thread = self._thread, None
+        self.queue.put(None)
+        thread.join()
+
+    def _worker(self):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            last_flush = time.monotonic()
+            while True:
+                try:
+                    record = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    record = False
+                if record is None:
+                    f.flush()
+                    return
+                if record:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    self.stats['written'] += 1
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    f.flush()
+                    last_flush = time.monotonic()
+
+    def print_stats(self):
+        """書き込み件数を表示"""
+        stats = self.stats
+        dropped = f" | 破棄: {stats['dropped']:,}件" if stats['dropped'] else ""
+        print(f"イベントログ: {stats['written']:,}件 → {self.path}{dropped}")
+
+
+class ConsoleStatus:
+    """毎反復の状態表示行を refresh_rate 回/秒 までに間引いて表示"""
+
+    def __init__(self, refresh_rate=2.0, clock=time.monotonic, stream=None):
+        """
+        Args:
+            refresh_rate: 1秒あたりの最大表示回数。0=状態表示行を出さない
+            clock: 間引きに使うクロック
+            stream: 出力先。None=標準出力
+        """
+        self.min_interval = 1.0 / refresh_rate if refresh_rate else None
+        self.clock = clock
+        self.stream = stream
+        self._last = None
+
+    def update(self, text):
+        """
+        状態表示行を更新（前回の表示から min_interval 秒経っていなければ何もしない）
+
+        Returns:
+            bool: 表示した場合 True
+        """
+        if self.min_interval is None:
+            return False
+        now = self.clock()
+        if self._last is not None and now - self._last < self.min_interval:
+            return False
+        self._last = now
+        stream = self.stream or sys.stdout
+        stream.write(f"{text}\r")
+        stream.flush()
+        return True
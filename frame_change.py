@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+フレーム変化検出 - 前フレームから画面が変化したかを安価に判定する
+
+講義画面はほとんどの時間静止しているため、変化のないフレームでは
+HSV変換・マスク作成・輪郭抽出を省略して前回の検出結果を再利用できます。
+"""
+
+import numpy as np
+
+
+class FrameChangeDetector:
+    """間引いた画素を前フレームと比較して変化を判定"""
+
+    def __init__(self, sample_step=4):
+        """
+        Args:
+            sample_step: 比較に使う画素の間隔（縦横とも）。4なら1/16の画素を比較
+        """
+        self.sample_step = sample_step
+        self._previous = None
+        self._previous_key = None
+
+    def reset(self):
+        """比較対象の前フレームを破棄"""
+        self._previous = None
+        self._previous_key = None
+
+    def has_changed(self, image, key=None):
+        """
+        前回の呼び出しから画像が変化したかを判定
+
+        Args:
+            image: numpy配列の画像データ
+            key: 画像の出所を表す値（部分キャプチャの位置など）。前回と異なれば変化ありとみなす
+
+        Returns:
+            bool: 変化があれば True（初回も True）
+        """
+        step = self.sample_step
+        sample = image[::step, ::step]
+        key = (key, sample.shape)
+
+        changed = (
+            self._previous is None
+            or key != self._previous_key
+            or not np.array_equal(sample, self._previous)
+        )
+        if changed:
+            self._previous = sample.copy()
+            self._previous_key = key
+        return changed
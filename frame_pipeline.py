@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+フレームパイプライン - キャプチャ → 検出 → 状態遷移 → 保存 をステージごとに並列実行する
+
+各ステージは1つのワーカーと上限付きキューでつながっています。
+検出が追いつかない場合はキャプチャ済みの古いフレームを破棄して（破棄数を記録）
+サンプリング周期を保ちます。検出と状態遷移のワーカーは1つずつなので、
+状態遷移は常にキャプチャ順にフレームを受け取り、元のキャプチャ時刻で判定します。
+"""
+
+import queue
+import threading
+
+
+class FramePipeline:
+    """AutoScreenshot の処理をステージごとのワーカースレッドで実行"""
+
+    def __init__(self, auto_ss, detect_queue_size=2, state_queue_size=8, save_queue_size=4,
+                 full_frame_timeout=2.0):
+        """
+        Args:
+            auto_ss: 検出と状態遷移を行う AutoScreenshot
+            detect_queue_size: 検出待ちフレームの上限（超えたら古いフレームを破棄）
+            state_queue_size: 状態遷移待ちの検出結果の上限
+            save_queue_size: 保存待ちフレームの上限（超えたら状態遷移ステージが待つ）
+            full_frame_timeout: 保存用の全画面フレームを待つ最大時間（秒）
+        """
+        self.auto_ss = auto_ss
+        self.detect_queue = queue.Queue(maxsize=detect_queue_size)
+        self.state_queue = queue.Queue(maxsize=state_queue_size)
+        self.save_queue = queue.Queue(maxsize=save_queue_size)
+        self.full_frame_timeout = full_frame_timeout
+
+        # 保存用の全画面フレーム要求（キャプチャはキャプチャステージのスレッドだけが行う）
+        self._full_frame_requests = queue.Queue()
+        self._wakeup = threading.Event()
+
+        self.stats = {'captured': 0, 'dropped': 0, 'detected': 0, 'saved': 0}
+
+    def run(self, source, duration=None, start_time=None):
+        """
+        パイプラインを実行（呼び出したスレッドがキャプチャステージになる）
+
+        Args:
+            source: 開いているフレームソース
+            duration: 実行時間（秒）。Noneの場合は無限に実行
+            start_time: 実行開始時刻（auto_ss.clock の値）
+        """
+        auto_ss = self.auto_ss
+        scheduler = auto_ss.scheduler
+        scheduler.sleep = lambda seconds: self._sleep(source, seconds)
+        if start_time is None:
+            start_time = auto_ss.clock()
+
+        workers = [
+            threading.Thread(target=self._detect_worker, name="pipeline-detect", daemon=True),
+            threading.Thread(target=self._state_worker, name="pipeline-state", daemon=True),
+            threading.Thread(target=self._save_worker, name="pipeline-save", daemon=True),
+        ]
+        for worker in workers:
+            worker.start()
+
+        paused = False
+        try:
+            while True:
+                if auto_ss.stop_requested:
+                    break
+                if duration and (auto_ss.clock() - start_time) > duration:
+                    break
+
+                self._serve_full_frame_requests(source)
+
+                if auto_ss.is_paused:
+                    scheduler.idle('paused')
+                    paused = True
+                    continue
+                if paused:
+                    # 一時停止から復帰したら現在時刻から刻み直す
+                    scheduler.reset()
+                    paused = False
+
+                with auto_ss.time_stage('capture'):
+                    frame = source.grab(auto_ss.next_capture_region())
+                if frame is None:
+                    print("\nフレームソースの終端に達しました")
+                    break
+                self.stats['captured'] += 1
+                self._put_latest(frame)
+
+                scheduler.wait(auto_ss.state)
+        finally:
+            # 終端を流して各ステージを順に終了させる
+            self.detect_queue.put(None)
+            for worker in workers:
+                while worker.is_alive():
+                    # 状態遷移ステージが全画面フレームを待っていれば応える
+                    self._serve_full_frame_requests(source)
+                    worker.join(timeout=0.1)
+            self.print_stats()
+
+    def _sleep(self, source, seconds):
+        """待機中も全画面フレームの要求には即座に応える"""
+        clock = self.auto_ss.clock
+        deadline = clock() + seconds
+        while True:
+            remaining = deadline - clock()
+            if remaining <= 0:
+                return
+            if self._wakeup.wait(remaining):
+                self._wakeup.clear()
+                self._serve_full_frame_requests(source)
+
+    def _put_latest(self, frame):
+        """検出キューに追加（満杯なら最も古いフレームを破棄）"""
+        try:
+            self.detect_queue.put_nowait(frame)
+        except queue.Full:
+            try:
+                self.detect_queue.get_nowait()
+                self.stats['dropped'] += 1
+                if self.auto_ss.metrics:
+                    self.auto_ss.metrics.increment('drops')
+            except queue.Empty:
+                pass
+            self.detect_queue.put_nowait(frame)
+
+    def _serve_full_frame_requests(self, source):
+        """状態遷移ステージからの全画面フレーム要求に応える"""
+        while True:
+            try:
+                request = self._full_frame_requests.get_nowait()
+            except queue.Empty:
+                return
+            request['frame'] = source.grab()
+            request['done'].set()
+
+    def request_full_frame(self, frame):
+        """
+        保存用の全画面フレームを取得（状態遷移ステージから呼ぶ）
+
+        Returns:
+            Frame: 全画面フレーム。取得できなければ None
+        """
+        full = frame.to_full_frame()
+        if full is not None:
+            return full
+
+        request = {'frame': None, 'done': threading.Event()}
+        self._full_frame_requests.put(request)
+        self._wakeup.set()
+        request['done'].wait(self.full_frame_timeout)
+        return request['frame']
+
+    def _detect_worker(self):
+        """検出ステージ"""
+        while True:
+            frame = self.detect_queue.get()
+            if frame is None:
+                self.state_queue.put(None)
+                return
+            try:
+                result = self.auto_ss.analyze_frame(frame)
+            except Exception as e:
+                print(f"\n検出エラー: {e}")
+                continue
+            self.stats['detected'] += 1
+            self.state_queue.put(result)
+
+    def _state_worker(self):
+        """状態遷移ステージ"""
+        while True:
+            result = self.state_queue.get()
+            if result is None:
+                self.save_queue.put(None)
+                return
+            frame, is_detected, detected_forms, debug_info = result
+            try:
+                self.auto_ss.handle_detection(
+                    frame, is_detected, detected_forms, debug_info,
+                    full_frame=lambda: self.request_full_frame(frame),
+                    save=self.save_queue.put
+                )
+            except Exception as e:
+                print(f"\n状態遷移エラー: {e}")
+                continue
+
+    def _save_worker(self):
+        """保存ステージ"""
+        while True:
+            frame = self.save_queue.get()
+            if frame is None:
+                return
+            try:
+                # 重複で省略・破棄された撮影は数えない（ファイルを作ったときだけ撮影数が増える）
+                count = self.auto_ss.screenshot_count
+                self.auto_ss.save_screenshot(frame)
+                if self.auto_ss.screenshot_count > count:
+                    self.stats['saved'] += 1
+            except Exception as e:
+                print(f"\n保存エラー: {e}")
+
+    def print_stats(self):
+        """ステージごとの処理数を表示"""
+        stats = self.stats
+        print(f"\nパイプライン: キャプチャ {stats['captured']:,} | 破棄 {stats['dropped']:,} | "
+              f"検出 {stats['detected']:,} | 保存 {stats['saved']:,}")
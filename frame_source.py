@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+フレームソース - 画面キャプチャのセッションを保持してフレームを供給する
+
+run() の間ひとつのキャプチャセッションを使い回すことで、
+毎回のディスプレイ接続・モニター列挙・後片付けのコストを省きます。
+バックエンド:
+  - MssFrameSource: mss による実画面キャプチャ
+  - DirectoryFrameSource: ディレクトリ内の画像を順に供給
+  - SyntheticFrameSource: フォームを描画した合成フレームを生成（ヘッドレス環境用）
+"""
+
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+class Frame:
+    """
+    タイムスタンプ付きの1フレーム
+
+    image はキャプチャバッファをそのまま参照する BGRA または BGR の配列です。
+    BGR配列やPIL Imageは必要になったときに初めて作成します。
+    """
+
+    def __init__(self, image, timestamp, index=0, source_name="", offset=(0, 0), full_size=None):
+        """
+        Args:
+            image: numpy配列の画像データ (BGRA または BGR)
+            timestamp: キャプチャ時刻（秒、FrameSource.clock の値）
+            index: ソース内での通し番号
+            source_name: フレームの出所（ファイル名など）
+            offset: 部分キャプチャの場合、全画面内での左上座標 (x, y)
+            full_size: 全画面のサイズ (幅, 高さ)。None=このフレームが全画面
+        """
+        self.image = image
+        self.timestamp = timestamp
+        self.index = index
+        self.source_name = source_name
+        self.offset = offset
+        self.full_size = full_size if full_size is not None else (image.shape[1], image.shape[0])
+        self.full_image = None  # 全画面画像から切り出した場合の元画像
+        self.detected_forms = None  # 撮影時に検出されていたフォーム（handle_detection が設定）
+        self._bgr = None
+
+    @property
+    def size(self):
+        """(幅, 高さ)"""
+        return self.image.shape[1], self.image.shape[0]
+
+    @property
+    def is_partial(self):
+        """全画面の一部だけをキャプチャしたフレームか"""
+        return self.size != tuple(self.full_size)
+
+    def to_full_frame(self):
+        """
+        全画面のフレームを返す
+
+        Returns:
+            Frame: 全画面フレーム。部分キャプチャで元画像を持たない場合は None
+        """
+        if not self.is_partial:
+            return self
+        if self.full_image is None:
+            return None
+        return Frame(self.full_image, self.timestamp, index=self.index, source_name=self.source_name)
+
+    @property
+    def bgr(self):
+        """BGR配列（BGRAの場合は初回アクセス時に変換してキャッシュ）"""
+        if self._bgr is None:
+            if self.image.ndim == 3 and self.image.shape[2] == 4:
+                self._bgr = cv2.cvtColor(self.image, cv2.COLOR_BGRA2BGR)
+            else:
+                self._bgr = self.image
+        return self._bgr
+
+    def to_pil(self):
+        """保存用のPIL Imageを作成"""
+        image = self.image
+        if image.ndim == 3 and image.shape[2] == 4 and image.flags['C_CONTIGUOUS']:
+            # BGRAバッファから直接RGBに展開（中間配列を作らない）
+            return Image.frombuffer('RGB', self.size, image, 'raw', 'BGRX', 0, 1)
+        return Image.fromarray(cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB))
+
+
+class FrameSource:
+    """フレームソースの基底クラス"""
+
+    def __init__(self):
+        self.frame_count = 0
+        self.clock = time.monotonic  # フレームのタイムスタンプに使うクロック
+
+    def open(self):
+        """キャプチャセッションを開始"""
+
+    def close(self):
+        """キャプチャセッションを終了"""
+
+    def grab(self, region=None):
+        """
+        次のフレームを取得
+
+        Args:
+            region: 全画面内の部分領域 (x, y, w, h)。None=全画面
+
+        Returns:
+            Frame: 取得したフレーム。ソースが尽きた場合は None
+        """
+        raise NotImplementedError
+
+    def _make_frame(self, image, source_name="", region=None):
+        if region is not None:
+            # 全画面画像から部分領域をビューとして切り出す
+            x, y, w, h = region
+            full_size = (image.shape[1], image.shape[0])
+            frame = Frame(image[y:y + h, x:x + w], self.clock(), index=self.frame_count,
+                          source_name=source_name, offset=(x, y), full_size=full_size)
+            frame.full_image = image
+        else:
+            frame = Frame(image, self.clock(), index=self.frame_count, source_name=source_name)
+        self.frame_count += 1
+        return frame
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class MssFrameSource(FrameSource):
+    """mss による実画面キャプチャ"""
+
+    def __init__(self, region=None, monitor_index=1):
+        """
+        Args:
+            region: キャプチャする領域 {"top": y, "left": x, "width": w, "height": h}
+            monitor_index: region 未指定時に使うモニター番号（1=メインモニター）
+        """
+        super().__init__()
+        self.region = region
+        self.monitor_index = monitor_index
+        self.sct = None
+        self.monitor = None
+
+    def open(self):
+        from mss import mss
+
+        if self.sct is not None:
+            return
+        self.sct = mss()
+        self.monitor = self.region if self.region else self.sct.monitors[self.monitor_index]
+
+    def close(self):
+        if self.sct is not None:
+            self.sct.close()
+            self.sct = None
+
+    def grab(self, region=None):
+        if self.sct is None:
+            self.open()
+
+        if region is None:
+            screenshot = self.sct.grab(self.monitor)
+            # mssのBGRAバッファをコピーせずにnumpy配列として参照（grabごとに新しいバッファ）
+            return self._make_frame(np.asarray(screenshot))
+
+        # 指定領域だけを画面から取得（転送するピクセル数そのものを減らす）
+        x, y, w, h = region
+        screenshot = self.sct.grab({
+            "left": self.monitor["left"] + x,
+            "top": self.monitor["top"] + y,
+            "width": w,
+            "height": h,
+        })
+        frame = Frame(np.asarray(screenshot), self.clock(), index=self.frame_count, offset=(x, y),
+                      full_size=(self.monitor["width"], self.monitor["height"]))
+        self.frame_count += 1
+        return frame
+
+
+class DirectoryFrameSource(FrameSource):
+    """ディレクトリ内の画像をファイル名順に供給"""
+
+    def __init__(self, directory, pattern="*.png", loop=False):
+        """
+        Args:
+            directory: 画像ディレクトリ
+            pattern: 対象ファイルのglobパターン
+            loop: 末尾まで読んだら先頭に戻るか
+        """
+        super().__init__()
+        self.directory = directory
+        self.pattern = pattern
+        self.loop = loop
+        self.files = []
+        self.position = 0
+
+    def open(self):
+        self.files = sorted(glob.glob(os.path.join(self.directory, self.pattern)))
+        self.position = 0
+
+    def grab(self, region=None):
+        while self.position < len(self.files) or (self.loop and self.files):
+            if self.position >= len(self.files):
+                self.position = 0
+            path = self.files[self.position]
+            self.position += 1
+            image = load_image(path)
+            if image is None:
+                print(f"画像を読み込めませんでした: {path}")
+                continue
+            return self._make_frame(image, source_name=os.path.basename(path), region=region)
+        return None
+
+
+class SyntheticFrameSource(FrameSource):
+    """フォームを描画した合成フレームを生成"""
+
+    def __init__(self,
+                 width=1920,
+                 height=1080,
+                 form_bbox=(800, 400, 360, 260),
+                 form_color_hsv=(118, 60, 230),
+                 bar_thickness=24,
+                 visible=None,
+                 max_frames=None):
+        """
+        Args:
+            width: フレームの幅
+            height: フレームの高さ
+            form_bbox: フォームの位置とサイズ (x, y, w, h)
+            form_color_hsv: フォーム枠の色 (H, S, V)
+            bar_thickness: 上下バーの太さ（ピクセル）
+            visible: フレーム番号を受け取りフォームを描画するかを返す関数。None=常に表示
+            max_frames: 生成するフレーム数の上限。None=無制限
+        """
+        super().__init__()
+        self.width = width
+        self.height = height
+        self.form_bbox = form_bbox
+        self.form_color_bgr = hsv_to_bgr(form_color_hsv)
+        self.bar_thickness = bar_thickness
+        self.visible = visible
+        self.max_frames = max_frames
+
+        self._background = np.full((height, width, 3), 245, dtype=np.uint8)
+        self._with_form = draw_form(self._background.copy(), form_bbox, self.form_color_bgr, bar_thickness)
+        # 同じ配列を毎フレーム返すので書き換えを禁止
+        self._background.flags.writeable = False
+        self._with_form.flags.writeable = False
+
+    def grab(self, region=None):
+        if self.max_frames is not None and self.frame_count >= self.max_frames:
+            return None
+        show = self.visible(self.frame_count) if self.visible else True
+        image = self._with_form if show else self._background
+        return self._make_frame(image, region=region)
+
+
+def load_image(path):
+    """日本語パスにも対応した画像読み込み (BGR)"""
+    try:
+        return cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+    except Exception:
+        return None
+
+
+def hsv_to_bgr(hsv):
+    """HSV色 (H, S, V) をBGRタプルに変換"""
+    pixel = cv2.cvtColor(np.uint8([[hsv]]), cv2.COLOR_HSV2BGR)[0, 0]
+    return tuple(int(c) for c in pixel)
+
+
+def draw_form(image, bbox, color_bgr, bar_thickness=24, border=4):
+    """上下に太いバー、左右に細い枠、内部に白いテキストボックスを持つフォームを描画"""
+    x, y, w, h = bbox
+    cv2.rectangle(image, (x, y), (x + w - 1, y + h - 1), color_bgr, -1)
+    # 内部のテキストボックス（上下バーと左右の枠を残して白く塗る）
+    cv2.rectangle(image,
+                  (x + border, y + bar_thickness),
+                  (x + w - 1 - border, y + h - 1 - bar_thickness),
+                  (255, 255, 255), -1)
+    return image
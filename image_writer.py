@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+画像書き込みプール - スクリーンショットのエンコードと書き込みをバックグラウンドで行う
+
+4K の PNG を既定の圧縮率で保存するとポーリングループが数百ミリ秒止まるため、
+メモリ上の BGR 配列をワーカースレッドで直接エンコードして書き込みます。
+形式: PNG（圧縮レベル指定）、WebP（可逆）、JPEG（品質指定）、BMP（無圧縮）
+"""
+
+import queue
+import threading
+import time
+
+import cv2
+
+
+class ImageWriterPool:
+    """上限付きキューを持つ画像書き込みワーカープール"""
+
+    # 形式名 → (拡張子, エンコードパラメータを作る関数)
+    FORMATS = {
+        'png': ('.png', lambda w: [cv2.IMWRITE_PNG_COMPRESSION, w.png_compression]),
+        'webp': ('.webp', lambda w: [cv2.IMWRITE_WEBP_QUALITY, 101]),  # 101以上で可逆圧縮
+        'jpeg': ('.jpg', lambda w: [cv2.IMWRITE_JPEG_QUALITY, w.jpeg_quality]),
+        'bmp': ('.bmp', lambda w: []),
+    }
+
+    def __init__(self,
+                 image_format='png',
+                 png_compression=1,
+                 jpeg_quality=90,
+                 workers=2,
+                 max_queue=8,
+                 backpressure='block',
+                 verbose=True):
+        """
+        Args:
+            image_format: 保存形式 ('png', 'webp', 'jpeg', 'bmp')
+            png_compression: PNGの圧縮レベル（0=無圧縮〜9=最大）
+            jpeg_quality: JPEGの品質（0〜100）
+            workers: ワーカースレッド数
+            max_queue: 書き込み待ちの上限
+            backpressure: キューが満杯のときの動作 ('block'=空くまで待つ, 'drop'=破棄して記録)
+            verbose: 書き込みごとにエンコード時間とサイズを表示するか
+        """
+        if image_format not in self.FORMATS:
+            raise ValueError(f"未対応の保存形式: {image_format}（{', '.join(self.FORMATS)} のいずれか）")
+        if backpressure not in ('block', 'drop'):
+            raise ValueError(f"未対応のbackpressure: {backpressure}（'block' または 'drop'）")
+
+        self.image_format = image_format
+        self.png_compression = png_compression
+        self.jpeg_quality = jpeg_quality
+        self.worker_count = workers
+        self.backpressure = backpressure
+        self.verbose = verbose
+
+        self.extension, make_params = self.FORMATS[image_format]
+        self.encode_params = make_params(self)
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.threads = []
+        self._lock = threading.Lock()
+        self._pending = {}  # 書き込み待ちのパス → 書き終えたときにセットするイベント
+        self.stats = {'written': 0, 'dropped': 0, 'failed': 0, 'bytes': 0, 'encode_seconds': 0.0}
+
+    def start(self):
+        """ワーカースレッドを起動（submit() 時に自動で呼ばれる）"""
+        if self.threads:
+            return
+        self.threads = [
+            threading.Thread(target=self._worker, name=f"image-writer-{i}", daemon=True)
+            for i in range(self.worker_count)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def encode(self, image_bgr):
+        """
+        BGR配列をエンコード
+
+        Returns:
+            bytes: エンコード済みの画像データ
+        """
+        ok, buffer = cv2.imencode(self.extension, image_bgr, self.encode_params)
+        if not ok:
+            raise RuntimeError(f"{self.image_format} へのエンコードに失敗しました")
+        return buffer.tobytes()
+
+    def submit(self, image_bgr, path):
+        """
+        書き込みを依頼
+
+        Args:
+            image_bgr: 保存する画像 (BGR)。書き込み完了まで変更しないこと
+            path: 保存先パス（拡張子は self.extension を使う）
+
+        Returns:
+            bool: キューに入れられたか（'drop' で満杯の場合は False）
+        """
+        self.start()
+        with self._lock:
+            self._pending[path] = threading.Event()
+        if self.backpressure == 'drop':
+            try:
+                self.queue.put_nowait((image_bgr, path))
+            except queue.Full:
+                with self._lock:
+                    self._pending.pop(path).set()
+                    self.stats['dropped'] += 1
+                print(f"⚠ 書き込みキューが満杯のため破棄: {path}")
+                return False
+        else:
+            self.queue.put((image_bgr, path))
+        return True
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                try:
+                    self._write(*item)
+                finally:
+                    with self._lock:
+                        done = self._pending.pop(item[1], None)
+                    if done is not None:
+                        done.set()
+            finally:
+                self.queue.task_done()
+
+    def _write(self, image_bgr, path):
+        try:
+            started = time.perf_counter()
+            data = self.encode(image_bgr)
+            encode_seconds = time.perf_counter() - started
+            # 日本語パスでも書き込めるようにPythonのファイルAPIを使う
+            with open(path, 'wb') as f:
+                f.write(data)
+        except Exception as e:
+            with self._lock:
+                self.stats['failed'] += 1
+            print(f"\n⚠ 書き込みに失敗: {path} ({e})")
+            return
+
+        with self._lock:
+            self.stats['written'] += 1
+            self.stats['bytes'] += len(data)
+            self.stats['encode_seconds'] += encode_seconds
+        if self.verbose:
+            print(f"\n  書き込み完了: {path} （エンコード {encode_seconds * 1000:.0f}ms, {len(data) / 1024:,.0f}KB）")
+
+    def wait_for(self, path, timeout=None):
+        """
+        指定したファイルの書き込みが終わるまで待つ（書き込み待ちでなければすぐに戻る）
+
+        Args:
+            path: submit() したパス
+            timeout: 待つ上限（秒）。None=無制限
+
+        Returns:
+            bool: 書き込み待ちでなくなったか
+        """
+        with self._lock:
+            done = self._pending.get(path)
+        return done is None or done.wait(timeout)
+
+    def flush(self):
+        """書き込み待ちの画像をすべて書き終えるまで待つ"""
+        if self.threads:
+            self.queue.join()
+
+    def close(self):
+        """書き込み待ちを書き終えてからワーカーを終了"""
+        self.flush()
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def print_stats(self):
+        """形式ごとのエンコード時間と書き込みバイト数を表示"""
+        stats = self.stats
+        written = stats['written']
+        if written == 0 and stats['dropped'] == 0 and stats['failed'] == 0:
+            return
+        average_ms = stats['encode_seconds'] / written * 1000 if written else 0.0
+        average_kb = stats['bytes'] / written / 1024 if written else 0.0
+        print(f"画像書き込み ({self.image_format}): {written:,}枚 | 平均エンコード {average_ms:.0f}ms | "
+              f"平均 {average_kb:,.0f}KB | 合計 {stats['bytes'] / 1024 / 1024:,.1f}MB | "
+              f"破棄 {stats['dropped']:,} | 失敗 {stats['failed']:,}")
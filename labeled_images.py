@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ラベル付き画像セット - 設定の評価や調整に使う正解付きの画像一覧
+
+2通りの指定方法があります:
+  - ラベルファイル（JSONL、1行1画像）:
+        {"path": "quiz_0001.png", "positive": true, "bboxes": [[800, 400, 360, 260]]}
+        {"path": "lecture_0100.png", "positive": false}
+    path はラベルファイルからの相対パス可。positive を省略すると bboxes があれば正例
+  - ディレクトリ・globパターン: 正例（フォームあり）と負例（フォームなし）を別々に指定
+"""
+
+import glob
+import json
+import os
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+
+
+class LabeledImage:
+    """正解付きの画像1枚"""
+
+    def __init__(self, path, positive, bboxes=None):
+        """
+        Args:
+            path: 画像ファイルのパス
+            positive: フォームが写っているか
+            bboxes: フォームの位置 [(x, y, w, h), ...]。None=位置の正解なし
+        """
+        self.path = path
+        self.positive = positive
+        self.bboxes = [tuple(int(v) for v in bbox) for bbox in bboxes] if bboxes else None
+
+
+def collect_files(inputs, recursive=False):
+    """
+    ディレクトリ・globパターン・ファイルから画像ファイルを列挙（重複は除く）
+
+    Returns:
+        list: 画像ファイルのパス（ソート済み）
+    """
+    files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, '**', '*') if recursive else os.path.join(item, '*')
+            candidates = glob.glob(pattern, recursive=recursive)
+        elif glob.has_magic(item):
+            candidates = glob.glob(item, recursive=True)
+        else:
+            candidates = [item]
+        files.update(path for path in candidates
+                     if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(files)
+
+
+def load_label_file(path):
+    """
+    JSONLのラベルファイルを読み込む
+
+    Returns:
+        list: LabeledImage のリスト
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    images = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if 'path' not in record:
+                raise ValueError(f"{path}:{line_number}: path がありません")
+            bboxes = record.get('bboxes')
+            images.append(LabeledImage(
+                os.path.join(base_dir, record['path']),
+                record.get('positive', bool(bboxes)),
+                bboxes
+            ))
+    return images
+
+
+def load_labeled_images(labels=None, positives=(), negatives=(), recursive=False):
+    """
+    ラベルファイルと正例・負例の指定をまとめて読み込む
+
+    Args:
+        labels: JSONLのラベルファイル（省略可）
+        positives: 正例の画像ファイル・ディレクトリ・globパターンのリスト
+        negatives: 負例の画像ファイル・ディレクトリ・globパターンのリスト
+        recursive: ディレクトリをサブフォルダまで探すか
+
+    Returns:
+        list: LabeledImage のリスト
+    """
+    images = load_label_file(labels) if labels else []
+    images += [LabeledImage(path, True) for path in collect_files(positives or [], recursive)]
+    images += [LabeledImage(path, False) for path in collect_files(negatives or [], recursive)]
+    return images
+
+
+def iou(bbox_a, bbox_b):
+    """2つの矩形 (x, y, w, h) の IoU"""
+    ax, ay, aw, ah = bbox_a
+    bx, by, bw, bh = bbox_b
+    overlap_w = min(ax + aw, bx + bw) - max(ax, bx)
+    overlap_h = min(ay + ah, by + bh) - max(ay, by)
+    if overlap_w <= 0 or overlap_h <= 0:
+        return 0.0
+    overlap = overlap_w * overlap_h
+    return overlap / (aw * ah + bw * bh - overlap)
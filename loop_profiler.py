@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ループプロファイラ - ポーリングループの指定した反復回数だけをプロファイルする
+
+実際の講義画面で検出が遅くなった原因を、コードを書き換えずに調べるためのものです。
+  - 'collapsed': 別スレッドが一定間隔でループのスタックを採取（サンプリング、低負荷）。
+                 flamegraph.pl や speedscope で読める collapsed stack 形式で保存
+  - 'pstats':    cProfile で全関数呼び出しを記録（負荷は大きいが呼び出し回数まで分かる）
+
+どちらの形式でも、反復ごとの状態・候補数・所要時間を *_frames.jsonl に書き出します。
+反復と反復の間（次のデッドラインまでの待機）は記録しないので、所要時間は検出と状態遷移の分だけです。
+collapsed 形式ではスタックの先頭に状態と候補数のタグを付けるので、
+「検出中で候補が100個以上のフレーム」だけの内訳を見ることもできます。
+
+使い方:
+    python auto_screenshot.py --profile 300                 # 300反復分を profiles/ に保存
+    auto_ss.run(profile=LoopProfiler(iterations=300, skip=600, output_format='pstats'))
+"""
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+
+def candidate_bucket(count):
+    """候補数をタグ用の区分に変換（区分を粗くしてスタックが細かく分かれすぎないようにする）"""
+    if count == 0:
+        return "0"
+    if count < 10:
+        return "1-9"
+    if count < 100:
+        return "10-99"
+    return "100+"
+
+
+class LoopProfiler:
+    """ポーリングループの連続した N 反復をプロファイル"""
+
+    def __init__(self, iterations=300, skip=0, output_format='collapsed', output_dir="profiles",
+                 session=None, sample_interval=0.005):
+        """
+        Args:
+            iterations: プロファイルする反復回数
+            skip: プロファイルを始めるまでに読み飛ばす反復回数（起動直後を除く場合など）
+            output_format: 'collapsed'（サンプリング）または 'pstats'（cProfile）
+            output_dir: 出力先ディレクトリ
+            session: 出力ファイル名に使うセッション名。None=開始日時
+            sample_interval: サンプリング間隔（秒、'collapsed' のみ）
+        """
+        if output_format not in ('collapsed', 'pstats'):
+            raise ValueError(f"未対応のoutput_format: {output_format}（'collapsed' または 'pstats'）")
+        self.iterations = iterations
+        self.skip = skip
+        self.output_format = output_format
+        self.output_dir = output_dir
+        self.session = session or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.sample_interval = sample_interval
+
+        self.iteration = 0        # これまでの反復回数（読み飛ばし分を含む）
+        self.profiled = 0         # プロファイルした反復回数
+        self.finished = False
+        self.stacks = Counter()   # タグ付きスタック → サンプル数
+        self.frames = []          # 反復ごとのタグ
+        self._pending = []        # 現在の反復で採取したスタック
+        self._labels = {}         # コードオブジェクト → スタックに表示する名前
+        self._profile = None
+        self._sampler = None
+        self._stop = threading.Event()
+        self._target_thread = None
+        self._iteration_start = None
+
+    @property
+    def active(self):
+        """プロファイル中か"""
+        return self._iteration_start is not None
+
+    def begin_iteration(self):
+        """反復の開始（ループの先頭で呼ぶ）"""
+        if self.finished or self.iteration < self.skip:
+            return
+        self._pending = []
+        if self.profiled == 0 and not self.active:
+            self._start()
+        elif self._profile is not None:
+            self._profile.enable()
+        self._iteration_start = time.perf_counter()
+
+    def end_iteration(self, state, candidates, detected=False):
+        """
+        反復の終了（次のデッドラインまでの待機の前に呼ぶ）
+
+        Args:
+            state: この反復でフレームを判定したときの状態
+            candidates: 候補（輪郭・連結成分）の数
+            detected: フォームが検出されたか
+
+        Returns:
+            bool: プロファイルが終わり、結果を書き出した場合 True
+        """
+        self.iteration += 1
+        if not self.active:
+            return False
+
+        if self._profile is not None:
+            self._profile.disable()
+        samples, self._pending = self._pending, []
+        tag = (f"state:{state}", f"candidates:{candidate_bucket(candidates)}")
+        for stack in samples:
+            self.stacks[tag + stack] += 1
+        self.frames.append({
+            'iteration': self.iteration,
+            'state': state,
+            'candidates': candidates,
+            'detected': detected,
+            'iteration_ms': round((time.perf_counter() - self._iteration_start) * 1000, 3),
+            'samples': len(samples),
+        })
+        self.profiled += 1
+        self._iteration_start = None
+
+        if self.profiled >= self.iterations:
+            self.finish()
+            return True
+        return False
+
+    def _start(self):
+        print(f"\n[プロファイル] {self.iterations}反復のプロファイルを開始（{self.output_format}）")
+        if self.output_format == 'pstats':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._target_thread = threading.get_ident()
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample_loop, name="loop-profiler", daemon=True)
+            self._sampler.start()
+
+    def _sample_loop(self):
+        """ループのスレッドのスタックを一定間隔で採取"""
+        while not self._stop.wait(self.sample_interval):
+            if not self.active:
+                # 反復の間（待機中）は採取しない
+                continue
+            frame = sys._current_frames().get(self._target_thread)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None:
+                    label = self._labels[code] = (
+                        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                stack.append(label)
+                frame = frame.f_back
+            self._pending.append(tuple(reversed(stack)))
+
+    def finish(self):
+        """プロファイルを止めて結果を書き出す（途中で終了した場合も run() の終了時に呼ばれる）"""
+        if self.finished or (self.profiled == 0 and self._profile is None and self._sampler is None):
+            self.finished = True
+            return
+        self.finished = True
+        self._iteration_start = None
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+        self.write()
+
+    def write(self):
+        """結果をファイルに保存"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"profile_{self.session}")
+        if self.output_format == 'pstats':
+            output = f"{base}.pstats"
+            self._profile.dump_stats(output)
+        else:
+            output = f"{base}.collapsed"
+            with open(output, 'w', encoding='utf-8') as f:
+                for stack, count in sorted(self.stacks.items()):
+                    f.write(f"{';'.join(stack)} {count}\n")
+
+        frames_path = f"{base}_frames.jsonl"
+        with open(frames_path, 'w', encoding='utf-8') as f:
+            for record in self.frames:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        states = Counter(record['state'] for record in self.frames)
+        total_ms = sum(record['iteration_ms'] for record in self.frames)
+        print(f"\n[プロファイル] {self.profiled}反復（{total_ms / 1000:.1f}秒） | "
+              f"状態: {', '.join(f'{state} {count}' for state, count in states.most_common())}")
+        print(f"[プロファイル] 保存: {output}, {frames_path}")
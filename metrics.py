@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+検出メトリクス - 処理段階ごとの所要時間ヒストグラムと件数カウンタ
+
+段階（キャプチャ・変換・色マスク・輪郭・横バー判定・保存・GUI更新）ごとの所要時間を
+固定バケットのヒストグラムに記録し、フレーム数・撮影数・破棄数・省略数を数えます。
+一定間隔でJSONまたはPrometheusのテキスト形式のファイルに書き出すので、
+無人の講義用PCでもダッシュボード（node_exporter の textfile collector など）から
+検出コストの悪化に気付けます。
+
+使い方:
+    metrics = DetectionMetrics("metrics.prom", interval=15)   # 拡張子 .prom/.txt はPrometheus形式
+    auto_ss = AutoScreenshot(..., metrics=metrics)
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+
+
+# 記録する処理段階
+STAGES = ('capture', 'convert', 'mask', 'contours', 'bars', 'save', 'gui')
+
+# 件数カウンタ
+COUNTERS = ('frames', 'captures', 'drops', 'skips')
+
+# ヒストグラムのバケット上限（ミリ秒）。これを超えた値は +Inf のバケットに入る
+DEFAULT_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class StageHistogram:
+    """固定バケットの所要時間ヒストグラム（記録時にメモリを確保しない）"""
+
+    def __init__(self, buckets_ms=DEFAULT_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms):
+        """所要時間（ミリ秒）を1件記録"""
+        self.counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, q):
+        """
+        バケットから推定したパーセンタイル（そのバケットの上限値）
+
+        Args:
+            q: 0〜1 の割合
+
+        Returns:
+            float: 推定値（ミリ秒）。最後のバケットに入る場合は最大値
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets_ms, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(0.5), 3),
+            'p95_ms': round(self.percentile(0.95), 3),
+            'max_ms': round(self.max_ms, 3),
+            'buckets_ms': list(self.buckets_ms),
+            'counts': list(self.counts),
+        }
+
+
+class _StageTimer:
+    """with 文で1つの処理段階の所要時間を記録する"""
+
+    __slots__ = ('metrics', 'stage', 'started')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+class DetectionMetrics:
+    """処理段階ごとのヒストグラムと件数カウンタ（複数スレッドから記録可能）"""
+
+    def __init__(self, path=None, export_format=None, interval=10.0, labels=None,
+                 buckets_ms=DEFAULT_BUCKETS_MS, prefix="auto_screenshot"):
+        """
+        Args:
+            path: 書き出し先ファイル。None=書き出さない（print_stats() のみ）
+            export_format: 'json' または 'prometheus'。None=拡張子から判定（.prom/.txt はPrometheus）
+            interval: 書き出し間隔（秒）
+            labels: Prometheus形式で全系列に付けるラベルの辞書（例: {"host": "room-101"}）
+            buckets_ms: ヒストグラムのバケット上限（ミリ秒）
+            prefix: Prometheus形式のメトリクス名の接頭辞
+        """
+        if export_format is None:
+            export_format = 'prometheus' if path and path.endswith(('.prom', '.txt')) else 'json'
+        if export_format not in ('json', 'prometheus'):
+            raise ValueError(f"未対応のexport_format: {export_format}（'json' または 'prometheus'）")
+
+        self.path = path
+        self.export_format = export_format
+        self.interval = interval
+        self.labels = dict(labels or {})
+        self.prefix = prefix
+        self.histograms = {stage: StageHistogram(buckets_ms) for stage in STAGES}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._users = 0  # start() した実行ループの数（複数モニターで共有する場合）
+
+    def stage(self, name):
+        """
+        処理段階の所要時間を記録するコンテキストマネージャ
+
+        使い方:
+            with metrics.stage('mask'):
+                mask = cv2.inRange(...)
+        """
+        return _StageTimer(self, name)
+
+    def observe(self, stage, seconds):
+        """処理段階の所要時間（秒）を1件記録"""
+        with self._lock:
+            self.histograms[stage].observe(seconds * 1000.0)
+
+    def increment(self, counter, amount=1):
+        """件数カウンタを増やす"""
+        with self._lock:
+            self.counters[counter] += amount
+
+    def snapshot(self):
+        """現在の値（JSONに書き出せる辞書）"""
+        with self._lock:
+            return {
+                'timestamp': time.time(),
+                'uptime_seconds': round(time.time() - self.started_at, 3),
+                'labels': dict(self.labels),
+                'counters': dict(self.counters),
+                'stages': {stage: histogram.to_dict() for stage, histogram in self.histograms.items()},
+            }
+
+    def to_prometheus(self):
+        """Prometheusのテキスト形式"""
+        snapshot = self.snapshot()
+        base = ','.join(f'{key}="{value}"' for key, value in sorted(self.labels.items()))
+
+        def series(name, extra="", value=0):
+            label_text = ','.join(part for part in (base, extra) if part)
+            return f"{self.prefix}_{name}{{{label_text}}} {value}" if label_text else f"{self.prefix}_{name} {value}"
+
+        lines = [
+            f"# HELP {self.prefix}_stage_seconds Duration of each detection loop stage",
+            f"# TYPE {self.prefix}_stage_seconds histogram",
+        ]
+        for stage, data in snapshot['stages'].items():
+            cumulative = 0
+            for bound, count in zip(data['buckets_ms'], data['counts']):
+                cumulative += count
+                lines.append(series('stage_seconds_bucket', f'stage="{stage}",le="{bound / 1000:g}"', cumulative))
+            lines.append(series('stage_seconds_bucket', f'stage="{stage}",le="+Inf"', data['count']))
+            lines.append(series('stage_seconds_sum', f'stage="{stage}"', f"{data['sum_ms'] / 1000:.6f}"))
+            lines.append(series('stage_seconds_count', f'stage="{stage}"', data['count']))
+        for counter, value in snapshot['counters'].items():
+            lines.append(f"# TYPE {self.prefix}_{counter}_total counter")
+            lines.append(series(f"{counter}_total", value=value))
+        lines.append(f"# TYPE {self.prefix}_uptime_seconds gauge")
+        lines.append(series('uptime_seconds', value=snapshot['uptime_seconds']))
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        """ファイルに書き出す（一時ファイルに書いてから置き換えるので読み手が途中の内容を見ない）"""
+        if not self.path:
+            return
+        if self.export_format == 'prometheus':
+            text = self.to_prometheus()
+        else:
+            text = json.dumps(self.snapshot(), ensure_ascii=False, indent=2) + "\n"
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, self.path)
+
+    def start(self):
+        """一定間隔の書き出しを開始（AutoScreenshot.run() が呼ぶ）"""
+        with self._lock:
+            self._users += 1
+            if self._thread is not None or not self.path:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._export_loop, name="metrics-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """書き出しを止め、最後の値を書き出す（全ての実行ループが stop() したとき）"""
+        with self._lock:
+            self._users = max(0, self._users - 1)
+            if self._users > 0:
+                return
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+        self.export()
+
+    def _export_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.export()
+            except OSError as e:
+                print(f"\nメトリクス書き出しエラー: {e}")
+
+    def print_stats(self):
+        """処理段階ごとの所要時間と件数を表示"""
+        snapshot = self.snapshot()
+        counters = snapshot['counters']
+        print(f"フレーム: {counters['frames']:,} | 撮影: {counters['captures']:,} | "
+              f"破棄: {counters['drops']:,} | 検出省略: {counters['skips']:,}")
+        for stage, data in snapshot['stages'].items():
+            if data['count'] == 0:
+                continue
+            print(f"  {stage:<9} {data['count']:>8,}回 | 平均 {data['mean_ms']:.2f}ms | "
+                  f"p95 {data['p95_ms']:.2f}ms | 最大 {data['max_ms']:.1f}ms")
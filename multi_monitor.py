@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+複数モニター監視 - モニターごとにキャプチャ・検出・状態遷移を並列実行する
+
+仮想デスクトップ全体を1枚の巨大なフレームとして取得する代わりに、
+モニターごとに AutoScreenshot をワーカースレッドで動かします。
+OpenCV と mss の処理中は GIL が解放されるため、モニター数に応じて並列に処理できます。
+"""
+
+import sys
+import io
+# Windows環境での文字化け対策
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+import threading
+import time
+
+from auto_screenshot import AutoScreenshot
+
+
+class MultiMonitorAutoScreenshot:
+    """複数モニターを並列に監視する"""
+
+    # GUIに表示する状態の優先順位（先頭ほど優先）
+    STATE_PRIORITY = [
+        AutoScreenshot.STATE_DETECTING,
+        AutoScreenshot.STATE_CAPTURED,
+        AutoScreenshot.STATE_COOLDOWN,
+        AutoScreenshot.STATE_WAITING,
+    ]
+
+    def __init__(self, monitors=None, **settings):
+        """
+        Args:
+            monitors: 監視するモニター番号のリスト（mssの番号、1=メインモニター）。
+                      None=仮想デスクトップを構成する全モニター
+            **settings: 各モニターの AutoScreenshot に渡す設定
+        """
+        if 'capture_region' in settings or 'frame_source' in settings:
+            raise ValueError("複数モニター監視では capture_region / frame_source は指定できません")
+        if 'overlay' in settings:
+            raise ValueError("複数モニター監視では overlay は指定できません（オーバーレイはモニターごとに1つ）")
+
+        self.monitors = monitors
+        self.settings = settings
+        self.watchers = []
+        self.gui = None
+
+    @staticmethod
+    def list_monitors():
+        """接続されているモニター番号の一覧（0番の仮想デスクトップ全体は除く）"""
+        from mss import mss
+
+        with mss() as sct:
+            return list(range(1, len(sct.monitors)))
+
+    def create_watchers(self):
+        """モニターごとの AutoScreenshot を作成（ログ名と保存ファイル名はモニター番号付き）"""
+        monitors = self.monitors or self.list_monitors()
+        self.watchers = [
+            AutoScreenshot(
+                monitor_index=index,
+                filename_prefix=f"screenshot_m{index}",
+                name=f"m{index}",
+                **self.settings
+            )
+            for index in monitors
+        ]
+        return self.watchers
+
+    def on_pause_toggle(self, is_paused):
+        """一時停止/再開のコールバック"""
+        for watcher in self.watchers:
+            watcher.on_pause_toggle(is_paused)
+
+    def on_stop_request(self):
+        """停止ボタンが押されたときのコールバック"""
+        for watcher in self.watchers:
+            watcher.on_stop_request()
+
+    def on_cancel_request(self):
+        """キャンセルボタンが押されたときのコールバック（検出中のモニターのみ）"""
+        for watcher in self.watchers:
+            if watcher.state == AutoScreenshot.STATE_DETECTING:
+                watcher.on_cancel_request()
+
+    def _update_gui(self):
+        """最も優先度の高い状態のモニターをGUIに表示"""
+        if not self.watchers or any(w.is_paused for w in self.watchers):
+            return
+
+        watcher = min(self.watchers, key=lambda w: self.STATE_PRIORITY.index(w.state))
+        self.gui.update_state(watcher.state, f"モニター {watcher.monitor_index}")
+        self.gui.update_counter(sum(w.screenshot_count for w in self.watchers))
+
+    def run(self, duration=None, use_gui=True):
+        """
+        全モニターの監視を開始
+
+        Args:
+            duration: 実行時間（秒）。Noneの場合は無限に実行
+            use_gui: GUIを使用するかどうか
+        """
+        self.create_watchers()
+        self.watchers[0].print_settings(use_gui)
+        print(f"監視モニター: {', '.join(str(w.monitor_index) for w in self.watchers)}")
+
+        # GUIを起動（状態表示はメインスレッドでまとめて更新）
+        if use_gui:
+            try:
+                from overlay_gui import OverlayGUI
+                self.gui = OverlayGUI(
+                    on_pause_callback=self.on_pause_toggle,
+                    on_stop_callback=self.on_stop_request,
+                    on_cancel_callback=self.on_cancel_request
+                )
+                self.gui.start()
+                print("✓ GUIウィンドウを起動しました")
+            except Exception as e:
+                print(f"⚠ GUI起動に失敗: {e}")
+                print("コンソールモードで続行します")
+                self.gui = None
+
+        threads = [
+            threading.Thread(
+                target=watcher.run,
+                kwargs={'duration': duration, 'use_gui': False, 'show_banner': False},
+                name=f"monitor-{watcher.monitor_index}",
+                daemon=True
+            )
+            for watcher in self.watchers
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                if self.gui:
+                    self._update_gui()
+                time.sleep(0.2)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.on_stop_request()
+            for thread in threads:
+                thread.join(timeout=5)
+
+            print("\n" + "=" * 70)
+            print("停止しました")
+            for watcher in self.watchers:
+                print(f"  モニター {watcher.monitor_index}: {watcher.screenshot_count} 枚")
+            print(f"合計 {sum(w.screenshot_count for w in self.watchers)} 枚のスクリーンショットを保存しました")
+            print("=" * 70)
+
+            if self.gui:
+                self.gui.destroy()
+                print("GUI終了")
+
+
+if __name__ == "__main__":
+    multi_ss = MultiMonitorAutoScreenshot(
+        monitors=None,               # None=全モニター、例: [1, 3]
+        target_color_hsv_range=[(110, 40, 180), (125, 255, 255)],
+        min_area=30000,
+        max_area=200000,
+        aspect_ratio_range=(1.0, 2.0),
+        detection_time=2.0,
+        disappear_check_time=1.5,
+        cooldown_time=3.0,
+        save_dir="screenshots",
+        check_interval=0.5
+    )
+    multi_ss.run()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+複数プロファイル検出 - 1回のキャプチャで複数種類のフォームを同時に監視する
+
+プロファイル（detection_profile.DetectionProfile）ごとに AutoScreenshot を作り、
+状態遷移と保存先（サブフォルダ）はプロファイルごとに分けます。
+キャプチャとHSV変換はフレームごとに1回だけ行い、色マスクと候補の抽出
+（輪郭・連結成分）は同じ色範囲のプロファイルで共有します。
+形状の条件（面積・アスペクト比・横バー）だけをプロファイルごとに適用します。
+
+使い方:
+    python multi_profile.py                 # 下の使用例のプロファイル
+    python multi_profile.py profiles.json   # プロファイルファイルを読み込む
+"""
+
+import sys
+import io
+# Windows環境での文字化け対策
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+import os
+import time
+
+import cv2
+
+from auto_screenshot import AutoScreenshot
+from detection_profile import DetectionProfile
+from polling_scheduler import PollingScheduler
+
+
+class MultiProfileAutoScreenshot:
+    """複数の検出プロファイルを1つのキャプチャで監視する"""
+
+    # GUIに表示する状態の優先順位（先頭ほど優先）
+    STATE_PRIORITY = [
+        AutoScreenshot.STATE_DETECTING,
+        AutoScreenshot.STATE_CAPTURED,
+        AutoScreenshot.STATE_COOLDOWN,
+        AutoScreenshot.STATE_WAITING,
+    ]
+
+    # 共有キャプチャでは使えない設定
+    UNSUPPORTED_SETTINGS = ('tracking', 'detection_scale', 'color_matcher', 'pipelined',
+                            'skip_unchanged_frames', 'metrics', 'overlay')
+
+    def __init__(self, profiles, save_dir="screenshots", **settings):
+        """
+        Args:
+            profiles: DetectionProfile のリスト
+            save_dir: 保存先ディレクトリ（プロファイルごとにサブフォルダを作る）
+            **settings: 全プロファイルに共通の AutoScreenshot の設定
+                        （check_interval, state_intervals, capture_region, frame_source, image_writer など）
+        """
+        if not profiles:
+            raise ValueError("プロファイルを1つ以上指定してください")
+        names = [profile.name for profile in profiles]
+        if len(set(names)) != len(names):
+            raise ValueError(f"プロファイル名が重複しています: {names}")
+        conflicts = [key for key in settings
+                     if key in DetectionProfile.SETTING_KEYS or key in self.UNSUPPORTED_SETTINGS]
+        if conflicts:
+            raise ValueError(f"複数プロファイル検出では指定できない設定です: {', '.join(conflicts)}")
+
+        self.profiles = list(profiles)
+        self.save_dir = save_dir
+        self.settings = settings
+        self.watchers = []
+        self.gui = None
+        self.clock = time.monotonic
+        self.sleep = time.sleep
+        self.is_paused = False
+        self.stop_requested = False
+        self.shared_stats = {'frames': 0, 'masks': 0, 'labelings': 0}
+
+    def create_watchers(self):
+        """プロファイルごとの AutoScreenshot を作成（状態遷移と保存先を分ける）"""
+        self.watchers = [
+            AutoScreenshot(
+                save_dir=os.path.join(self.save_dir, profile.subfolder),
+                name=profile.name,
+                **profile.to_settings(),
+                **self.settings
+            )
+            for profile in self.profiles
+        ]
+        return self.watchers
+
+    def detect(self, frame):
+        """
+        全プロファイルの検出を1回のHSV変換で行う
+
+        Args:
+            frame: 検出するフレーム（全画面）
+
+        Returns:
+            list: プロファイルごとの (検出されたか, 検出された輪郭情報のリスト, デバッグ情報)
+        """
+        screen_height = frame.full_size[1]
+        hsv = self.watchers[0]._to_hsv(frame.image)
+        self.shared_stats['frames'] += 1
+
+        masks = {}       # 色範囲 → (色マスク, 色ピクセル数)
+        candidates = {}  # (色範囲, 抽出方法) → 候補
+        results = []
+        for watcher, profile in zip(self.watchers, self.profiles):
+            color_key = profile.color_key
+            if color_key not in masks:
+                mask = cv2.inRange(hsv, watcher.hsv_lower, watcher.hsv_upper)
+                masks[color_key] = (mask, cv2.countNonZero(mask))
+                self.shared_stats['masks'] += 1
+            mask, color_pixels = masks[color_key]
+
+            candidate_key = (color_key, watcher.candidate_engine)
+            if candidate_key not in candidates:
+                candidates[candidate_key] = watcher.find_candidates(mask)
+                self.shared_stats['labelings'] += 1
+
+            detected_forms, candidate_count = watcher.forms_from_candidates(
+                mask, candidates[candidate_key], watcher.scaled_thresholds(screen_height))
+            debug_info = {
+                'total_contours': candidate_count,
+                'matched_forms': len(detected_forms),
+                'color_pixels': color_pixels
+            }
+            results.append((len(detected_forms) > 0, detected_forms, debug_info))
+        return results
+
+    def on_pause_toggle(self, is_paused):
+        """一時停止/再開のコールバック"""
+        self.is_paused = is_paused
+        for watcher in self.watchers:
+            watcher.is_paused = is_paused
+        print("\n[⏸] 一時停止中..." if is_paused else "\n[▶] 再開しました")
+
+    def on_stop_request(self):
+        """停止ボタンが押されたときのコールバック"""
+        print("\n[⏹] 停止リクエストを受信")
+        self.stop_requested = True
+        for watcher in self.watchers:
+            watcher.stop_requested = True
+
+    def on_cancel_request(self):
+        """キャンセルボタンが押されたときのコールバック（検出中のプロファイルのみ）"""
+        print("\n[✕] 撮影キャンセルリクエストを受信")
+        for watcher in self.watchers:
+            if watcher.state == AutoScreenshot.STATE_DETECTING:
+                watcher.cancel_capture_requested = True
+
+    def _most_urgent_watcher(self):
+        return min(self.watchers, key=lambda w: self.STATE_PRIORITY.index(w.state))
+
+    def _update_gui(self):
+        """最も優先度の高い状態のプロファイルをGUIに表示"""
+        if self.is_paused:
+            return
+        watcher = self._most_urgent_watcher()
+        self.gui.update_state(watcher.state, watcher.name)
+        self.gui.update_counter(sum(w.screenshot_count for w in self.watchers))
+
+    def print_settings(self, use_gui=True):
+        """設定内容を表示"""
+        print("=" * 70)
+        print("自動スクリーンショット撮影プログラム（複数プロファイル）")
+        print("=" * 70)
+        for watcher in self.watchers:
+            area = (f"{watcher.min_area:,}〜{watcher.max_area:,}px" if watcher.max_area
+                    else f"{watcher.min_area:,}px以上")
+            print(f"[{watcher.name}] HSV {watcher.hsv_lower}〜{watcher.hsv_upper} | 面積 {area} | "
+                  f"アスペクト比 {watcher.aspect_ratio_range} | 保存先 {watcher.save_dir}/")
+        shared = len({profile.color_key for profile in self.profiles})
+        print(f"色マスク: {shared}種類（{len(self.profiles)}プロファイルで共有）")
+        print(f"チェック間隔: {self.watchers[0].check_interval}秒")
+        print("\nGUIウィンドウで操作可能" if use_gui else "\nCtrl+C で停止")
+        print("=" * 70)
+
+    def run(self, duration=None, use_gui=True):
+        """
+        全プロファイルの監視を開始
+
+        Args:
+            duration: 実行時間（秒）。Noneの場合は無限に実行
+            use_gui: GUIを使用するかどうか
+        """
+        self.create_watchers()
+        self.print_settings(use_gui)
+
+        if use_gui:
+            try:
+                from overlay_gui import OverlayGUI
+                self.gui = OverlayGUI(
+                    on_pause_callback=self.on_pause_toggle,
+                    on_stop_callback=self.on_stop_request,
+                    on_cancel_callback=self.on_cancel_request
+                )
+                self.gui.start()
+                print("✓ GUIウィンドウを起動しました")
+            except Exception as e:
+                print(f"⚠ GUI起動に失敗: {e}")
+                print("コンソールモードで続行します")
+                self.gui = None
+
+        # キャプチャ方法とチェック間隔は共通設定なので最初のプロファイルのものを使う
+        first = self.watchers[0]
+        source = first.create_frame_source()
+        scheduler = PollingScheduler(first.check_interval, first.state_intervals,
+                                     clock=self.clock, sleep=self.sleep)
+        start_time = self.clock()
+        event_log = self.settings.get('event_log')
+
+        try:
+            source.open()
+            if event_log:
+                event_log.start()
+            paused = False
+            while True:
+                if self.stop_requested:
+                    break
+                if duration and (self.clock() - start_time) > duration:
+                    break
+                if self.is_paused:
+                    scheduler.idle('paused')
+                    paused = True
+                    continue
+                if paused:
+                    # 一時停止から復帰したら現在時刻から刻み直す
+                    scheduler.reset()
+                    paused = False
+
+                frame = source.grab()
+                if frame is None:
+                    print("\nフレームソースの終端に達しました")
+                    break
+
+                for watcher, result in zip(self.watchers, self.detect(frame)):
+                    watcher.handle_detection(frame, *result)
+                if self.gui:
+                    self._update_gui()
+
+                # 最も短い間隔を必要とするプロファイルの状態に合わせて待機
+                state = min((w.state for w in self.watchers), key=scheduler.interval_for)
+                scheduler.wait(state)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            source.close()
+            if event_log:
+                for watcher in self.watchers:
+                    watcher.log_summary(self.clock())
+                event_log.close()
+                event_log.print_stats()
+            writers = {id(w.image_writer): w.image_writer for w in self.watchers if w.image_writer}
+            for writer in writers.values():
+                writer.flush()
+                writer.print_stats()
+
+            stats = self.shared_stats
+            print("\n" + "=" * 70)
+            print("停止しました")
+            for watcher in self.watchers:
+                print(f"  {watcher.name}: {watcher.screenshot_count} 枚")
+            print(f"合計 {sum(w.screenshot_count for w in self.watchers)} 枚のスクリーンショットを保存しました")
+            print(f"フレーム {stats['frames']:,} | HSV変換 {stats['frames']:,} | "
+                  f"色マスク {stats['masks']:,} | 候補抽出 {stats['labelings']:,}")
+            print("=" * 70)
+
+            if self.gui:
+                self.gui.destroy()
+                print("GUI終了")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        profiles = DetectionProfile.load(sys.argv[1])
+    else:
+        profiles = [
+            # 青紫のクイズフォーム
+            DetectionProfile(
+                name="quiz",
+                target_color_hsv_range=[(110, 40, 180), (125, 255, 255)],
+                min_area=30000,
+                max_area=200000,
+                aspect_ratio_range=(1.0, 2.0),
+                detection_time=2.0,
+                disappear_check_time=1.5,
+                cooldown_time=3.0,
+            ),
+            # オレンジの通知ボックス
+            DetectionProfile(
+                name="alert",
+                target_color_hsv_range=[(5, 120, 180), (20, 255, 255)],
+                min_area=20000,
+                aspect_ratio_range=(1.5, 6.0),
+                detection_time=1.0,
+                disappear_check_time=1.0,
+                cooldown_time=5.0,
+            ),
+        ]
+
+    multi_ss = MultiProfileAutoScreenshot(
+        profiles,
+        save_dir="screenshots",
+        check_interval=0.5
+    )
+    multi_ss.run()
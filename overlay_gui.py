@@ -2,22 +2,39 @@
 # -*- coding: utf-8 -*-
 """
 オーバーレイGUI - 常に最前面に表示されるステータスウィンドウ
+
+update_state / update_counter / flash_capture はどのスレッドから呼んでも
+最新の値を1つの受け渡し枠に書くだけで、Tkには触れません。
+GUIスレッドが root.after で一定間隔（既定10回/秒）に枠を読み、
+前回表示した値から変わった部分だけウィジェットを更新します。
+検出ループが何回呼んでもGUIの処理量は更新間隔で決まり、検出ループはTkを待ちません。
 """
 
 import tkinter as tk
 from tkinter import ttk
 import threading
+import time
 
 
 class OverlayGUI:
     """画面上に常に表示される半透明ステータスウィンドウ"""
 
-    def __init__(self, on_pause_callback=None, on_stop_callback=None, on_cancel_callback=None):
+    STATE_NAMES = {
+        'waiting': '待機中',
+        'detecting': '検出中',
+        'captured': '撮影完了',
+        'cooldown': 'クールダウン',
+        'paused': '一時停止'
+    }
+
+    def __init__(self, on_pause_callback=None, on_stop_callback=None, on_cancel_callback=None,
+                 refresh_rate=10):
         """
         Args:
             on_pause_callback: 一時停止/再開ボタンが押されたときのコールバック
             on_stop_callback: 停止ボタンが押されたときのコールバック
             on_cancel_callback: キャンセルボタンが押されたときのコールバック
+            refresh_rate: 表示を更新する回数（1秒あたり）
         """
         self.on_pause_callback = on_pause_callback
         self.on_stop_callback = on_stop_callback
@@ -25,6 +42,16 @@ class OverlayGUI:
         self.is_paused = False
         self.root = None
         self.thread = None
+        self.tick_ms = max(1, int(1000 / refresh_rate))
+
+        # 検出ループからGUIスレッドへの受け渡し枠（最新の値だけを保持）
+        self._lock = threading.Lock()
+        self._pending = {'state': ('waiting', ''), 'counter': 0, 'flash': False}
+        self._closing = False
+
+        # GUIスレッドが最後に表示した値（変わったときだけウィジェットを更新）
+        self._shown = {'state': None, 'info': None, 'counter': None, 'color': None, 'cancel': False}
+        self._flash_until = 0.0
 
         # 状態表示用の変数（Noneで初期化、GUI起動後に設定）
         self.state_text = None
@@ -47,7 +74,6 @@ class OverlayGUI:
         self.thread = threading.Thread(target=self._run_gui, daemon=True)
         self.thread.start()
         # スレッドが起動してGUIが初期化されるまで待機
-        import time
         max_wait = 2.0  # 最大2秒待つ
         elapsed = 0
         while self.root is None and elapsed < max_wait:
@@ -203,6 +229,10 @@ class OverlayGUI:
             command=self._on_stop_clicked
         )
         stop_button.pack(side=tk.LEFT, padx=3)
+        self.stop_button = stop_button
+
+        # 受け渡し枠を一定間隔で反映
+        self.root.after(0, self._tick)
 
         # GUIループ開始
         try:
@@ -212,7 +242,7 @@ class OverlayGUI:
 
     def update_state(self, state, info=""):
         """
-        状態を更新
+        状態を更新（どのスレッドからでも呼べる。表示は次の更新タイミングで反映）
 
         Args:
             state: 状態名 ('waiting', 'detecting', 'captured', 'cooldown', 'paused')
@@ -220,57 +250,81 @@ class OverlayGUI:
         """
         if not self.root:
             return
-
-        state_names = {
-            'waiting': '待機中',
-            'detecting': '検出中',
-            'captured': '撮影完了',
-            'cooldown': 'クールダウン',
-            'paused': '一時停止'
-        }
-
-        state_display = state_names.get(state, state)
-        self.state_text.set(state_display)
-
-        # 色を更新
-        color = self.colors.get(state, self.colors['waiting'])
-
-        try:
-            self.status_canvas.itemconfig(self.status_indicator, fill=color)
-            self.status_canvas.itemconfig(self.status_text_item, text=state_display)
-            self.info_text.set(info)
-
-            # 検出中のみキャンセルボタンを表示
-            if state == 'detecting' and self.cancel_button:
-                self.cancel_button.pack(side=tk.LEFT, padx=3, before=self.pause_button.master.winfo_children()[-1])
-            elif self.cancel_button:
-                self.cancel_button.pack_forget()
-
-        except:
-            pass
+        with self._lock:
+            self._pending['state'] = (state, info)
 
     def update_counter(self, count):
-        """撮影枚数を更新"""
+        """撮影枚数を更新（表示は次の更新タイミングで反映）"""
         if not self.root:
             return
-        self.counter_text.set(f"撮影枚数: {count}")
+        with self._lock:
+            self._pending['counter'] = count
 
     def flash_capture(self):
-        """撮影時に画面をフラッシュ"""
+        """撮影時に画面をフラッシュ（表示は次の更新タイミングで反映）"""
         if not self.root:
             return
+        with self._lock:
+            self._pending['flash'] = True
 
-        def flash():
-            try:
-                # 白くフラッシュ
-                self.status_canvas.itemconfig(self.status_indicator, fill='white')
-                self.root.after(100, lambda: self.status_canvas.itemconfig(
-                    self.status_indicator, fill=self.colors['captured']
-                ))
-            except:
-                pass
+    def _tick(self):
+        """受け渡し枠の最新の値を表示に反映（GUIスレッドで一定間隔に実行）"""
+        if self._closing:
+            self._close_window()
+            return
+        if self.root is None:
+            return
+
+        with self._lock:
+            (state, info), counter, flash = (
+                self._pending['state'], self._pending['counter'], self._pending['flash'])
+            self._pending['flash'] = False
+
+        try:
+            self._apply(state, info, counter, flash)
+        except tk.TclError:
+            pass
+        self.root.after(self.tick_ms, self._tick)
 
-        self.root.after(0, flash)
+    def _apply(self, state, info, counter, flash):
+        """前回表示した値から変わったウィジェットだけを更新"""
+        shown = self._shown
+
+        if state != shown['state']:
+            state_display = self.STATE_NAMES.get(state, state)
+            self.state_text.set(state_display)
+            self.status_canvas.itemconfig(self.status_text_item, text=state_display)
+            shown['state'] = state
+
+            # 検出中のみキャンセルボタンを表示
+            show_cancel = state == 'detecting'
+            if show_cancel != shown['cancel']:
+                if show_cancel:
+                    self.cancel_button.pack(side=tk.LEFT, padx=3, before=self.stop_button)
+                else:
+                    self.cancel_button.pack_forget()
+                shown['cancel'] = show_cancel
+
+        if info != shown['info']:
+            self._set_info(info)
+
+        if counter != shown['counter']:
+            self.counter_text.set(f"撮影枚数: {counter}")
+            shown['counter'] = counter
+
+        # 撮影時は100msだけ白くフラッシュ
+        now = time.monotonic()
+        if flash:
+            self._flash_until = now + 0.1
+        color = 'white' if now < self._flash_until else self.colors.get(state, self.colors['waiting'])
+        if color != shown['color']:
+            self.status_canvas.itemconfig(self.status_indicator, fill=color)
+            shown['color'] = color
+
+    def _set_info(self, text):
+        """詳細情報の表示を変更（GUIスレッドから呼ぶ）"""
+        self.info_text.set(text)
+        self._shown['info'] = text
 
     def _on_pause_clicked(self):
         """一時停止/再開ボタンがクリックされた"""
@@ -289,27 +343,37 @@ class OverlayGUI:
         """キャンセルボタンがクリックされた"""
         if self.on_cancel_callback:
             self.on_cancel_callback()
-        self.info_text.set("撮影をキャンセルしました")
+        self._set_info("撮影をキャンセルしました")
 
     def _on_stop_clicked(self):
         """停止ボタンがクリックされた"""
         if self.on_stop_callback:
             self.on_stop_callback()
 
-        if self.root:
-            self.root.quit()
-            self.root.destroy()
+        self._close_window()
 
     def _on_close_attempt(self):
         """ウィンドウを閉じようとした時"""
         # 閉じるボタンでは閉じず、停止ボタンを使わせる
-        self.info_text.set("停止するには「停止」ボタンを押してください")
+        self._set_info("停止するには「停止」ボタンを押してください")
 
-    def destroy(self):
-        """GUIを破棄"""
+    def _close_window(self):
+        """ウィンドウを閉じる（GUIスレッドから呼ぶ）"""
         if self.root:
-            self.root.quit()
-            self.root.destroy()
+            root, self.root = self.root, None
+            root.quit()
+            root.destroy()
+
+    def destroy(self, timeout=1.0):
+        """
+        GUIを破棄（どのスレッドからでも呼べる。次の更新タイミングでGUIスレッドが閉じる）
+
+        Args:
+            timeout: GUIスレッドの終了を待つ最大時間（秒）
+        """
+        self._closing = True
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
 
 
 # テスト用
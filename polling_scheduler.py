@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ポーリングスケジューラ - 単調増加クロック上の固定デッドラインで周期を刻む
+
+「処理してから check_interval だけ sleep」では実際の周期が
+間隔＋処理時間になってずれていくため、前回のデッドラインから次のデッドラインを決めます。
+状態ごとに間隔を変えられるので、待機中は粗く、検出中は細かくポーリングできます。
+"""
+
+import time
+from collections import deque
+
+
+class PollingScheduler:
+    """状態ごとの間隔を持つデッドライン方式のスケジューラ"""
+
+    def __init__(self, default_interval, state_intervals=None, clock=time.monotonic, sleep=time.sleep,
+                 history_size=1000):
+        """
+        Args:
+            default_interval: state_intervals に無い状態の間隔（秒）
+            state_intervals: 状態名ごとの間隔（秒）の辞書
+            clock: 現在時刻を返す関数（単調増加）
+            sleep: 指定秒数待機する関数
+            history_size: ジッター統計に保持する直近のサンプル数
+        """
+        self.default_interval = default_interval
+        self.state_intervals = dict(state_intervals or {})
+        self.clock = clock
+        self.sleep = sleep
+
+        self.next_deadline = None
+        self.ticks = 0
+        self.missed = 0
+        self.max_lateness = 0.0
+        self.total_lateness = 0.0
+        self.lateness_history = deque(maxlen=history_size)
+
+    def interval_for(self, state):
+        """状態に対応するポーリング間隔（秒）"""
+        return self.state_intervals.get(state, self.default_interval)
+
+    def wait(self, state):
+        """
+        次のデッドラインまで待機
+
+        デッドラインを過ぎていた場合は待たずに戻り、デッドライン超過として数えます。
+        遅れを取り戻すための連続実行はせず、現在時刻から刻み直します。
+
+        Args:
+            state: 現在の状態名（次の間隔を決める）
+
+        Returns:
+            float: デッドラインからの遅れ（秒）
+        """
+        now = self.clock()
+        interval = self.interval_for(state)
+        if self.next_deadline is None:
+            self.next_deadline = now
+
+        deadline = self.next_deadline + interval
+        if deadline <= now:
+            # 処理がデッドラインに間に合わなかった
+            self.missed += 1
+            lateness = now - deadline
+            self.next_deadline = now
+        else:
+            self.sleep(deadline - now)
+            lateness = max(0.0, self.clock() - deadline)
+            self.next_deadline = deadline
+
+        self.ticks += 1
+        self.total_lateness += lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+        self.lateness_history.append(lateness)
+        return lateness
+
+    def idle(self, state):
+        """
+        状態の間隔だけ待機（一時停止中など。ポーリングとして数えず、ジッター統計にも含めない）
+
+        Args:
+            state: 現在の状態名（待機する間隔を決める）
+        """
+        self.sleep(self.interval_for(state))
+
+    def reset(self):
+        """次の wait() から刻み直す（一時停止からの復帰時など）"""
+        self.next_deadline = None
+
+    def stats(self):
+        """
+        デッドライン超過とジッターの統計
+
+        Returns:
+            dict: ticks, missed, mean_lateness, p95_lateness, max_lateness（秒）
+        """
+        history = sorted(self.lateness_history)
+        p95 = history[min(len(history) - 1, int(len(history) * 0.95))] if history else 0.0
+        return {
+            'ticks': self.ticks,
+            'missed': self.missed,
+            'mean_lateness': self.total_lateness / self.ticks if self.ticks else 0.0,
+            'p95_lateness': p95,
+            'max_lateness': self.max_lateness,
+        }
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+リプレイ - 記録済みのフレーム列で AutoScreenshot の状態遷移をオフライン再生する
+
+仮想クロックを使って AutoScreenshot.run() をそのまま実行します。
+ポーリング間隔の待機は仮想時刻を進めるだけなので、検出が許す限り高速に進み、
+1時間の講義の記録を数秒で回帰テストできます（画面もGUIも不要）。
+
+各ポーリングでは「その時刻に画面に表示されていたフレーム」
+（タイムスタンプが現在時刻以下の最新のフレーム）が検出に渡されます。
+
+使い方:
+    python replay.py <画像ディレクトリ> --frame-interval 1.0
+    python replay.py <manifest.jsonl> --output events.jsonl
+
+マニフェストは1行1フレームのJSONL: {"path": "frame_0001.png", "timestamp": 12.5}
+（path はマニフェストからの相対パス可、timestamp は記録開始からの秒数）
+"""
+
+import sys
+import io
+# Windows環境での文字化け対策
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+import argparse
+import bisect
+import contextlib
+import glob
+import json
+import os
+
+from auto_screenshot import AutoScreenshot
+from frame_source import FrameSource, load_image
+
+
+class VirtualClock:
+    """sleep() で時刻が進むだけの仮想クロック"""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def time(self):
+        """現在の仮想時刻（秒）"""
+        return self.now
+
+    def sleep(self, seconds):
+        """仮想時刻を進める（実際には待たない）"""
+        if seconds > 0:
+            self.now += seconds
+
+
+class ReplayFrameSource(FrameSource):
+    """タイムスタンプ付きの画像列を仮想クロックに合わせて供給"""
+
+    def __init__(self, entries, clock, hold_last=0.0):
+        """
+        Args:
+            entries: (タイムスタンプ, 画像パス) のリスト
+            clock: 仮想クロック
+            hold_last: 最後のフレームを表示し続ける時間（秒）。経過後にソース終端
+        """
+        super().__init__()
+        self.entries = sorted(entries)
+        self.timestamps = [t for t, _ in self.entries]
+        self.clock = clock.time
+        self.hold_last = hold_last
+        self._cached_index = None
+        self._cached_image = None
+
+    @classmethod
+    def from_directory(cls, directory, clock, frame_interval=1.0, pattern="*.png", hold_last=None):
+        """ディレクトリ内の画像をファイル名順に frame_interval 秒間隔で並べる"""
+        files = sorted(glob.glob(os.path.join(directory, pattern)))
+        entries = [(i * frame_interval, path) for i, path in enumerate(files)]
+        return cls(entries, clock, frame_interval if hold_last is None else hold_last)
+
+    @classmethod
+    def from_manifest(cls, manifest_path, clock, hold_last=1.0):
+        """JSONLマニフェスト（{"path": ..., "timestamp": ...}）から読み込む"""
+        base_dir = os.path.dirname(os.path.abspath(manifest_path))
+        entries = []
+        with open(manifest_path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                entries.append((float(record['timestamp']), os.path.join(base_dir, record['path'])))
+        return cls(entries, clock, hold_last)
+
+    def grab(self, region=None):
+        if not self.entries:
+            return None
+        now = self.clock()
+        if now > self.timestamps[-1] + self.hold_last:
+            return None
+
+        # 現在時刻に表示されているフレーム
+        index = max(0, bisect.bisect_right(self.timestamps, now) - 1)
+        if index != self._cached_index:
+            path = self.entries[index][1]
+            image = load_image(path)
+            if image is None:
+                print(f"画像を読み込めませんでした: {path}")
+                return None
+            self._cached_index, self._cached_image = index, image
+        return self._make_frame(self._cached_image,
+                                source_name=os.path.basename(self.entries[index][1]),
+                                region=region)
+
+
+class ReplayAutoScreenshot(AutoScreenshot):
+    """撮影をファイル保存の代わりにイベントとして記録する AutoScreenshot"""
+
+    def __init__(self, clock, save_images=False, **settings):
+        """
+        Args:
+            clock: 仮想クロック
+            save_images: 撮影時に実際に画像を保存するか
+            **settings: AutoScreenshot の設定
+        """
+        settings.setdefault('save_dir', os.curdir)
+        super().__init__(clock=clock.time, sleep=clock.sleep, **settings)
+        self.save_images = save_images
+        self.capture_events = []
+
+    def save_screenshot(self, image):
+        forms = image.detected_forms or []
+        event = {
+            'event': 'capture',
+            'time': round(image.timestamp, 3),
+            'frame': image.source_name,
+            'forms': [list(form['bbox']) for form in forms],
+        }
+        if self.save_images:
+            event['file'] = super().save_screenshot(image)
+        else:
+            self.screenshot_count += 1
+        self.capture_events.append(event)
+        return event.get('file')
+
+
+def replay(source, clock, save_images=False, verbose=False, **settings):
+    """
+    フレーム列を再生して撮影イベントを返す
+
+    Args:
+        source: ReplayFrameSource
+        clock: source と共有する仮想クロック
+        save_images: 撮影時に実際に画像を保存するか
+        verbose: AutoScreenshot のコンソール出力を表示するか
+        **settings: AutoScreenshot の設定（pipelined は使えない）
+
+    Returns:
+        list: 撮影イベントのリスト
+    """
+    settings['pipelined'] = False  # パイプラインは実時間で待機するためリプレイでは使わない
+    if source.entries:
+        clock.now = source.timestamps[0]
+    auto_ss = ReplayAutoScreenshot(clock, save_images=save_images, frame_source=source, **settings)
+
+    with contextlib.ExitStack() as stack:
+        if not verbose:
+            devnull = stack.enter_context(open(os.devnull, 'w', encoding='utf-8'))
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+        auto_ss.run(use_gui=False, show_banner=verbose)
+    return auto_ss.capture_events
+
+
+def main():
+    parser = argparse.ArgumentParser(description="記録済みフレームで状態遷移をオフライン再生")
+    parser.add_argument('input', help="画像ディレクトリ または JSONLマニフェスト")
+    parser.add_argument('--frame-interval', type=float, default=1.0, help="ディレクトリ入力時のフレーム間隔（秒）")
+    parser.add_argument('--pattern', default="*.png", help="ディレクトリ入力時のglobパターン")
+    parser.add_argument('--output', help="撮影イベントを書き出すJSONLファイル（省略時は標準出力）")
+    parser.add_argument('--save-dir', help="指定すると撮影画像を実際に保存する")
+    parser.add_argument('--verbose', action='store_true', help="状態遷移のログを表示")
+    parser.add_argument('--hsv-lower', type=int, nargs=3, default=(110, 40, 180))
+    parser.add_argument('--hsv-upper', type=int, nargs=3, default=(125, 255, 255))
+    parser.add_argument('--min-area', type=int, default=30000)
+    parser.add_argument('--max-area', type=int, default=200000)
+    parser.add_argument('--aspect', type=float, nargs=2, default=(1.0, 2.0))
+    parser.add_argument('--detection-time', type=float, default=2.0)
+    parser.add_argument('--disappear-time', type=float, default=1.5)
+    parser.add_argument('--cooldown', type=float, default=3.0)
+    parser.add_argument('--interval', type=float, default=0.5, help="チェック間隔（秒）")
+    args = parser.parse_args()
+
+    clock = VirtualClock()
+    if os.path.isdir(args.input):
+        source = ReplayFrameSource.from_directory(args.input, clock, args.frame_interval, args.pattern)
+    else:
+        source = ReplayFrameSource.from_manifest(args.input, clock)
+
+    settings = {
+        'target_color_hsv_range': [tuple(args.hsv_lower), tuple(args.hsv_upper)],
+        'min_area': args.min_area,
+        'max_area': args.max_area,
+        'aspect_ratio_range': tuple(args.aspect),
+        'detection_time': args.detection_time,
+        'disappear_check_time': args.disappear_time,
+        'cooldown_time': args.cooldown,
+        'check_interval': args.interval,
+    }
+    if args.save_dir:
+        settings['save_dir'] = args.save_dir
+
+    events = replay(source, clock, save_images=bool(args.save_dir), verbose=args.verbose, **settings)
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for event in events:
+            out.write(json.dumps(event, ensure_ascii=False) + "\n")
+    finally:
+        if args.output:
+            out.close()
+    print(f"フレーム数: {len(source.entries)} | 撮影イベント: {len(events)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
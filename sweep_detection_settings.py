@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+検出設定のスイープ - 設定の組み合わせをラベル付き画像セットで一括評価する
+
+HSV範囲・面積・アスペクト比・横バーの閾値のグリッドを全組み合わせで評価し、
+適合率・再現率・F1の順に並べます。画像ごとにHSV変換は1回、色マスクと輪郭の抽出は
+色範囲ごとに1回だけ行い、横バーのランレングスも候補ごとに1回だけ計算します。
+面積・アスペクト比・バーの条件は全設定分を NumPy でまとめて判定するため、
+1,000通りの設定でも画像1枚あたりの処理時間はほとんど増えません。
+
+使い方:
+    python sweep_detection_settings.py --positives quiz/ --negatives lecture/ \\
+        --min-area 20000 30000 40000 --aspect 1.0,2.0 0.8,2.5 --bar-thickness 6 10 14
+    python sweep_detection_settings.py --labels labels.jsonl --grid grid.json --output sweep.csv
+
+グリッドファイル（JSON、省略したキーは既定値またはコマンドライン引数）:
+    {"hsv_ranges": [[[110, 40, 180], [125, 255, 255]]], "min_area": [20000, 30000],
+     "max_area": [200000, null], "aspect_ratio_range": [[1.0, 2.0]], "min_bar_thickness": [10],
+     "min_bar_distance": [50], "bar_width_ratio": [0.7]}
+"""
+
+import sys
+import io
+# Windows環境での文字化け対策
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+
+from bar_detection import find_horizontal_bars
+from detection_profile import DetectionProfile
+from frame_source import load_image
+from labeled_images import iou, load_labeled_images
+
+
+DEFAULT_GRID = {
+    'hsv_ranges': [[(110, 40, 180), (125, 255, 255)]],
+    'min_area': [30000],
+    'max_area': [200000],
+    'aspect_ratio_range': [(1.0, 2.0)],
+    'min_bar_thickness': [10],
+    'min_bar_distance': [50],
+    'bar_width_ratio': [0.7],
+}
+
+
+def build_configs(grid):
+    """
+    グリッドの全組み合わせを設定のリストにする
+
+    Returns:
+        list: 設定の辞書（AutoScreenshot の引数名）のリスト
+    """
+    keys = ['hsv_ranges', 'min_area', 'max_area', 'aspect_ratio_range',
+            'min_bar_thickness', 'min_bar_distance', 'bar_width_ratio']
+    configs = []
+    for values in itertools.product(*(grid[key] for key in keys)):
+        hsv_range, min_area, max_area, aspect, thickness, distance, ratio = values
+        configs.append({
+            'target_color_hsv_range': [tuple(hsv_range[0]), tuple(hsv_range[1])],
+            'min_area': min_area,
+            'max_area': max_area,
+            'aspect_ratio_range': tuple(aspect),
+            'min_bar_thickness': thickness,
+            'min_bar_distance': distance,
+            'bar_width_ratio': ratio,
+        })
+    return configs
+
+
+def config_arrays(configs, reference_height=None, iou_threshold=0.5):
+    """設定のリストをワーカーで一括判定するための配列にまとめる"""
+    ranges = sorted({tuple(map(tuple, c['target_color_hsv_range'])) for c in configs})
+    bar_keys = sorted({(c['bar_width_ratio'], c['min_bar_thickness'], c['min_bar_distance']) for c in configs})
+    return {
+        'ranges': ranges,
+        'bar_keys': bar_keys,
+        'range_index': np.array([ranges.index(tuple(map(tuple, c['target_color_hsv_range']))) for c in configs]),
+        'bar_index': np.array([bar_keys.index((c['bar_width_ratio'], c['min_bar_thickness'],
+                                               c['min_bar_distance'])) for c in configs]),
+        'min_area': np.array([c['min_area'] for c in configs], dtype=np.float64),
+        'max_area': np.array([np.inf if c['max_area'] is None else c['max_area'] for c in configs],
+                             dtype=np.float64),
+        'aspect_lo': np.array([c['aspect_ratio_range'][0] for c in configs], dtype=np.float64),
+        'aspect_hi': np.array([c['aspect_ratio_range'][1] for c in configs], dtype=np.float64),
+        'reference_height': reference_height,
+        'iou_threshold': iou_threshold,
+    }
+
+
+_arrays = {}
+
+
+def _init_worker(arrays):
+    """ワーカープロセスの初期化（設定の配列を受け取り、OpenCVのスレッドは1つにする）"""
+    cv2.setNumThreads(1)
+    _arrays.update(arrays)
+
+
+def _bar_checks(mask, boxes, bar_keys, factor):
+    """
+    候補ごとに横バーの条件（bar_keys の各組み合わせ）を満たすかを判定
+
+    Returns:
+        numpy配列: (len(bar_keys), 候補数) の bool 配列
+    """
+    result = np.zeros((len(bar_keys), len(boxes)), dtype=bool)
+    for ratio in sorted({key[0] for key in bar_keys}):
+        rows = [i for i, key in enumerate(bar_keys) if key[0] == ratio]
+        for c, (x, y, w, h) in enumerate(boxes):
+            starts, ends, thickness = find_horizontal_bars(mask[y:y+h, x:x+w], ratio, width=w)
+            for i in rows:
+                _, min_thickness, min_distance = bar_keys[i]
+                thick = thickness >= max(1, int(round(min_thickness * factor)))
+                if np.count_nonzero(thick) >= 2:
+                    result[i, c] = starts[thick][-1] - ends[thick][0] >= min_distance * factor
+    return result
+
+
+def evaluate_image(item):
+    """
+    1枚の画像を全設定で判定（ワーカープロセスで実行）
+
+    Args:
+        item: (画像番号, 画像パス, 正解の矩形のリストまたは None)
+
+    Returns:
+        tuple: (画像番号, 設定ごとの検出有無, 設定ごとの正解との一致, エラーメッセージまたは None)
+    """
+    index, path, bboxes = item
+    arrays = _arrays
+    config_count = len(arrays['min_area'])
+    detected = np.zeros(config_count, dtype=bool)
+    hit = np.zeros(config_count, dtype=bool)
+
+    img = load_image(path)
+    if img is None:
+        return index, detected, hit, "読み込めませんでした"
+
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    factor = img.shape[0] / arrays['reference_height'] if arrays['reference_height'] else 1.0
+    area_factor = factor * factor
+
+    for range_index, (lower, upper) in enumerate(arrays['ranges']):
+        selected = np.flatnonzero(arrays['range_index'] == range_index)
+
+        # 色マスクと輪郭はこの色範囲の全設定で共有
+        mask = cv2.inRange(hsv, np.array(lower), np.array(upper))
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            continue
+        areas = np.array([cv2.contourArea(contour) for contour in contours])
+        boxes = np.array([cv2.boundingRect(contour) for contour in contours])
+        aspects = boxes[:, 2] / np.maximum(boxes[:, 3], 1)
+
+        # どの設定でも通らない候補を先に除く（最も緩い条件）
+        min_area = arrays['min_area'][selected, None] * area_factor
+        max_area = arrays['max_area'][selected, None] * area_factor
+        aspect_lo = arrays['aspect_lo'][selected, None]
+        aspect_hi = arrays['aspect_hi'][selected, None]
+        loose = ((areas >= min_area.min()) & (areas <= max_area.max())
+                 & (aspects >= aspect_lo.min()) & (aspects <= aspect_hi.max()))
+        candidates = np.flatnonzero(loose)
+        if len(candidates) == 0:
+            continue
+        areas, boxes, aspects = areas[candidates], boxes[candidates], aspects[candidates]
+
+        # 設定 × 候補 の判定をまとめて行う
+        bar_ok = _bar_checks(mask, boxes.tolist(), arrays['bar_keys'], factor)
+        ok = ((areas >= min_area) & (areas <= max_area)
+              & (aspects >= aspect_lo) & (aspects <= aspect_hi)
+              & bar_ok[arrays['bar_index'][selected]])
+        detected[selected] |= ok.any(axis=1)
+        if bboxes:
+            matches = np.array([max(iou(tuple(box), label) for label in bboxes) >= arrays['iou_threshold']
+                                for box in boxes.tolist()])
+            hit[selected] |= (ok & matches).any(axis=1)
+
+    if not bboxes:
+        hit = detected.copy()
+    return index, detected, hit, None
+
+
+def parse_pairs(values):
+    """'1.0,2.0' 形式の文字列のリストを (下限, 上限) のリストに変換"""
+    return [tuple(float(v) for v in value.split(',')) for value in values]
+
+
+def load_grid(args):
+    """グリッドファイルとコマンドライン引数からグリッドを作成（引数が優先）"""
+    grid = dict(DEFAULT_GRID)
+    if args.grid:
+        with open(args.grid, encoding='utf-8') as f:
+            data = json.load(f)
+        unknown = set(data) - set(DEFAULT_GRID)
+        if unknown:
+            raise ValueError(f"グリッドに未知のキーがあります: {', '.join(sorted(unknown))}")
+        grid.update(data)
+
+    if args.hsv_range:
+        grid['hsv_ranges'] = [[tuple(values[:3]), tuple(values[3:])] for values in args.hsv_range]
+    if args.min_area:
+        grid['min_area'] = args.min_area
+    if args.max_area:
+        grid['max_area'] = [None if value.lower() == 'none' else int(value) for value in args.max_area]
+    if args.aspect:
+        grid['aspect_ratio_range'] = parse_pairs(args.aspect)
+    if args.bar_thickness:
+        grid['min_bar_thickness'] = args.bar_thickness
+    if args.bar_distance:
+        grid['min_bar_distance'] = args.bar_distance
+    if args.bar_width_ratio:
+        grid['bar_width_ratio'] = args.bar_width_ratio
+    return grid
+
+
+def format_config(config):
+    lower, upper = config['target_color_hsv_range']
+    max_area = '-' if config['max_area'] is None else f"{config['max_area']:,.0f}"
+    return (f"HSV {lower}〜{upper} | 面積 {config['min_area']:,.0f}〜{max_area} | "
+            f"アスペクト比 {config['aspect_ratio_range']} | バー 太さ{config['min_bar_thickness']} "
+            f"距離{config['min_bar_distance']} 幅{config['bar_width_ratio']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="検出設定のグリッドをラベル付き画像セットで評価")
+    parser.add_argument('--labels', help="JSONLのラベルファイル（path, positive, bboxes）")
+    parser.add_argument('--positives', nargs='+', default=[], help="正例（フォームあり）の画像・ディレクトリ・glob")
+    parser.add_argument('--negatives', nargs='+', default=[], help="負例（フォームなし）の画像・ディレクトリ・glob")
+    parser.add_argument('--recursive', action='store_true', help="ディレクトリをサブフォルダまで探す")
+    parser.add_argument('--grid', help="グリッドのJSONファイル")
+    parser.add_argument('--hsv-range', type=int, nargs=6, action='append',
+                        metavar=('H_MIN', 'S_MIN', 'V_MIN', 'H_MAX', 'S_MAX', 'V_MAX'),
+                        help="色範囲（複数回指定可）")
+    parser.add_argument('--min-area', type=int, nargs='+')
+    parser.add_argument('--max-area', nargs='+', help="最大面積（none=無制限）")
+    parser.add_argument('--aspect', nargs='+', help="アスペクト比範囲 '下限,上限'")
+    parser.add_argument('--bar-thickness', type=int, nargs='+')
+    parser.add_argument('--bar-distance', type=int, nargs='+')
+    parser.add_argument('--bar-width-ratio', type=float, nargs='+')
+    parser.add_argument('--reference-height', type=int, help="面積・バー閾値の基準画面の高さ（例: 1080）")
+    parser.add_argument('--iou', type=float, default=0.5, help="正解の矩形と一致とみなすIoU")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="ワーカープロセス数")
+    parser.add_argument('--top', type=int, default=10, help="表示する上位の設定数")
+    parser.add_argument('--output', help="全設定の評価結果を書き出すCSVファイル")
+    parser.add_argument('--save-profile', help="最良の設定をプロファイル（JSON）として保存")
+    parser.add_argument('--profile-name', default="swept", help="保存するプロファイルの名前")
+    args = parser.parse_args()
+
+    images = load_labeled_images(args.labels, args.positives, args.negatives, args.recursive)
+    if not images:
+        parser.error("--labels / --positives / --negatives で画像を指定してください")
+    configs = build_configs(load_grid(args))
+    arrays = config_arrays(configs, args.reference_height, args.iou)
+
+    positives = sum(1 for image in images if image.positive)
+    print('=' * 80)
+    print('検出設定のスイープ')
+    print('=' * 80)
+    print(f"画像: {len(images):,}枚（正例 {positives:,} / 負例 {len(images) - positives:,}） | "
+          f"設定: {len(configs):,}通り | 色範囲: {len(arrays['ranges'])}種類 | ワーカー: {args.workers}")
+
+    tp = np.zeros(len(configs), dtype=np.int64)
+    fp = np.zeros(len(configs), dtype=np.int64)
+    fn = np.zeros(len(configs), dtype=np.int64)
+    tn = np.zeros(len(configs), dtype=np.int64)
+    errors = 0
+    started = time.perf_counter()
+    items = [(i, image.path, image.bboxes) for i, image in enumerate(images)]
+    with Pool(args.workers, initializer=_init_worker, initargs=(arrays,)) as pool:
+        for done, (index, detected, hit, error) in enumerate(pool.imap_unordered(evaluate_image, items), 1):
+            if error:
+                errors += 1
+                print(f"\nエラー ({images[index].path}): {error}")
+                continue
+            if images[index].positive:
+                tp += hit
+                fn += ~hit
+                fp += detected & ~hit  # 位置の正解と異なる場所を検出
+            else:
+                fp += detected
+                tn += ~detected
+            if done % 20 == 0 or done == len(items):
+                elapsed = time.perf_counter() - started
+                print(f"評価済み: {done:,}/{len(items):,}枚 | {done / elapsed:.1f}枚/秒", end='\r')
+
+    elapsed = time.perf_counter() - started
+    print(f"\n\n評価時間: {elapsed:.1f}秒 | 読み込みエラー: {errors:,}枚")
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.nan_to_num(tp / (tp + fp))
+        recall = np.nan_to_num(tp / (tp + fn))
+        f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+
+    # F1が高い順、同点なら誤検出が少ない設定、さらに同点なら厳しい設定を優先
+    # （最小面積 → 横バーの割合 → バーの太さ → バー間の距離が大きい順。それでも同点ならグリッドの順）
+    bar_settings = np.array([arrays['bar_keys'][i] for i in arrays['bar_index']], dtype=np.float64)
+    bar_width_ratio, min_bar_thickness, min_bar_distance = bar_settings.T
+    order = np.lexsort((-min_bar_distance, -min_bar_thickness, -bar_width_ratio,
+                        -arrays['min_area'], fp, -f1))
+
+    print('\n' + '=' * 80)
+    print(f'上位 {min(args.top, len(configs))} 件の設定:')
+    print('=' * 80)
+    for rank, i in enumerate(order[:args.top], 1):
+        print(f"\n[{rank}] F1={f1[i]:.3f} 適合率={precision[i]:.3f} 再現率={recall[i]:.3f} "
+              f"(TP {tp[i]} / FP {fp[i]} / FN {fn[i]} / TN {tn[i]})")
+        print(f"    {format_config(configs[i])}")
+
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['rank', 'f1', 'precision', 'recall', 'tp', 'fp', 'fn', 'tn',
+                             'hsv_lower', 'hsv_upper', 'min_area', 'max_area', 'aspect_min', 'aspect_max',
+                             'min_bar_thickness', 'min_bar_distance', 'bar_width_ratio'])
+            for rank, i in enumerate(order, 1):
+                config = configs[i]
+                lower, upper = config['target_color_hsv_range']
+                writer.writerow([rank, f"{f1[i]:.4f}", f"{precision[i]:.4f}", f"{recall[i]:.4f}",
+                                 tp[i], fp[i], fn[i], tn[i], ' '.join(map(str, lower)), ' '.join(map(str, upper)),
+                                 config['min_area'], config['max_area'], *config['aspect_ratio_range'],
+                                 config['min_bar_thickness'], config['min_bar_distance'], config['bar_width_ratio']])
+        print(f"\n評価結果を保存: {args.output}")
+
+    best = configs[order[0]]
+    print('\n' + '=' * 80)
+    print('推奨設定:')
+    print('=' * 80)
+    lower, upper = best['target_color_hsv_range']
+    print(f"target_color_hsv_range=[{lower}, {upper}]")
+    print(f"min_area={best['min_area']:,.0f}")
+    if best['max_area'] is not None:
+        print(f"max_area={best['max_area']:,.0f}")
+    print(f"aspect_ratio_range={best['aspect_ratio_range']}")
+    print(f"min_bar_thickness={best['min_bar_thickness']}")
+    print(f"min_bar_distance={best['min_bar_distance']}")
+    print(f"bar_width_ratio={best['bar_width_ratio']}")
+    if args.reference_height:
+        print(f"reference_height={args.reference_height}")
+
+    if args.save_profile:
+        profile = DetectionProfile(args.profile_name, reference_height=args.reference_height, **best)
+        DetectionProfile.save([profile], args.save_profile)
+        print(f"\nプロファイルを保存: {args.save_profile}")
+
+
+if __name__ == "__main__":
+    main()
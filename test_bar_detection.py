@@ -10,6 +10,8 @@ if sys.platform == 'win32':
 import cv2
 import numpy as np
 
+from bar_detection import find_horizontal_bars
+
 # テスト画像
 img = cv2.imread('C:/Users/imao3/Documents/GitHub/auto-screenshot-tool/temp_test.png')
 
@@ -56,48 +58,28 @@ for i, contour in enumerate(contours, 1):
     print(f'  面積: {area:.0f} px')
     print(f'  アスペクト比: {aspect_ratio:.2f}')
 
-    # 横バー検出
-    roi_mask = mask[y:y+h, x:x+w]
-    y_counts = np.sum(roi_mask > 0, axis=1)
-    threshold_width = w * 0.7
-
-    horizontal_bars = []
-    for row_idx in range(len(y_counts)):
-        if y_counts[row_idx] >= threshold_width:
-            horizontal_bars.append(row_idx)
+    # 横バー検出（幅の70%以上が青紫の行が連続する区間）
+    bar_starts, bar_ends, bar_heights = find_horizontal_bars(mask[y:y+h, x:x+w], width_ratio=0.7)
 
-    if not horizontal_bars:
+    if not len(bar_starts):
         print('  → 横バーなし、スキップ')
         continue
 
-    # グループ化
-    bar_groups = []
-    current_group = [horizontal_bars[0]]
-
-    for row_idx in horizontal_bars[1:]:
-        if row_idx == current_group[-1] + 1:
-            current_group.append(row_idx)
-        else:
-            bar_groups.append(current_group)
-            current_group = [row_idx]
-    bar_groups.append(current_group)
-
     # 太いバー抽出
-    thick_bars = [group for group in bar_groups if len(group) >= 10]
+    thick = bar_heights >= 10
+    thick_bars = list(zip(bar_starts[thick], bar_ends[thick], bar_heights[thick]))
 
-    print(f'  横バーグループ数: {len(bar_groups)}')
+    print(f'  横バーグループ数: {len(bar_starts)}')
     print(f'  太いバー数（≥10px）: {len(thick_bars)}')
 
-    for j, bar in enumerate(thick_bars, 1):
-        print(f'    バー{j}: Y={bar[0]}〜{bar[-1]}, 高さ={len(bar)}px')
+    for j, (bar_start, bar_end, bar_height) in enumerate(thick_bars, 1):
+        print(f'    バー{j}: Y={bar_start}〜{bar_end}, 高さ={bar_height}px')
 
     if len(thick_bars) < 2:
         print('  → 太いバーが2つ未満、スキップ')
         continue
 
-    top_bar = thick_bars[0]
-    bottom_bar = thick_bars[-1]
-    bar_distance = bottom_bar[0] - top_bar[-1]
+    bar_distance = thick_bars[-1][0] - thick_bars[0][1]
 
     print(f'  上下バー間距離: {bar_distance}px')
 
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+粗密2段階検出（detection_scale < 1.0）が等倍検出と同じフォームを見つけるかを確認
+
+左右の枠が1〜3ピクセルの細いフォームを4K画面の様々な位置に描画し、
+縮小率 0.5 / 0.25 の検出結果を等倍の検出結果と比較します。
+"""
+
+import sys
+import io
+# Windows環境での文字化け対策
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+import tempfile
+
+import numpy as np
+
+from auto_screenshot import AutoScreenshot
+from frame_source import draw_form, hsv_to_bgr
+
+SCALES = (0.5, 0.25)
+BORDERS = (1, 2, 3)
+OFFSETS = range(8)
+
+
+def find_mismatches():
+    """
+    等倍検出と粗密2段階検出の結果が異なるケースを返す
+
+    Returns:
+        list: (枠の太さ, ずらし量, 縮小率, 等倍の結果, 粗密の結果) のリスト
+    """
+    color = hsv_to_bgr((118, 60, 230))
+    save_dir = tempfile.mkdtemp()
+    detectors = {scale: AutoScreenshot(save_dir=save_dir, detection_scale=scale, reference_height=1080)
+                 for scale in (1.0,) + SCALES}
+
+    mismatches = []
+    for border in BORDERS:
+        for offset in OFFSETS:
+            image = np.full((2160, 3840, 3), 245, dtype=np.uint8)
+            draw_form(image, (1600 + offset, 800 + offset, 720, 520), color, bar_thickness=48, border=border)
+            expected = sorted(form['bbox'] for form in detectors[1.0].detect_target_form(image)[1])
+            for scale in SCALES:
+                actual = sorted(form['bbox'] for form in detectors[scale].detect_target_form(image)[1])
+                if not expected or actual != expected:
+                    mismatches.append((border, offset, scale, expected, actual))
+    return mismatches
+
+
+def test_coarse_detection_finds_thin_border_forms():
+    assert find_mismatches() == []
+
+
+if __name__ == "__main__":
+    mismatches = find_mismatches()
+    total = len(BORDERS) * len(OFFSETS) * len(SCALES)
+    for border, offset, scale, expected, actual in mismatches:
+        print(f"✗ 枠 {border}px / ずらし {offset}px / 縮小率 {scale}: 等倍 {expected} | 粗密 {actual}")
+    print(f"{total - len(mismatches)}/{total} ケースで等倍検出と一致")
+    sys.exit(1 if mismatches else 0)